@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from itertools import islice
+import chord_record
+import main
+
+# Analyzes a whole songbook: one song per input line, annotated JSONL out.
+#
+#   jsonl: {"key": "Eb", "progression": "Eb - Dm7b5 - G7 - Cm7", "id": "anything, optional"}
+#   text:  Eb<TAB>Eb - Dm7b5 - G7 - Cm7
+#
+# The key is optional in both (no "key" / no tab), songs without one get it detected from the chords.
+# Every output line has the input line number, plus "chords" (the to_dict output) or "error".
+
+DEFAULT_CHUNKSIZE = 64
+
+def parse_line(line: str, input_format: str) -> dict | None:
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    if input_format == 'jsonl' or (input_format == 'auto' and line.startswith('{')):
+        return json.loads(line)
+
+    key, tab, progression = line.partition('\t')
+    if not tab:
+        return {'progression': line}
+
+    return {'key': key.strip(), 'progression': progression}
+
+def analyze_record(record: dict, features=main.FEATURES) -> dict:
+    chords = main.get_base_info(main.extract_chords(record['progression']))
+    song_key = record.get('key')
+    if not song_key:
+        # numpy is only loaded for records that need their key detected
+        import key_detection
+        song_key = key_detection.detect_key(chords)
+    annotations = main.analyze(chords, song_key, features)
+
+    return {'key': song_key, 'chords': chord_record.to_dicts(chords, annotations)}
+
+def analyze_chunk(lines: list[tuple[int, str]], input_format: str = 'auto', features=main.FEATURES) -> list[str]:
+    """
+    Runs in the worker processes, results come back already serialized so only strings cross the pipe
+    :param lines: (line number, raw line) pairs
+    """
+    output = []
+
+    for line_number, line in lines:
+        result = {'line': line_number}
+        try:
+            record = parse_line(line, input_format)
+            if record is None:
+                continue
+            if 'id' in record:
+                result['id'] = record['id']
+            result.update(analyze_record(record, features))
+        except Exception as error:
+            result['error'] = f"{type(error).__name__}: {error}"
+
+        output.append(json.dumps(result, ensure_ascii=False))
+
+    return output
+
+def iter_chunks(lines, chunksize: int):
+    numbered = enumerate(lines, start=1)
+    while chunk := list(islice(numbered, chunksize)):
+        yield chunk
+
+def run(lines, output, workers: int | None = None, chunksize: int = DEFAULT_CHUNKSIZE, ordered: bool = True,
+        input_format: str = 'auto', features=main.FEATURES, max_pending: int | None = None) -> int:
+    """
+    Fans chunks of lines out over a process pool, only a few chunks per worker are in flight at a time
+    so memory stays flat however big the input is.
+    :return: number of songs written
+    """
+    workers = workers or os.cpu_count() or 1
+    features = tuple(features)
+    written = 0
+
+    def write(results: list[str]) -> None:
+        nonlocal written
+        for result in results:
+            output.write(result)
+            output.write('\n')
+        written += len(results)
+
+    if workers == 1:
+        for chunk in iter_chunks(lines, chunksize):
+            write(analyze_chunk(chunk, input_format, features))
+        return written
+
+    # the pool machinery (multiprocessing, logging, sockets) is a big import, single process runs and the workers skip it
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    max_pending = max_pending or workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        for chunk in iter_chunks(lines, chunksize):
+            if len(pending) >= max_pending:
+                if ordered:
+                    write(pending.popleft().result())
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        write(future.result())
+
+            pending.append(pool.submit(analyze_chunk, chunk, input_format, features))
+
+        if ordered:
+            while pending:
+                write(pending.popleft().result())
+        else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    write(future.result())
+
+    return written
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Analyze many chord progressions in parallel, JSONL out")
+    parser.add_argument('input', nargs='?', default='-', help="input file, - for stdin (default)")
+    parser.add_argument('-o', '--output', default='-', help="output file, - for stdout (default)")
+    parser.add_argument('--format', choices=('auto', 'jsonl', 'text'), default='auto', dest='input_format')
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="songs per task")
+    parser.add_argument('--unordered', action='store_true', help="write results as they finish instead of in input order")
+    parser.add_argument('--features', nargs='+', choices=main.FEATURES + main.OPTIONAL_FEATURES, default=main.FEATURES)
+    args = parser.parse_args(argv)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    try:
+        written = run(input_file, output_file, args.workers, args.chunksize, not args.unordered, args.input_format, args.features)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(f"{written} songs analyzed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import chord_parser
+import chord_record
+import helperfunc
+import main
+import pitch_class
+import voice_leading
+from chord_database import INTERVAL_TO_SEMITONE, NUMBER_TO_KEY
+
+# Reproducible stage timings over a synthetic corpus.
+#
+#   python benchmark.py -o before.json
+#   python benchmark.py -o after.json --compare before.json
+#
+# --compare exits with 1 when a stage got slower than the threshold, so it can gate a change.
+# Startup is measured too: each module in IMPORT_MODULES is imported in a fresh interpreter under
+# python -X importtime, and --import-budget-ms fails the run when one of them takes longer than that.
+
+# chord suffixes (quality + alterations) by how much work they are, each level also uses the ones before it
+COMPLEXITY_LEVELS = {
+    'triad': ("", "m", "dim", "aug", "sus2", "sus4"),
+    'seventh': ("7", "maj7", "m7", "m7b5", "dim7", "mMaj7", "7sus4", "6", "m6"),
+    'extended': ("9", "maj9", "m9", "11", "m11", "13", "maj13", "m13", "add9", "69"),
+    'altered': ("7b9", "7#9", "7#11", "7b13", "7b5", "7#5", "m7b5b9", "maj7#11", "13b9", "7b9b13"),
+    'evil': ("7#9#11#5b13", "m7b5b9b13", "7#9b9#11", "7b9#9", "13b9b13#11", "7sus4add3b9#9#11b13no5", "dim7add9", "ø7add11"),
+}
+COMPLEXITIES = tuple(COMPLEXITY_LEVELS)
+
+ROOTS = ("C", "C#", "Db", "D", "Eb", "E", "F", "F#", "Gb", "G", "Ab", "A", "Bb", "B")
+
+# share of chords that get a slash bass (always one of the chord's own notes)
+INVERSION_RATE = 0.1
+
+STAGES = ('extract_chords', 'get_chord_info', 'get_intervals', 'get_chord_notes', 'get_base_info',
+          'get_roman_numerals', 'find_251_movement', 'find_51_movement', 'find_parallel_minor',
+          'find_neighbouring_next_notes', 'find_chord_relative_to_next', 'note_differences_scalar',
+          'note_differences_batch', 'analyze')
+
+DEFAULT_THRESHOLD = 0.10
+
+# runs are only comparable when these match
+CORPUS_FIELDS = ('songs', 'length', 'complexity', 'seed', 'warm')
+
+# what the CLI tools and workers start from
+IMPORT_MODULES = ('main', 'batch', 'chord_index', 'live_engine', 'reversechordfinder')
+IMPORT_REPEAT = 5
+
+def chord_suffixes(complexity: str) -> tuple[str, ...]:
+    suffixes = ()
+    for level, level_suffixes in COMPLEXITY_LEVELS.items():
+        suffixes += level_suffixes
+        if level == complexity:
+            return suffixes
+
+    raise ValueError(f"Unknown complexity: {complexity}")
+
+def generate_progression(length: int, complexity: str, rng: random.Random) -> str:
+    suffixes = chord_suffixes(complexity)
+    chords = []
+
+    for _ in range(length):
+        root = rng.choice(ROOTS)
+        chord = root + rng.choice(suffixes)
+        if rng.random() < INVERSION_RATE:
+            interval = rng.choice(helperfunc.get_intervals(**helperfunc.get_chord_info(chord))[1:])
+            chord += '/' + NUMBER_TO_KEY[(pitch_class.KEY_TO_PITCH_CLASS[root] + INTERVAL_TO_SEMITONE[interval]) % 12]
+        chords.append(chord)
+
+    return ' - '.join(chords)
+
+def generate_corpus(songs: int, length: int, complexity: str, seed: int = 0) -> list[tuple[str, str]]:
+    """
+    :return: (song key, progression) pairs, the same for the same arguments
+    """
+    rng = random.Random(seed)
+    return [(rng.choice(ROOTS), generate_progression(length, complexity, rng)) for _ in range(songs)]
+
+def clear_caches() -> None:
+    chord_parser.cache_clear()
+    chord_record.from_symbol.cache_clear()
+    voice_leading.chord_midi.cache_clear()
+    main.window_cache_clear()
+
+def _stage_runners(corpus: list[tuple[str, str]]) -> dict:
+    """
+    :return: stage name -> (setup, run), setup builds run's input outside of the timed part
+    """
+    texts = [text for _, text in corpus]
+    keys = [key for key, _ in corpus]
+    symbols = [symbol for text in texts for symbol in main.extract_chords(text)]
+
+    def parsed_chords():
+        return [main.get_base_info(main.extract_chords(text)) for text in texts]
+
+    def chord_infos():
+        return [helperfunc.get_chord_info(symbol) for symbol in symbols]
+
+    def chord_intervals():
+        return [(info['base_key'], helperfunc.get_intervals(**info), info['inversion']) for info in chord_infos()]
+
+    def roman_numerals():
+        songs = parsed_chords()
+        return songs, [main.get_roman_numerals(chords, key) for chords, key in zip(songs, keys)]
+
+    def run_stage(stage):
+        def run(prepared):
+            songs, annotations = prepared
+            for chords, annotation in zip(songs, annotations):
+                stage(chords, annotation)
+        return run
+
+    runners = {
+        'extract_chords': (lambda: texts, lambda prepared: [main.extract_chords(text) for text in prepared]),
+        'get_chord_info': (lambda: symbols, lambda prepared: [helperfunc.get_chord_info(symbol) for symbol in prepared]),
+        'get_intervals': (chord_infos, lambda prepared: [helperfunc.get_intervals(**info) for info in prepared]),
+        'get_chord_notes': (chord_intervals, lambda prepared: [helperfunc.get_chord_notes(*item) for item in prepared]),
+        'get_base_info': (lambda: [main.extract_chords(text) for text in texts],
+                          lambda prepared: [main.get_base_info(chords) for chords in prepared]),
+        'get_roman_numerals': (parsed_chords, lambda prepared: [main.get_roman_numerals(chords, key) for chords, key in zip(prepared, keys)]),
+        'analyze': (parsed_chords, lambda prepared: [main.analyze(chords, key) for chords, key in zip(prepared, keys)]),
+        # the two ways of computing the note differences, main.NOTE_DIFFERENCE_BATCH_MIN is where they cross
+        'note_differences_scalar': (parsed_chords, lambda prepared: [
+            [main.get_note_differences(chord_1, chord_2) for chord_1, chord_2 in zip(chords, chords[1:])] for chords in prepared]),
+        'note_differences_batch': (parsed_chords, lambda prepared: [voice_leading.note_differences(chords) for chords in prepared]),
+    }
+    for name in STAGES:
+        if name.startswith('find_'):
+            runners[name] = (roman_numerals, run_stage(getattr(main, name)))
+
+    return runners
+
+def run_benchmark(songs: int = 200, length: int = 32, complexity: str = 'altered', seed: int = 0, repeat: int = 5,
+                  stages=STAGES, warm: bool = False) -> dict:
+    """
+    :param warm: keep the parse / record / window caches between repeats instead of starting every repeat cold
+    :return: JSON-ready results, times are seconds for the whole corpus
+    """
+    corpus = generate_corpus(songs, length, complexity, seed)
+    runners = _stage_runners(corpus)
+    chords = sum(len(main.extract_chords(text)) for _, text in corpus)
+    results = {}
+
+    for name in stages:
+        setup, run = runners[name]
+        times = []
+
+        for _ in range(repeat):
+            if not warm:
+                clear_caches()
+            prepared = setup()
+            if not warm:
+                clear_caches()
+
+            start = time.perf_counter()
+            run(prepared)
+            times.append(time.perf_counter() - start)
+
+        results[name] = {
+            "best": min(times),
+            "median": statistics.median(times),
+            "per_chord_us": min(times) / chords * 1e6 if chords else 0.0,
+        }
+
+    return {
+        "meta": {
+            "songs": songs, "length": length, "complexity": complexity, "seed": seed, "repeat": repeat,
+            "warm": warm, "chords": chords, "python": platform.python_version(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": results,
+    }
+
+def import_time(module: str) -> float:
+    """
+    :return: seconds a fresh interpreter spends importing module, dependencies included (python -X importtime)
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    if process.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{process.stderr.strip().splitlines()[-1]}")
+
+    # lines are "import time: self [us] | cumulative | name", the module itself is the last one with its name
+    for line in reversed(process.stderr.splitlines()):
+        _, _, fields = line.partition(':')
+        parts = fields.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+
+    raise RuntimeError(f"no importtime line for {module}")
+
+def measure_imports(modules=IMPORT_MODULES, repeat: int = IMPORT_REPEAT) -> dict:
+    """
+    :return: module -> best / median import seconds, one throwaway import first so bytecode caches are written
+    """
+    results = {}
+    for module in modules:
+        import_time(module)
+        times = [import_time(module) for _ in range(repeat)]
+        results[module] = {"best": min(times), "median": statistics.median(times)}
+
+    return results
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Compares best times of the stages (and imports) both runs have
+    :return: one row per stage with the ratio current / baseline, 'regression' set when it is over 1 + threshold
+    """
+    timings = [(name, result, baseline["stages"].get(name)) for name, result in current["stages"].items()]
+    timings += [(f"import {name}", result, baseline.get("imports", {}).get(name)) for name, result in current.get("imports", {}).items()]
+
+    rows = []
+    for name, result, before_result in timings:
+        if before_result is None:
+            continue
+
+        before, after = before_result["best"], result["best"]
+        ratio = after / before if before else float("inf")
+        rows.append({"stage": name, "baseline": before, "current": after, "ratio": ratio, "regression": ratio > 1 + threshold})
+
+    return rows
+
+def print_results(results: dict, comparison: list[dict] | None = None) -> None:
+    meta = results["meta"]
+    print(f"{meta['songs']} songs x {meta['length']} chords, {meta['complexity']}, {'warm' if meta['warm'] else 'cold'} caches")
+
+    ratios = {row["stage"]: row for row in comparison or []}
+    for name, result in results["stages"].items():
+        line = f"{name:<30} {result['best'] * 1e3:9.2f} ms {result['per_chord_us']:8.2f} us/chord"
+        if name in ratios:
+            row = ratios[name]
+            line += f"  x{row['ratio']:.2f}{'  REGRESSION' if row['regression'] else ''}"
+        print(line)
+
+    for name, result in results.get("imports", {}).items():
+        line = f"{'import ' + name:<30} {result['best'] * 1e3:9.2f} ms"
+        row = ratios.get(f"import {name}")
+        if row:
+            line += f"  {'':>16}x{row['ratio']:.2f}{'  REGRESSION' if row['regression'] else ''}"
+        print(line)
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Time every analysis stage over a synthetic corpus")
+    parser.add_argument('--songs', type=int, default=200)
+    parser.add_argument('--length', type=int, default=32, help="chords per song")
+    parser.add_argument('--complexity', choices=COMPLEXITIES, default='altered')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--warm', action='store_true', help="keep caches between repeats")
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown before a stage counts as a regression")
+    parser.add_argument('--imports', nargs='*', default=IMPORT_MODULES, help="modules to time the import of, none to skip")
+    parser.add_argument('--import-budget-ms', type=float, help="fail when importing one of them takes longer")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.songs, args.length, args.complexity, args.seed, args.repeat, args.stages, args.warm)
+    if args.imports:
+        results["imports"] = measure_imports(args.imports)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        comparison = compare(baseline, results, args.threshold)
+
+        mismatched = [field for field in CORPUS_FIELDS if baseline["meta"].get(field) != results["meta"][field]]
+        if mismatched:
+            print(f"warning: baseline was run with different {', '.join(mismatched)}", file=sys.stderr)
+
+    print_results(results, comparison)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+
+    over_budget = [name for name, result in results.get("imports", {}).items()
+                   if args.import_budget_ms is not None and result["best"] * 1e3 > args.import_budget_ms]
+    if over_budget:
+        print(f"over the {args.import_budget_ms:g} ms import budget: {', '.join(over_budget)}", file=sys.stderr)
+
+    if comparison and any(row["regression"] for row in comparison) or over_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,25 +1,10 @@
-GET_EQUIV_ACCIDENTAL = {
-    # Octave 3
-    "C#3": "Db3", "Db3": "C#3",
-    "D#3": "Eb3", "Eb3": "D#3",
-    "F#3": "Gb3", "Gb3": "F#3",
-    "G#3": "Ab3", "Ab3": "G#3",
-    "A#3": "Bb3", "Bb3": "A#3",
-
-    # Octave 4
-    "C#4": "Db4", "Db4": "C#4",
-    "D#4": "Eb4", "Eb4": "D#4",
-    "F#4": "Gb4", "Gb4": "F#4",
-    "G#4": "Ab4", "Ab4": "G#4",
-    "A#4": "Bb4", "Bb4": "A#4",
-
-    # Octave 5
-    "C#5": "Db5", "Db5": "C#5",
-    "D#5": "Eb5", "Eb5": "D#5",
-    "F#5": "Gb5", "Gb5": "F#5",
-    "G#5": "Ab5", "Ab5": "G#5",
-    "A#5": "Bb5", "Bb5": "A#5",
-}
+GET_EQUIV_ACCIDENTAL = {}
+
+# every octave midi covers, C#-1 up to G#9
+for octave in range(-1, 10):
+    for sharp, flat in (("C#", "Db"), ("D#", "Eb"), ("F#", "Gb"), ("G#", "Ab"), ("A#", "Bb")):
+        GET_EQUIV_ACCIDENTAL[f"{sharp}{octave}"] = f"{flat}{octave}"
+        GET_EQUIV_ACCIDENTAL[f"{flat}{octave}"] = f"{sharp}{octave}"
 
 NUMBER_TO_KEY = {
     0: "C",
@@ -46,6 +31,12 @@ KEY_TO_NUMBER = {
     "B" : 12,
 }
 
+# every midi number by name, C-1 is 0 and G9 is 127. Sharp names like midi_to_note gives them, and the flat equivalents
+MIDI_TO_NOTE = tuple(f"{NUMBER_TO_KEY[midi % 12]}{midi // 12 - 1}" for midi in range(128))
+MIDI_TO_NOTE_FLAT = tuple(GET_EQUIV_ACCIDENTAL.get(note, note) for note in MIDI_TO_NOTE)
+
+NOTE_TO_MIDI = {note: midi for table in (MIDI_TO_NOTE, MIDI_TO_NOTE_FLAT) for midi, note in enumerate(table)}
+
 CHORD_INTERVALS = {
 
     # ==================================================
@@ -250,6 +241,12 @@ INTERVAL_TO_SEMITONE = {
     "#13": 22,
 }
 
+# the name table each interval's notes are spelled from: flat intervals get flat names, the rest sharps
+INTERVAL_TO_SPELLING = {
+    interval: MIDI_TO_NOTE_FLAT if interval.startswith("b") else MIDI_TO_NOTE
+    for interval in INTERVAL_TO_SEMITONE
+}
+
 INTERVAL_ORDER = {
     # --- ROOT ---
     "1": 1,
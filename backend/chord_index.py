@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import chord_database
+import chord_parser
+import helperfunc
+import pitch_class
+from chord_database import CHORD_INTERVALS, NUMBER_TO_KEY
+
+# (absolute pitch-class mask, bass pitch class) -> chord names, best guess first
+#
+# Building takes about half a second, so get_index() keeps a JSON copy in the per-user cache directory
+# (never next to the source, and JSON so loading it can't run code). The copy carries a hash of the tables
+# and of the modules the build reads, and is rebuilt as soon as either changes.
+
+def user_cache_path(name: str) -> str:
+    """
+    :return: name inside %LOCALAPPDATA% / $XDG_CACHE_HOME (default ~/.cache), in a chord_analyzer directory
+    """
+    base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')
+    return os.path.join(base or os.path.join(os.path.expanduser('~'), '.cache'), 'chord_analyzer', name)
+
+DEFAULT_CACHE_PATH = user_cache_path("chord_index.json")
+
+SUPPORTED_ALTERATIONS = (
+    (),
+    ("b5",), ("#5",),
+    ("b9",), ("#9",), ("#11",), ("b13",),
+    ("sus2",), ("sus4",),
+    ("add2",), ("add9",), ("add11",), ("add13",),
+    ("no3",), ("no5",),
+    ("b9", "b13"), ("#9", "b13"), ("b9", "#11"), ("#9", "#11"), ("b9", "#9"),
+    ("sus4", "b9"),
+)
+
+# voicings often leave the fifth out, so every entry above is also indexed without it
+OMISSIONS = ((), ("no5",))
+
+INDEXED_ALTERATIONS = tuple(dict.fromkeys(
+    alterations + omission
+    for omission in OMISSIONS
+    for alterations in SUPPORTED_ALTERATIONS
+    if not set(omission) & set(alterations)
+))
+
+def _index_version() -> str:
+    digest = hashlib.sha1(repr((CHORD_INTERVALS, INDEXED_ALTERATIONS, NUMBER_TO_KEY)).encode())
+    for module in (chord_database, chord_parser, helperfunc, pitch_class):
+        with open(module.__file__, 'rb') as file:
+            digest.update(file.read())
+    with open(__file__, 'rb') as file:
+        digest.update(file.read())
+
+    return digest.hexdigest()
+
+def _index_key(mask: int, bass: int) -> int:
+    return mask << 4 | bass
+
+def build_index() -> dict[int, tuple[str, ...]]:
+    ranked = {}
+    quality_order = {quality: counter for counter, quality in enumerate(CHORD_INTERVALS)}
+
+    for root in range(pitch_class.PITCH_CLASS_COUNT):
+        root_name = NUMBER_TO_KEY[root]
+
+        for quality in CHORD_INTERVALS:
+            quality_mask = pitch_class.QUALITY_TO_MASK[quality]
+
+            for alterations in INDEXED_ALTERATIONS:
+                symbol = f"{root_name}{quality}{''.join(alterations)}"
+
+                # skip spellings that read back as something else, e.g. C + b5 -> Cb5
+                # (parsed uncached so building doesn't flush the parse cache)
+                try:
+                    if chord_parser.parse_chord.__wrapped__(symbol) != (root_name, quality, alterations, ''):
+                        continue
+                    interval_list = helperfunc.get_intervals(root_name, quality, list(alterations), '')
+                except (ValueError, IndexError):
+                    continue
+
+                mask = pitch_class.intervals_to_mask(interval_list)
+
+                # an alteration that lands on a pitch class the chord already has (m7#9) only adds noise
+                if alterations and mask == quality_mask:
+                    continue
+
+                mask = pitch_class.to_absolute(mask, root)
+                rank = (len(alterations), len(quality), quality_order[quality])
+
+                for bass in pitch_class.pitch_classes(mask):
+                    name = symbol if bass == root else f"{symbol}/{NUMBER_TO_KEY[bass]}"
+                    ranked.setdefault(_index_key(mask, bass), {}).setdefault(name, (rank[0], bass != root) + rank[1:])
+
+    return {
+        key: tuple(sorted(names, key=lambda name: (names[name], name)))
+        for key, names in ranked.items()
+    }
+
+def save_index(index: dict[int, tuple[str, ...]], path: str = DEFAULT_CACHE_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # written next to the target and renamed over it, a reader never sees half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({'version': _index_version(), 'index': [[key, list(names)] for key, names in index.items()]}, file)
+    os.replace(temporary, path)
+
+def load_index(path: str = DEFAULT_CACHE_PATH) -> dict[int, tuple[str, ...]] | None:
+    """
+    :return: the cached index, or None if there is none, it can't be read or it was built from different tables
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if data['version'] != _index_version():
+            return None
+        return {key: tuple(names) for key, names in data['index']}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def get_index(path: str | None = DEFAULT_CACHE_PATH) -> dict[int, tuple[str, ...]]:
+    """
+    :param path: disk cache location (default: the per-user cache directory), None to always build in memory
+    """
+    index = load_index(path) if path else None
+
+    if index is None:
+        index = build_index()
+        if path:
+            try:
+                save_index(index, path)
+            except OSError:
+                pass
+
+    return index
+
+def lookup(index: dict[int, tuple[str, ...]], mask: int, bass: int) -> tuple[str, ...]:
+    return index.get(_index_key(mask, bass), ())
+
+def identify(index: dict[int, tuple[str, ...]], midi_notes) -> tuple[str, ...]:
+    """
+    :param midi_notes: held MIDI note numbers, the lowest one is taken as the bass
+    :return: matching chord names, best guess first (empty if nothing matches)
+    """
+    if not midi_notes:
+        return ()
+
+    return lookup(index, pitch_class.mask_from_midi(midi_notes), min(midi_notes) % pitch_class.PITCH_CLASS_COUNT)
@@ -0,0 +1,130 @@
+import mmap
+import os
+import re
+from collections.abc import Iterator
+from functools import lru_cache
+from chord_database import CHORD_INTERVALS
+
+PARSE_CACHE_SIZE = 4096
+CHUNK_SIZE = 1 << 20
+
+# a match ending this close to the end of a chunk might continue in the next one
+# (longer than any quality + alteration + slash bass the regex can still be looking at)
+CHUNK_MARGIN = 64
+
+QUALITIES = sorted(
+    (q for q in CHORD_INTERVALS.keys() if q),
+    key=len,
+    reverse=True
+)
+REGEX_QUALITY_KEY = "|".join(re.escape(q) for q in QUALITIES)
+
+# same pattern as CHORD_PARTS_PATTERN but as one group, used to pull chords out of free text
+CHORD_PATTERN = re.compile(rf'((?:[CDEFGAB][#b]?)(?:{REGEX_QUALITY_KEY})?(?:(?:(?:[b#]|(?:no|omit|add|sus)?)(?:2|3|4|5|6|7|9|11|13)?)*)(?:\/(?:[CDEFGAB][#b]?))?)')
+CHORD_PARTS_PATTERN = re.compile(rf'([CDEFGAB][#b]?)({REGEX_QUALITY_KEY})?((?:(?:[b#]|(?:no|omit|add|sus)?)(?:2|3|4|5|6|7|9|11|13)?)*)(?:\/([CDEFGAB][#b]?))?')
+ALTERATION_PATTERN = re.compile(r'(?:no|omit|sus|add|[#b])?(?:2|3|4|5|6|7|9|11|13)')
+
+@lru_cache(maxsize=None)
+def chord_bytes_pattern() -> re.Pattern:
+    """
+    CHORD_PATTERN over raw utf-8 bytes, so files never have to be decoded as a whole (compiled on first use)
+    """
+    return re.compile(CHORD_PATTERN.pattern.encode('utf-8'))
+
+def find_chords(text_input: str) -> list[str]:
+    return CHORD_PATTERN.findall(text_input)
+
+def _scan_chunk(buffer, start: int, end: int, final: bool) -> tuple[list, int]:
+    """
+    :param final: end is the real end of the data, nothing can continue past it
+    :return: the matches that are complete and where the next chunk has to start scanning
+    """
+    limit = end if final else end - CHUNK_MARGIN
+    matches = []
+
+    for match in chord_bytes_pattern().finditer(buffer, start, end):
+        if match.end() > limit:
+            return matches, match.start()
+        matches.append(match)
+
+    return matches, end
+
+def iter_chords_mmap(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[str, int]]:
+    """
+    :return: (chord, byte offset) for every chord in the file, same chords as find_chords on the decoded text
+    """
+    with open(path, 'rb') as file:
+        length = os.fstat(file.fileno()).st_size
+        if not length:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            position = 0
+            window = max(chunk_size, CHUNK_MARGIN * 2)
+
+            while position < length:
+                end = min(position + window, length)
+                matches, next_position = _scan_chunk(buffer, position, end, end == length)
+
+                for match in matches:
+                    yield match.group(1).decode('utf-8'), match.start()
+
+                # one chord bigger than the whole chunk, look further before giving up on it
+                if next_position == position:
+                    window *= 2
+                    continue
+
+                position = next_position
+                window = max(chunk_size, CHUNK_MARGIN * 2)
+
+def iter_chords_stream(file, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[str, int]]:
+    """
+    Same as iter_chords_mmap for anything with a binary read(), like sys.stdin.buffer or a pipe
+    """
+    buffer = b''
+    offset = 0
+
+    while True:
+        data = file.read(chunk_size)
+        buffer += data
+        matches, next_position = _scan_chunk(buffer, 0, len(buffer), not data)
+
+        for match in matches:
+            yield match.group(1).decode('utf-8'), offset + match.start()
+
+        if not data:
+            return
+
+        offset += next_position
+        buffer = buffer[next_position:]
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_chord(chord: str) -> tuple[str, str, tuple[str, ...], str]:
+    """
+    :param chord: The input chord to be parsed
+    :return: Base key, Quality, Alterations, Inversion (cached, so everything is immutable)
+    """
+    chord_data = CHORD_PARTS_PATTERN.search(chord)
+
+    if chord_data is None:
+        raise ValueError(f"Not a valid chord: {chord}")
+
+    base_key, quality, alteration_text, inversion = chord_data.groups(default='')
+    alterations = tuple(ALTERATION_PATTERN.findall(alteration_text))
+
+    return base_key, quality, alterations, inversion
+
+def cache_info() -> dict:
+    info = parse_chord.cache_info()
+    lookups = info.hits + info.misses
+
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
+
+def cache_clear() -> None:
+    parse_chord.cache_clear()
@@ -0,0 +1,121 @@
+from functools import lru_cache
+import helperfunc
+import pitch_class
+
+RECORD_CACHE_SIZE = 4096
+
+class Chord:
+    """
+    Immutable per-chord base info (what get_base_info used to put in a dict).
+    Analysis results live in a separate annotation dict per chord, see to_dict.
+    root is the pitch class of key_base (C = 0) and mask the pitch_class set of the intervals above it.
+
+    Only the parsed symbol and root are worked out up front. intervals, mask, notes, notes_alt and label are
+    computed the first time they are read and kept, so roman numeral only work never spells a note
+    (and a bad slash bass only raises once the notes are asked for).
+    """
+    __slots__ = ('chord', 'key_base', 'quality', 'alterations', 'inversion', 'root', '_intervals', '_notes', '_notes_alt', '_mask',
+                 '_label')
+
+    def __init__(self, chord: str, key_base: str, quality: str, alterations: tuple[str, ...], inversion: str,
+                 intervals: tuple[str, ...] | None = None, notes: tuple[str, ...] | None = None, notes_alt: tuple[str, ...] | None = None):
+        object.__setattr__(self, 'chord', chord)
+        object.__setattr__(self, 'key_base', key_base)
+        object.__setattr__(self, 'quality', quality)
+        object.__setattr__(self, 'alterations', tuple(alterations))
+        object.__setattr__(self, 'inversion', inversion)
+        object.__setattr__(self, 'root', pitch_class.KEY_TO_PITCH_CLASS[key_base])
+        object.__setattr__(self, '_intervals', None if intervals is None else tuple(intervals))
+        object.__setattr__(self, '_notes', None if notes is None else tuple(notes))
+        object.__setattr__(self, '_notes_alt', None if notes_alt is None else tuple(notes_alt))
+        object.__setattr__(self, '_mask', None)
+        object.__setattr__(self, '_label', None)
+
+    @property
+    def intervals(self) -> tuple[str, ...]:
+        if self._intervals is None:
+            interval_data = helperfunc.get_intervals(self.key_base, self.quality, list(self.alterations), self.inversion)
+            object.__setattr__(self, '_intervals', tuple(interval_data))
+        return self._intervals
+
+    @property
+    def mask(self) -> int:
+        if self._mask is None:
+            object.__setattr__(self, '_mask', pitch_class.intervals_to_mask(self.intervals))
+        return self._mask
+
+    @property
+    def notes(self) -> tuple[str, ...]:
+        if self._notes is None:
+            object.__setattr__(self, '_notes', tuple(helperfunc.get_chord_notes(self.key_base, list(self.intervals), self.inversion)))
+        return self._notes
+
+    @property
+    def notes_alt(self) -> tuple[str, ...]:
+        if self._notes_alt is None:
+            note_data_alt = helperfunc.get_chord_notes(self.key_base, list(self.intervals), self.inversion, lower_octave=True)
+            object.__setattr__(self, '_notes_alt', tuple(note_data_alt))
+        return self._notes_alt
+
+    @property
+    def label(self) -> str:
+        """
+        quality + alterations, the second half of a roman numeral
+        """
+        if self._label is None:
+            object.__setattr__(self, '_label', f"{self.quality}{''.join(self.alterations)}")
+        return self._label
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Chord is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Chord is immutable, cannot delete {name}")
+
+    def __repr__(self) -> str:
+        return f"Chord({self.chord!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Chord):
+            return NotImplemented
+        return self.chord == other.chord
+
+    def __hash__(self) -> int:
+        return hash(self.chord)
+
+    def __reduce__(self):
+        return from_symbol, (self.chord,)
+
+    @property
+    def absolute_mask(self) -> int:
+        return pitch_class.to_absolute(self.mask, self.root)
+
+    def to_dict(self, annotations: dict | None = None) -> dict:
+        chord_data = {
+            'chord': self.chord,
+            'key_base': self.key_base,
+            'quality': self.quality,
+            'alterations': list(self.alterations),
+            'inversion': self.inversion,
+            'intervals': list(self.intervals),
+            'notes': list(self.notes),
+            'notes_alt': list(self.notes_alt)
+        }
+
+        if annotations:
+            chord_data.update(annotations)
+
+        return chord_data
+
+@lru_cache(maxsize=RECORD_CACHE_SIZE)
+def from_symbol(chord: str) -> Chord:
+    # records are immutable, so every occurrence of a symbol can share one (and its lazily filled fields)
+    main_data = helperfunc.get_chord_info(chord)
+
+    return Chord(chord, main_data['base_key'], main_data['quality'], main_data['alterations'], main_data['inversion'])
+
+def to_dicts(chords_input: list[Chord], annotations: list[dict] | None = None) -> list[dict]:
+    if annotations is None:
+        return [chord.to_dict() for chord in chords_input]
+
+    return [chord.to_dict(annotation) for chord, annotation in zip(chords_input, annotations)]
@@ -0,0 +1,290 @@
+import argparse
+import json
+import mmap
+import numpy as np
+import chord_record
+import pitch_class
+
+# Struct-of-arrays version of the pipeline output (what chord_record.to_dicts gives per chord), for many songs.
+#
+# Every string goes through one shared string table and is stored as an int32 code (-1 = key not there).
+# Per-chord lists are ragged columns: a flat values array plus an offsets array, chord i owning
+# values[offsets[i]:offsets[i + 1]]. Note differences use NO_DIFFERENCE where the dicts have None, and
+# the 'cadences' dict of find_cadences is two ragged columns side by side, pattern names and their labels.
+# A chord dict with a key none of the columns hold is an error rather than being dropped.
+#
+# File layout: MAGIC, uint64 little endian header length, JSON header (string table + where every array
+# sits), then the raw arrays, each starting on a multiple of ALIGNMENT so load() can map them without copying.
+
+MAGIC = b"CHRDCOL1"
+ALIGNMENT = 64
+NO_DIFFERENCE = np.iinfo(np.int32).min
+MISSING = -1
+
+BASE_COLUMNS = ('chord', 'key_base', 'quality', 'inversion')
+ANNOTATION_COLUMNS = ('roman_numeral_251', 'roman_numeral_251_tritone', 'roman_numeral_51', 'roman_numeral_51_tritone',
+                      'parallel_mode_shift')
+AHEAD_COLUMNS = ('1_ahead', '2_ahead', '3_ahead', '4_ahead')
+RAGGED_STRING_COLUMNS = ('alterations', 'intervals', 'notes', 'notes_alt')
+RAGGED_INT_COLUMNS = ('next_chord_note_difference', 'next_chord_note_difference_strict', 'next_chord_note_difference_very_strict')
+CADENCE_COLUMNS = ('cadence_pattern', 'cadence_label')
+
+STORED_KEYS = frozenset(BASE_COLUMNS + ANNOTATION_COLUMNS + RAGGED_STRING_COLUMNS + RAGGED_INT_COLUMNS
+                        + ('roman_numeral', 'chord_next_relative', 'cadences'))
+
+class _Builder:
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+        self.song_offsets = [0]
+        self.song_keys = []
+        self.columns = {name: [] for name in BASE_COLUMNS + ('roman_numeral', 'roman_quality') + ANNOTATION_COLUMNS + AHEAD_COLUMNS}
+        self.ragged = {name: ([], [0]) for name in RAGGED_STRING_COLUMNS + RAGGED_INT_COLUMNS + CADENCE_COLUMNS}
+        self.roots = []
+        self.masks = []
+        self.has_relative = False
+        self.has_cadences = False
+
+    def code(self, string: str | None) -> int:
+        if string is None:
+            return MISSING
+
+        code = self.codes.get(string)
+        if code is None:
+            code = self.codes[string] = len(self.strings)
+            self.strings.append(string)
+
+        return code
+
+    def add_song(self, song_key: str, chords_data: list[dict]) -> None:
+        columns, ragged, code = self.columns, self.ragged, self.code
+
+        for chord_data in chords_data:
+            unknown = chord_data.keys() - STORED_KEYS
+            if unknown:
+                raise ValueError(f"No column for {sorted(unknown)} in the columnar format")
+
+            for name in BASE_COLUMNS + ANNOTATION_COLUMNS:
+                columns[name].append(code(chord_data.get(name)))
+
+            roman_numeral = chord_data.get('roman_numeral') or (None, None)
+            columns['roman_numeral'].append(code(roman_numeral[0]))
+            columns['roman_quality'].append(code(roman_numeral[1]))
+
+            relative = chord_data.get('chord_next_relative')
+            self.has_relative |= relative is not None
+            for name in AHEAD_COLUMNS:
+                columns[name].append(code(relative.get(name)) if relative else MISSING)
+
+            for name in RAGGED_STRING_COLUMNS:
+                values, offsets = ragged[name]
+                values.extend(code(value) for value in chord_data.get(name, ()))
+                offsets.append(len(values))
+
+            for name in RAGGED_INT_COLUMNS:
+                values, offsets = ragged[name]
+                values.extend(NO_DIFFERENCE if value is None else value for value in chord_data.get(name, ()))
+                offsets.append(len(values))
+
+            cadences = chord_data.get('cadences')
+            self.has_cadences |= cadences is not None
+            cadences = cadences or {}
+            for name, strings in zip(CADENCE_COLUMNS, (cadences.keys(), cadences.values())):
+                values, offsets = ragged[name]
+                values.extend(code(string) for string in strings)
+                offsets.append(len(values))
+
+            self.roots.append(pitch_class.KEY_TO_PITCH_CLASS[chord_data['key_base']])
+            self.masks.append(pitch_class.intervals_to_mask(chord_data['intervals']))
+
+        self.song_keys.append(code(song_key))
+        self.song_offsets.append(self.song_offsets[-1] + len(chords_data))
+
+    def build(self) -> 'ColumnarResult':
+        arrays = {
+            'song_offsets': np.array(self.song_offsets, dtype=np.int64),
+            'song_key': np.array(self.song_keys, dtype=np.int32),
+            'root': np.array(self.roots, dtype=np.int8),
+            'mask': np.array(self.masks, dtype=np.uint16),
+        }
+        for name, values in self.columns.items():
+            if name in BASE_COLUMNS or any(code != MISSING for code in values):
+                arrays[name] = np.array(values, dtype=np.int32)
+        for name, (values, offsets) in self.ragged.items():
+            if len(values) or name in RAGGED_STRING_COLUMNS or name in CADENCE_COLUMNS and self.has_cadences:
+                arrays[f"{name}.values"] = np.array(values, dtype=np.int32)
+                arrays[f"{name}.offsets"] = np.array(offsets, dtype=np.int64)
+
+        return ColumnarResult(arrays, self.strings, {'chord_next_relative': self.has_relative, 'cadences': self.has_cadences})
+
+class ColumnarResult:
+    """
+    arrays are numpy arrays (read-only views into the file when loaded), strings the shared string table
+    """
+    def __init__(self, arrays: dict[str, np.ndarray], strings: list[str], flags: dict | None = None, buffer=None):
+        self.arrays = arrays
+        self.strings = strings
+        self.flags = flags or {}
+        self._buffer = buffer
+        self._codes = None
+
+    def __len__(self) -> int:
+        return int(self.arrays['song_offsets'][-1])
+
+    @property
+    def song_count(self) -> int:
+        return len(self.arrays['song_offsets']) - 1
+
+    def song_slice(self, song: int) -> slice:
+        offsets = self.arrays['song_offsets']
+        return slice(int(offsets[song]), int(offsets[song + 1]))
+
+    def code(self, string: str) -> int:
+        """
+        :return: the code of string, MISSING if it never occurs (so comparisons against it match nothing)
+        """
+        if self._codes is None:
+            self._codes = {string: code for code, string in enumerate(self.strings)}
+
+        return self._codes.get(string, MISSING)
+
+    def decode(self, name: str) -> list[str | None]:
+        strings = self.strings
+        return [strings[code] if code != MISSING else None for code in self.arrays[name].tolist()]
+
+    def ragged(self, name: str, chord: int) -> np.ndarray:
+        offsets = self.arrays[f"{name}.offsets"]
+        return self.arrays[f"{name}.values"][offsets[chord]:offsets[chord + 1]]
+
+    def to_dicts(self, song: int | None = None) -> list[dict]:
+        """
+        :return: chord_record.to_dicts output of one song (or all of them), same keys and values
+        """
+        chord_range = range(len(self)) if song is None else range(*self.song_slice(song).indices(len(self)))
+        strings, arrays = self.strings, self.arrays
+        columns = {name: arrays[name].tolist() for name in arrays if '.' not in name and name not in ('song_offsets', 'song_key', 'root', 'mask')}
+        ragged = {name: (arrays[f"{name}.values"].tolist(), arrays[f"{name}.offsets"].tolist())
+                  for name in RAGGED_STRING_COLUMNS + RAGGED_INT_COLUMNS + CADENCE_COLUMNS if f"{name}.values" in arrays}
+
+        def string(name, chord):
+            return strings[columns[name][chord]]
+
+        chords_data = []
+        for chord in chord_range:
+            chord_data = {}
+            for name in ('chord', 'key_base', 'quality', 'alterations', 'inversion', 'intervals', 'notes', 'notes_alt'):
+                if name in ragged:
+                    values, offsets = ragged[name]
+                    chord_data[name] = [strings[code] for code in values[offsets[chord]:offsets[chord + 1]]]
+                else:
+                    chord_data[name] = string(name, chord)
+
+            if 'roman_numeral' in columns and columns['roman_numeral'][chord] != MISSING:
+                chord_data['roman_numeral'] = [string('roman_numeral', chord), string('roman_quality', chord)]
+
+            for name in ANNOTATION_COLUMNS:
+                if name in columns and columns[name][chord] != MISSING:
+                    chord_data[name] = string(name, chord)
+
+            for name in RAGGED_INT_COLUMNS:
+                if name in ragged:
+                    values, offsets = ragged[name]
+                    differences = values[offsets[chord]:offsets[chord + 1]]
+                    if differences:
+                        chord_data[name] = [None if value == NO_DIFFERENCE else value for value in differences]
+
+            if self.flags.get('chord_next_relative'):
+                chord_data['chord_next_relative'] = {name: string(name, chord) for name in AHEAD_COLUMNS
+                                                     if name in columns and columns[name][chord] != MISSING}
+
+            if self.flags.get('cadences'):
+                (patterns, pattern_offsets), (labels, label_offsets) = (ragged[name] for name in CADENCE_COLUMNS)
+                chord_data['cadences'] = {
+                    strings[pattern]: strings[label]
+                    for pattern, label in zip(patterns[pattern_offsets[chord]:pattern_offsets[chord + 1]],
+                                              labels[label_offsets[chord]:label_offsets[chord + 1]])
+                }
+
+            chords_data.append(chord_data)
+
+        return chords_data
+
+    def save(self, path: str) -> None:
+        layout = {}
+        position = 0
+        for name, array in self.arrays.items():
+            position = -(-position // ALIGNMENT) * ALIGNMENT
+            layout[name] = {'dtype': array.dtype.str, 'count': len(array), 'offset': position}
+            position += array.nbytes
+
+        header = json.dumps({'version': 1, 'strings': self.strings, 'flags': self.flags, 'arrays': layout},
+                            ensure_ascii=False).encode('utf-8')
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(len(header).to_bytes(8, 'little'))
+            file.write(header)
+            for name, array in self.arrays.items():
+                file.seek(data_start + layout[name]['offset'])
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(data_start + position)
+
+    @classmethod
+    def load(cls, path: str) -> 'ColumnarResult':
+        """
+        Maps the file read-only, the arrays are views into it (nothing is copied or parsed but the header)
+        """
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(MAGIC)] != MAGIC:
+            buffer.close()
+            raise ValueError(f"{path} is not a columnar chord file")
+
+        header_length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], 'little')
+        header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length].decode('utf-8'))
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+        arrays = {
+            name: np.frombuffer(buffer, dtype=np.dtype(spec['dtype']), count=spec['count'], offset=data_start + spec['offset'])
+            for name, spec in header['arrays'].items()
+        }
+
+        return cls(arrays, header['strings'], header['flags'], buffer)
+
+def from_dicts(songs) -> ColumnarResult:
+    """
+    :param songs: (song key, chord_record.to_dicts output) pairs
+    """
+    builder = _Builder()
+    for song_key, chords_data in songs:
+        builder.add_song(song_key, chords_data)
+
+    return builder.build()
+
+def from_analysis(songs) -> ColumnarResult:
+    """
+    :param songs: (song key, chords, annotations from main.analyze) triples
+    """
+    return from_dicts((song_key, chord_record.to_dicts(chords, annotations)) for song_key, chords, annotations in songs)
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert batch.py JSONL output to the columnar binary format")
+    parser.add_argument('input', help="batch.py output")
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args(argv)
+
+    def songs():
+        with open(args.input, encoding='utf-8') as file:
+            for line in file:
+                result = json.loads(line)
+                if 'chords' in result:
+                    yield result['key'], result['chords']
+
+    result = from_dicts(songs())
+    result.save(args.output)
+    print(f"{result.song_count} songs, {len(result)} chords, {len(result.strings)} distinct strings")
+
+if __name__ == "__main__":
+    main_cli()
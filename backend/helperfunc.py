@@ -1,14 +1,20 @@
 import re
+import chord_parser
 from chord_database import *
 
 def note_to_midi(note: str) -> int:
-    # split note and octave
-    if note[-2] in ("#", "b"):
-        pitch = note[:-2]
-        octave = int(note[-2:])
+    midi = NOTE_TO_MIDI.get(note)
+    if midi is not None:
+        return midi
+
+    # not one of the 128 names, the parse below says what is wrong with it
+    # split note and octave (octave can be negative, C-1 is midi 0)
+    if note[1:2] in ("#", "b"):
+        pitch = note[:2]
+        octave = int(note[2:])
     else:
-        pitch = note[:-1]
-        octave = int(note[-1])
+        pitch = note[:1]
+        octave = int(note[1:])
 
     if pitch not in KEY_TO_NUMBER:
         raise ValueError(f"Invalid note name: {note}")
@@ -24,14 +30,11 @@ def midi_to_note(midi: int) -> str:
     if not 0 <= midi <= 127:
         raise ValueError("MIDI must be between 0 and 127")
 
-    number = midi % 12
-    octave = (midi // 12) - 1
-
-    return f"{NUMBER_TO_KEY[number]}{octave}"
+    return MIDI_TO_NOTE[midi]
 
 def apply_slash_inversion(semitones: list[int], bass_note: str) -> list[int]:
 
-    bass_pc = KEY_TO_NUMBER[bass_note] % 12
+    bass_pc = (KEY_TO_NUMBER[bass_note] - 1) % 12
 
     # find index of bass note in chord
     bass_index = None
@@ -76,35 +79,12 @@ def get_chord_info(chord: str) -> dict:
     :return: Base key, Quality, Alterations, Inversion
     """
 
-    qualities = sorted(
-        (q for q in CHORD_INTERVALS.keys() if q),
-        key=len,
-        reverse=True
-    )
-    regex_quality_key = "|".join(re.escape(q) for q in qualities)
-
-    chord_data = re.findall(rf'([CDEFGAB][#b]?)({regex_quality_key})?((?:(?:[b#]|(?:no|omit|add|sus)?)(?:2|3|4|5|6|7|9|11|13)?)*)(?:\/([CDEFGAB][#b]?))?', chord)
-    alterations = re.findall(r'(?:no|omit|sus|add|[#b])?(?:2|3|4|5|6|7|9|11|13)', chord_data[0][2])
-
-    try:
-        base_key = chord_data[0][0]
-    except IndexError:
-        Exception("Not a valid chord")
-
-    try:
-        quality = chord_data[0][1]
-    except IndexError:
-        quality = ''
-
-    try:
-        inversion = chord_data[0][3]
-    except IndexError:
-        inversion = ''
+    base_key, quality, alterations, inversion = chord_parser.parse_chord(chord)
 
     return {
         "base_key": base_key,
         "quality": quality,
-        "alterations": alterations,
+        "alterations": list(alterations),
         "inversion": inversion,
     }
 
@@ -143,8 +123,12 @@ def get_intervals(base_key: str, quality: str, alterations: list[str], inversion
 
     return output_list
 
-def get_chord_notes(key_base: str, interval_list: list[str], inversion: str | None, lower_octave=False) -> list:
-    key_base_number = KEY_TO_NUMBER[key_base]
+def get_chord_semitones(key_base: str, interval_list: list[str], inversion: str | None, lower_octave=False) -> list[int]:
+    """
+    :return: the midi numbers get_chord_notes spells, in the same order
+    """
+    # KEY_TO_NUMBER counts from 1 (C = 1), midi pitch classes from 0
+    key_base_number = KEY_TO_NUMBER[key_base] - 1
 
     semitone_list = []
 
@@ -155,15 +139,22 @@ def get_chord_notes(key_base: str, interval_list: list[str], inversion: str | No
     if inversion:
         semitone_list = apply_slash_inversion(semitone_list, inversion)
 
-    notes = [midi_to_note(s) for s in semitone_list]
+    return semitone_list
+
+def get_chord_notes(key_base: str, interval_list: list[str], inversion: str | None, lower_octave=False) -> list:
+    """
+    :return: note names, each spelled by a lookup in its interval's INTERVAL_TO_SPELLING table
+    """
+    semitone_list = get_chord_semitones(key_base, interval_list, None, lower_octave)
+    spellings = [INTERVAL_TO_SPELLING[interval] for interval in interval_list]
 
-    for note, interval, counter in zip(notes, interval_list, range(len(interval_list))):
-        if bool(re.match(r"#", interval)) and bool(re.match(r".b", note)):
-            notes[counter] = GET_EQUIV_ACCIDENTAL[notes[counter]]
-        elif bool(re.match(r"b", interval)) and bool(re.match(r".#", note)):
-            notes[counter] = GET_EQUIV_ACCIDENTAL[notes[counter]]
+    if inversion:
+        inverted = apply_slash_inversion(semitone_list, inversion)
+        # the intervals move along with their notes
+        shift = semitone_list.index(inverted[0])
+        semitone_list, spellings = inverted, spellings[shift:] + spellings[:shift]
 
-    return notes
+    return [spelling[midi] for spelling, midi in zip(spellings, semitone_list)]
 
 if __name__ == "__main__":
     chord_interval_tests = [
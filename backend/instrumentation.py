@@ -0,0 +1,252 @@
+import argparse
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+import chord_parser
+import chord_record
+import helperfunc
+import key_detection
+import main
+import pattern_engine
+import voice_leading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Optional timing layer over the pipeline. enable() swaps the module and class attributes below for timing
+# wrappers and disable() puts the originals back, so while it is off nothing is wrapped and it costs nothing.
+# Everything calls these through the module or class (helperfunc.get_intervals, main.get_cadence_parts,
+# patterns.find_all ...), so the wrappers see it all.
+
+INSTRUMENTED = {
+    main: ('extract_chords', 'get_base_info', 'get_roman_numeral', 'get_roman_numeral_list', 'get_roman_numerals',
+           'get_cadence_parts', 'get_relative_label', 'get_parallel_mode_shift', 'get_note_differences',
+           'get_note_difference_list', 'find_251_movement', 'find_51_movement', 'find_cadences',
+           'find_parallel_minor', 'find_neighbouring_next_notes', 'find_chord_relative_to_next', 'analyze'),
+    pattern_engine.PatternSet: ('find_all', 'resolve'),
+    helperfunc: ('get_chord_info', 'get_intervals', 'get_chord_semitones', 'get_chord_notes', 'note_to_midi',
+                 'midi_to_note', 'apply_slash_inversion'),
+    # analyze spends most of its time in these two (the key only when none is given)
+    voice_leading: ('note_differences',),
+    key_detection: ('detect_key',),
+}
+
+# every chord enters the pipeline through this one, its input length is what per-chord times divide by
+CHORD_COUNTER = 'main.get_base_info'
+
+METRIC_PREFIX = 'chord_analyzer'
+
+class Metrics:
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.chords = 0
+
+    def clear(self) -> None:
+        # zeroed rather than emptied, the wrappers hold on to these dicts
+        for name in self.calls:
+            self.calls[name] = 0
+            self.seconds[name] = 0.0
+        self.chords = 0
+
+METRICS = Metrics()
+
+_originals = {}
+_trace_memory = False
+
+def _wrap(name: str, function):
+    calls, seconds = METRICS.calls, METRICS.seconds
+    calls.setdefault(name, 0)
+    seconds.setdefault(name, 0.0)
+    perf_counter = time.perf_counter
+    counts_chords = name == CHORD_COUNTER
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds[name] += perf_counter() - start
+            calls[name] += 1
+            if counts_chords:
+                METRICS.chords += len(args[0])
+
+    wrapper.__wrapped__ = function
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+
+    return wrapper
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    :param trace_memory: also track the peak of Python allocations with tracemalloc (slows everything down)
+    """
+    global _trace_memory
+
+    if is_enabled():
+        return
+
+    for owner, names in INSTRUMENTED.items():
+        prefix = f"{owner.__module__}.{owner.__qualname__}" if isinstance(owner, type) else owner.__name__
+        for name in names:
+            function = getattr(owner, name)
+            _originals[(owner, name)] = function
+            setattr(owner, name, _wrap(f"{prefix}.{name}", function))
+
+    _trace_memory = trace_memory and not tracemalloc.is_tracing()
+    if _trace_memory:
+        tracemalloc.start()
+
+def disable() -> None:
+    global _trace_memory
+
+    for (owner, name), function in _originals.items():
+        setattr(owner, name, function)
+    _originals.clear()
+
+    if _trace_memory:
+        tracemalloc.stop()
+        _trace_memory = False
+
+@contextmanager
+def instrumented(trace_memory: bool = False):
+    enable(trace_memory)
+    try:
+        yield METRICS
+    finally:
+        disable()
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def cache_stats() -> dict[str, dict]:
+    caches = {'parse': chord_parser.cache_info()}
+
+    for name, function in (('chord_record', chord_record.from_symbol), ('chord_midi', voice_leading.chord_midi)):
+        info = function.cache_info()
+        caches[name] = {"hits": info.hits, "misses": info.misses, "hit_rate": _hit_rate(info.hits, info.misses),
+                        "size": info.currsize, "max_size": info.maxsize}
+
+    for name, stats in main.window_cache_info().items():
+        if name != 'total':
+            caches[f"window_{name}"] = stats
+
+    return caches
+
+def memory_stats() -> dict:
+    """
+    :return: tracemalloc peak (when tracing) and the process peak RSS (where the platform has it), in bytes
+    """
+    memory = {}
+    if tracemalloc.is_tracing():
+        memory["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        memory["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    return memory
+
+def report() -> dict:
+    functions = {}
+    for name, calls in METRICS.calls.items():
+        if not calls:
+            continue
+        seconds = METRICS.seconds[name]
+        functions[name] = {
+            "calls": calls,
+            "seconds": seconds,
+            "per_call_us": seconds / calls * 1e6,
+            "per_chord_us": seconds / METRICS.chords * 1e6 if METRICS.chords else None,
+        }
+
+    return {"chords": METRICS.chords, "functions": functions, "caches": cache_stats(), "memory": memory_stats()}
+
+def to_json(report_data: dict | None = None) -> str:
+    return json.dumps(report_data or report(), indent=4)
+
+def _prometheus_block(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> list[str]:
+    lines = [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {kind}"]
+    lines += [f"{METRIC_PREFIX}_{name}{labels} {value}" for labels, value in samples]
+    return lines
+
+def to_prometheus(report_data: dict | None = None) -> str:
+    """
+    :return: the report in the Prometheus text exposition format
+    """
+    report_data = report_data or report()
+    functions, caches, memory = report_data["functions"], report_data["caches"], report_data["memory"]
+
+    lines = _prometheus_block("chords_total", "counter", "Chords that went through get_base_info", [("", report_data["chords"])])
+    lines += _prometheus_block("calls_total", "counter", "Calls per pipeline function",
+                               [(f'{{function="{name}"}}', stats["calls"]) for name, stats in functions.items()])
+    lines += _prometheus_block("seconds_total", "counter", "Cumulative seconds per pipeline function, callees included",
+                               [(f'{{function="{name}"}}', stats["seconds"]) for name, stats in functions.items()])
+    lines += _prometheus_block("cache_hits_total", "counter", "Cache hits",
+                               [(f'{{cache="{name}"}}', stats["hits"]) for name, stats in caches.items()])
+    lines += _prometheus_block("cache_misses_total", "counter", "Cache misses",
+                               [(f'{{cache="{name}"}}', stats["misses"]) for name, stats in caches.items()])
+    lines += _prometheus_block("cache_hit_ratio", "gauge", "Cache hit rate",
+                               [(f'{{cache="{name}"}}', stats["hit_rate"]) for name, stats in caches.items()])
+    lines += _prometheus_block("memory_peak_bytes", "gauge", "Peak memory",
+                               [(f'{{kind="{name.removesuffix("_bytes")}"}}', value) for name, value in memory.items()])
+
+    return "\n".join(lines) + "\n"
+
+def run_pipeline(text_input: str, song_key: str | None = None) -> list[dict]:
+    chords = main.get_base_info(main.extract_chords(text_input))
+    return chord_record.to_dicts(chords, main.analyze(chords, song_key))
+
+def dump_profile(path: str, text_input: str, song_key: str | None = None) -> None:
+    """
+    cProfile of one pipeline run, readable by pstats and the usual viewers (snakeviz, flameprof, gprof2dot)
+    """
+    profiler = cProfile.Profile()
+    profiler.runcall(run_pipeline, text_input, song_key)
+    profiler.dump_stats(path)
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the pipeline over a progression file with instrumentation on")
+    parser.add_argument('input', help="progression text file, - for stdin")
+    parser.add_argument('--key', help="song key (default: detected)")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true', help="track the Python allocation peak with tracemalloc")
+    parser.add_argument('--json', help="write the report as JSON, - for stdout")
+    parser.add_argument('--prometheus', help="write the report in Prometheus text format, - for stdout")
+    parser.add_argument('--profile', help="also dump a cProfile of one uninstrumented run to this file")
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        text_input = sys.stdin.read()
+    else:
+        with open(args.input, encoding='utf-8') as file:
+            text_input = file.read()
+
+    with instrumented(args.trace_memory):
+        for _ in range(args.repeat):
+            run_pipeline(text_input, args.key)
+        report_data = report()
+
+    for path, render in ((args.json, to_json), (args.prometheus, to_prometheus)):
+        if path == '-':
+            print(render(report_data))
+        elif path:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(render(report_data))
+
+    if not args.json and not args.prometheus:
+        print(to_json(report_data))
+
+    if args.profile:
+        dump_profile(args.profile, text_input, args.key)
+
+if __name__ == "__main__":
+    main_cli()
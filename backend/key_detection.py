@@ -0,0 +1,175 @@
+from collections import deque
+import numpy as np
+import pitch_class
+from chord_record import Chord
+
+# Krumhansl-Kessler key finding over chord pitch-class content: a song's pitch-class histogram
+# is correlated with the major and minor key profiles rotated to all 12 tonics, best score wins.
+# Rows 0-11 of the score vector are the major keys C..B, rows 12-23 the minor keys.
+#
+# Counting every chord the same gets the plainest cadences wrong (Dm7 G7 Cmaj7 has as much G major in it
+# as C major), so the last chord and any chord a dominant resolves to count extra, see chord_weights.
+
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+MODES = ("major", "minor")
+
+# flat spellings, the way keys are usually written (all of them are in KEY_TO_NUMBER)
+TONIC_NAMES = ("C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B")
+
+# the root is counted this many extra times, it says more about the key than the upper notes
+ROOT_WEIGHT = 1.0
+# extra weight of the last chord, songs and phrases usually end on the tonic
+FINAL_WEIGHT = 1.0
+# extra weight of a chord a dominant resolves to (V -> I, V7 -> i ...)
+RESOLUTION_WEIGHT = 1.0
+
+def _profile_matrix() -> np.ndarray:
+    """
+    :return: (24, 12) profiles rotated to every tonic, centered and scaled to unit length so a dot
+             product with a centered, unit length histogram is the correlation
+    """
+    rows = [np.roll(np.array(profile), tonic) for profile in (MAJOR_PROFILE, MINOR_PROFILE) for tonic in range(pitch_class.PITCH_CLASS_COUNT)]
+    profiles = np.array(rows)
+    profiles -= profiles.mean(axis=1, keepdims=True)
+    profiles /= np.linalg.norm(profiles, axis=1, keepdims=True)
+
+    return profiles
+
+KEY_PROFILES = _profile_matrix()
+
+# (4096, 12) 0/1 rows, pitch-class mask -> histogram contribution
+MASK_TO_VECTOR = ((np.arange(pitch_class.FULL_MASK + 1)[:, None] >> np.arange(pitch_class.PITCH_CLASS_COUNT)) & 1).astype(np.float64)
+
+def resolves(chord_1: Chord, chord_2: Chord) -> bool:
+    """
+    :return: True if chord_1 is a dominant of chord_2: its root a fifth above and a major third but no major seventh
+    """
+    return ((chord_1.root - chord_2.root) % pitch_class.PITCH_CLASS_COUNT == 7
+            and bool(chord_1.mask & pitch_class.MAJOR_THIRD) and not chord_1.mask & pitch_class.MAJOR_SEVENTH)
+
+def chord_weights(chords_input: list[Chord]) -> np.ndarray:
+    """
+    :return: (chords,) how much each chord counts, 1 plus FINAL_WEIGHT for the last and RESOLUTION_WEIGHT for resolutions
+    """
+    weights = np.ones(len(chords_input))
+    if len(chords_input):
+        weights[-1] += FINAL_WEIGHT
+    for counter in range(1, len(chords_input)):
+        if resolves(chords_input[counter - 1], chords_input[counter]):
+            weights[counter] += RESOLUTION_WEIGHT
+
+    return weights
+
+def pitch_class_histogram(chords_input: list[Chord]) -> np.ndarray:
+    """
+    :return: (12,) how often each pitch class shows up in the chords, roots weighted by ROOT_WEIGHT
+             and every chord by chord_weights
+    """
+    masks = np.fromiter((chord.absolute_mask for chord in chords_input), dtype=np.int64, count=len(chords_input))
+    roots = np.fromiter((chord.root for chord in chords_input), dtype=np.int64, count=len(chords_input))
+    weights = chord_weights(chords_input)
+
+    return weights @ MASK_TO_VECTOR[masks] + np.bincount(roots, weights=weights, minlength=pitch_class.PITCH_CLASS_COUNT) * ROOT_WEIGHT
+
+def histogram_matrix(songs: list[list[Chord]]) -> np.ndarray:
+    """
+    :return: (songs, 12) pitch_class_histogram of every song, computed over all chords of all songs at once
+    """
+    lengths = np.fromiter((len(song) for song in songs), dtype=np.int64, count=len(songs))
+    total = int(lengths.sum())
+    masks = np.fromiter((chord.absolute_mask for song in songs for chord in song), dtype=np.int64, count=total)
+    roots = np.fromiter((chord.root for song in songs for chord in song), dtype=np.int64, count=total)
+    weights = np.concatenate([chord_weights(song) for song in songs] + [np.zeros(0)])
+
+    # per-song sums as differences of a running total, works for empty songs too
+    running = np.zeros((total + 1, pitch_class.PITCH_CLASS_COUNT))
+    np.cumsum(MASK_TO_VECTOR[masks] * weights[:, None], axis=0, out=running[1:])
+    ends = np.cumsum(lengths)
+    histograms = running[ends] - running[ends - lengths]
+
+    song_ids = np.repeat(np.arange(len(songs)), lengths)
+    root_counts = np.bincount(song_ids * pitch_class.PITCH_CLASS_COUNT + roots, weights=weights,
+                              minlength=len(songs) * pitch_class.PITCH_CLASS_COUNT)
+
+    return histograms + root_counts.reshape(len(songs), pitch_class.PITCH_CLASS_COUNT) * ROOT_WEIGHT
+
+def key_scores(histograms: np.ndarray) -> np.ndarray:
+    """
+    :param histograms: (12,) or (songs, 12)
+    :return: correlation with every key, (24,) or (songs, 24); all 0 for an empty or flat histogram
+    """
+    centered = histograms - histograms.mean(axis=-1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=-1, keepdims=True)
+    centered = np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+
+    return centered @ KEY_PROFILES.T
+
+def best_key(scores: np.ndarray) -> tuple[str, str, float]:
+    """
+    :return: (tonic, "major" or "minor", correlation) of the best scoring key, ties go to the major key / lower tonic
+    """
+    key = int(scores.argmax())
+    return TONIC_NAMES[key % pitch_class.PITCH_CLASS_COUNT], MODES[key // pitch_class.PITCH_CLASS_COUNT], float(scores[key])
+
+def estimate_key(chords_input: list[Chord]) -> tuple[str, str, float]:
+    return best_key(key_scores(pitch_class_histogram(chords_input)))
+
+def detect_key(chords_input: list[Chord]) -> str:
+    """
+    :return: the tonic of the most likely key, usable as song_key (numerals are relative to the tonic either way)
+    """
+    return estimate_key(chords_input)[0]
+
+def detect_keys(songs: list[list[Chord]]) -> list[str]:
+    """
+    detect_key for many songs at once, one (songs, 12) x (12, 24) product
+    """
+    keys = key_scores(histogram_matrix(songs)).argmax(axis=1) % pitch_class.PITCH_CLASS_COUNT
+    return [TONIC_NAMES[key] for key in keys.tolist()]
+
+class KeyEstimator:
+    """
+    Running key estimate for chords that arrive one at a time, add() is O(12) and key() a (24, 12) dot product.
+    Chords are weighted like chord_weights: a resolution is judged against the chord added before it and the
+    last chord added gets FINAL_WEIGHT on top when scoring.
+    """
+    def __init__(self):
+        self.histogram = np.zeros(pitch_class.PITCH_CLASS_COUNT)
+        self.count = 0
+        # (chord, unweighted vector, weight) of every chord still counted, oldest first
+        self.window = deque()
+
+    def add(self, chord: Chord) -> None:
+        vector = MASK_TO_VECTOR[chord.absolute_mask].copy()
+        vector[chord.root] += ROOT_WEIGHT
+        weight = 1.0
+        if self.window and resolves(self.window[-1][0], chord):
+            weight += RESOLUTION_WEIGHT
+
+        self.window.append((chord, vector, weight))
+        self.histogram += vector * weight
+        self.count += 1
+
+    def remove(self, chord: Chord) -> None:
+        """
+        For sliding windows, chord has to be the oldest one still added
+        """
+        if not self.window or self.window[0][0] is not chord:
+            raise ValueError(f"{chord.chord} is not the oldest chord in the estimator")
+
+        _, vector, weight = self.window.popleft()
+        self.histogram -= vector * weight
+        self.count -= 1
+
+    def scores(self) -> np.ndarray:
+        if not self.window:
+            return key_scores(self.histogram)
+        return key_scores(self.histogram + self.window[-1][1] * FINAL_WEIGHT)
+
+    def key(self) -> tuple[str, str, float]:
+        """
+        :return: same as estimate_key over every chord added so far
+        """
+        return best_key(self.scores())
@@ -0,0 +1,148 @@
+import argparse
+import json
+import numpy as np
+import main
+import pitch_class
+from chord_record import Chord
+from key_detection import MODES, TONIC_NAMES
+
+# Roman numerals and harmonic functions of a progression against every key at once, the building block for
+# modulation detection and ambiguity scoring (instead of calling get_roman_numerals once per key).
+#
+# Every chord is reduced to one code, root * 2 + 1 if the quality has a minor third, and the numeral and
+# function of each of the 24 codes in each of the 24 keys is worked out when the module loads. The
+# (keys, chords) matrices are then a single column gather from those (keys, 24) tables, so all 24 keys cost
+# about as much as labelling the chords in one key. Rows follow key_detection: 0-11 the major keys C..B,
+# 12-23 the minor keys. Numerals are relative to the tonic in both modes (same as get_roman_numeral gives
+# them), the mode only changes the functions.
+#
+# Functions: T tonic, S subdominant (predominant), D dominant, "" for a chord outside the key.
+
+KEY_NAMES = tuple(f"{tonic} {mode}" for mode in MODES for tonic in TONIC_NAMES)
+
+# (interval above the tonic, minor third?) -> function, diatonic triads only
+MAJOR_FUNCTIONS = {(0, 0): "T", (2, 1): "S", (4, 1): "T", (5, 0): "S", (7, 0): "D", (9, 1): "T", (11, 1): "D"}
+# natural and harmonic minor, so both v and V (and vii and VII) are dominants
+MINOR_FUNCTIONS = {(0, 1): "T", (2, 1): "S", (3, 0): "T", (5, 1): "S", (7, 0): "D", (7, 1): "D", (8, 0): "S",
+                   (10, 0): "D", (11, 1): "D"}
+
+CHORD_CODES = pitch_class.PITCH_CLASS_COUNT * 2
+
+# (key row, chord code) -> numeral / function, the major and minor rows of a tonic share their numerals
+NUMERAL_ROWS = np.array([
+    main.ROMAN_NUMERAL_TABLE[tonic * CHORD_CODES:(tonic + 1) * CHORD_CODES]
+    for functions in (MAJOR_FUNCTIONS, MINOR_FUNCTIONS) for tonic in range(pitch_class.PITCH_CLASS_COUNT)
+])
+FUNCTION_ROWS = np.array([
+    [functions.get(((code // 2 - tonic) % pitch_class.PITCH_CLASS_COUNT, code % 2), "") for code in range(CHORD_CODES)]
+    for functions in (MAJOR_FUNCTIONS, MINOR_FUNCTIONS) for tonic in range(pitch_class.PITCH_CLASS_COUNT)
+])
+
+class KeyMatrix:
+    """
+    :param keys: name of every row
+    :param numerals: (keys, chords) roman numeral of every chord in every key
+    :param functions: (keys, chords) function of every chord in every key, "" outside the key
+    :param labels: quality + alterations of every chord, the second half of get_roman_numeral
+    """
+    def __init__(self, keys: tuple[str, ...], numerals: np.ndarray, functions: np.ndarray, labels: list[str]):
+        self.keys = keys
+        self.numerals = numerals
+        self.functions = functions
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def roman_numerals(self, row: int) -> list[list[str]]:
+        """
+        :return: get_roman_numeral_list of the chords in the key of that row
+        """
+        return [[numeral, label] for numeral, label in zip(self.numerals[row].tolist(), self.labels)]
+
+    def in_key(self) -> np.ndarray:
+        """
+        :return: (keys, chords) True where the chord has a function in the key
+        """
+        return self.functions != ""
+
+    def fit(self) -> np.ndarray:
+        """
+        :return: (keys,) share of the chords that belong to each key, 0 for no chords
+        """
+        return self.in_key().mean(axis=1) if self.labels else np.zeros(len(self.keys))
+
+    def window_fit(self, size: int) -> np.ndarray:
+        """
+        fit over every run of size chords, a sliding window for modulation detection
+        :return: (keys, chords - size + 1), column i is the window starting at chord i
+        """
+        if not 0 < size <= len(self.labels):
+            raise ValueError(f"Window of {size} chords for {len(self.labels)} chords")
+
+        counts = np.zeros((len(self.keys), len(self.labels) + 1), dtype=np.int64)
+        np.cumsum(self.in_key(), axis=1, out=counts[:, 1:])
+
+        return (counts[:, size:] - counts[:, :-size]) / size
+
+    def best_keys(self) -> list[str]:
+        """
+        :return: every key sharing the best fit, more than one means the progression is ambiguous
+        """
+        fit = self.fit()
+        return [self.keys[row] for row in np.flatnonzero(fit == fit.max()).tolist()]
+
+    def to_dict(self) -> dict:
+        return {
+            'keys': list(self.keys),
+            'labels': self.labels,
+            'numerals': self.numerals.tolist(),
+            'functions': self.functions.tolist(),
+            'fit': self.fit().tolist(),
+        }
+
+def chord_codes(chords_input: list[Chord]) -> np.ndarray:
+    """
+    :return: root * 2 + 1 if the quality has a minor third, per chord (the key-free half of roman_numeral_index)
+    """
+    is_minor = main.QUALITY_IS_MINOR
+    return np.array([chord.root * 2 + is_minor[chord.quality] for chord in chords_input], dtype=np.intp)
+
+def analyze_all_keys(chords_input: list[Chord], minor_keys: bool = False) -> KeyMatrix:
+    """
+    :param minor_keys: 24 rows (major then minor keys) instead of the 12 major ones
+    """
+    codes = chord_codes(chords_input)
+    key_count = len(KEY_NAMES) if minor_keys else pitch_class.PITCH_CLASS_COUNT
+
+    return KeyMatrix(
+        KEY_NAMES[:key_count],
+        NUMERAL_ROWS[:key_count].take(codes, axis=1),
+        FUNCTION_ROWS[:key_count].take(codes, axis=1),
+        [chord.label for chord in chords_input],
+    )
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Roman numerals and functions of a progression in every key")
+    parser.add_argument('progression', help="e.g. \"Dm7 - G7 - Cmaj7\"")
+    parser.add_argument('--minor', action='store_true', help="also the 12 minor keys")
+    parser.add_argument('--all', action='store_true', help="list keys the progression does not fit at all too")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    matrix = analyze_all_keys(main.get_base_info(main.extract_chords(args.progression)), args.minor)
+
+    if args.json:
+        print(json.dumps(matrix.to_dict(), ensure_ascii=False))
+        return
+
+    fit = matrix.fit()
+    for row in np.argsort(-fit, kind='stable').tolist():
+        if not fit[row] and not args.all:
+            continue
+        chords = " ".join(f"{numeral}{label}{'/' + function if function else ''}"
+                          for (numeral, label), function in zip(matrix.roman_numerals(row), matrix.functions[row].tolist()))
+        print(f"{matrix.keys[row]:<9} {fit[row]:.2f}  {chords}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,223 @@
+import bisect
+import threading
+import time
+import chord_index
+
+DEBOUNCE_SECONDS = 0.02
+THROTTLE_SECONDS = 0.05
+
+def write_notes_to_set_from_midi(midi, notes: set[int]) -> None:
+    if midi.isNoteOn():
+        notes.add(midi.getNoteNumber())
+    elif midi.isNoteOff():
+        try:
+            notes.remove(midi.getNoteNumber())
+        except KeyError:
+            notes.clear()
+
+class NoteMessage:
+    """
+    Minimal stand-in for rtmidi's MidiMessage, only what write_notes_to_set_from_midi needs
+    """
+    __slots__ = ('note', 'velocity')
+
+    def __init__(self, note: int, velocity: int = 100):
+        self.note = note
+        self.velocity = velocity
+
+    def isNoteOn(self) -> bool:
+        return self.velocity > 0
+
+    def isNoteOff(self) -> bool:
+        return self.velocity == 0
+
+    def getNoteNumber(self) -> int:
+        return self.note
+
+    def __repr__(self) -> str:
+        return f"NoteMessage({self.note}, {self.velocity})"
+
+class MidiSource:
+    """
+    Pushes incoming messages to callback(message, timestamp) from whatever thread it likes
+    """
+    def open(self, callback) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class RtMidiSource(MidiSource):
+    def __init__(self, midiin, port: int = 0, clock=time.perf_counter):
+        self.midiin = midiin
+        self.port = port
+        self.clock = clock
+
+    def open(self, callback) -> None:
+        self.midiin.openPort(self.port)
+        self.midiin.setCallback(lambda message: callback(message, self.clock()))
+
+    def close(self) -> None:
+        self.midiin.cancelCallback()
+        self.midiin.closePort()
+
+class FakeMidiSource(MidiSource):
+    """
+    Plays a fixed list of (delay_seconds, note, velocity) events, velocity 0 is a note off.
+    Nothing happens until play() is called, so tests decide when events arrive.
+    With realtime the delays are waited out with sleep, tests pass a fake clock and a sleep that advances it.
+    """
+    def __init__(self, events: list[tuple[float, int, int]], realtime: bool = False, clock=time.perf_counter,
+                 sleep=time.sleep):
+        self.events = events
+        self.realtime = realtime
+        self.clock = clock
+        self.sleep = sleep
+        self.callback = None
+
+    def open(self, callback) -> None:
+        self.callback = callback
+
+    def close(self) -> None:
+        self.callback = None
+
+    def play(self) -> None:
+        for delay, note, velocity in self.events:
+            if self.realtime and delay > 0:
+                self.sleep(delay)
+            if self.callback is None:
+                return
+            self.callback(NoteMessage(note, velocity), self.clock())
+
+class LatencyHistogram:
+    """
+    Log-spaced buckets from 1us to 10s (10 per decade), percentiles are bucket upper bounds
+    """
+    BUCKET_BOUNDS = tuple(10 ** (exponent / 10) * 1e-6 for exponent in range(71))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+
+        target = self.count * percent / 100
+        running = 0
+        for counter, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target and bucket_count:
+                return self.BUCKET_BOUNDS[counter] if counter < len(self.BUCKET_BOUNDS) else self.max
+
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+def print_label(notes_list: list[int], names: tuple[str, ...]) -> None:
+    print(notes_list, names[:3])
+
+class LiveChordEngine:
+    """
+    Collects note messages from a MidiSource and renders the held chord.
+
+    Note-ons landing within debounce seconds of the first one are treated as one chord event,
+    and render is called at most once every throttle seconds (and only when the label changes).
+    latency holds the note-in -> label-out times.
+    """
+    def __init__(self, index: dict | None = None, render=print_label, debounce: float = DEBOUNCE_SECONDS,
+                 throttle: float = THROTTLE_SECONDS, clock=time.perf_counter):
+        self.index = index if index is not None else chord_index.get_index()
+        self.render = render
+        self.debounce = debounce
+        self.throttle = throttle
+        self.clock = clock
+        self.notes = set()
+        self.latency = LatencyHistogram()
+        self.events = 0
+        self.renders = 0
+
+        self._condition = threading.Condition()
+        self._pending_since = None
+        self._last_render = float("-inf")
+        self._last_label = None
+
+    def on_message(self, message, timestamp: float | None = None) -> None:
+        with self._condition:
+            write_notes_to_set_from_midi(message, self.notes)
+            self.events += 1
+            if self._pending_since is None:
+                self._pending_since = self.clock() if timestamp is None else timestamp
+                self._condition.notify()
+
+    def next_deadline(self) -> float | None:
+        """
+        :return: clock time at which poll has something to do, None when idle
+        """
+        if self._pending_since is None:
+            return None
+
+        return max(self._pending_since + self.debounce, self._last_render + self.throttle)
+
+    def poll(self, now: float | None = None) -> bool:
+        """
+        Renders the pending chord if its debounce and throttle windows have passed
+        :return: True if something was rendered
+        """
+        with self._condition:
+            now = self.clock() if now is None else now
+            deadline = self.next_deadline()
+
+            if deadline is None or now < deadline:
+                return False
+
+            notes_list = sorted(self.notes)
+            names = chord_index.identify(self.index, notes_list)
+            pending_since = self._pending_since
+            self._pending_since = None
+
+            label = (tuple(notes_list), names)
+            if label == self._last_label:
+                return False
+
+            self.render(notes_list, names)
+            self._last_label = label
+            self._last_render = now
+            self.renders += 1
+            self.latency.record(self.clock() - pending_since)
+
+            return True
+
+    def run(self, source: MidiSource, stop: threading.Event | None = None) -> None:
+        """
+        Blocks until stop is set (or KeyboardInterrupt), sleeping until the next chord is due
+        """
+        stop = stop or threading.Event()
+        source.open(self.on_message)
+
+        try:
+            while not stop.is_set():
+                with self._condition:
+                    deadline = self.next_deadline()
+                    timeout = 0.1 if deadline is None else max(deadline - self.clock(), 0.0)
+                    if timeout:
+                        self._condition.wait(min(timeout, 0.1))
+                self.poll()
+        finally:
+            source.close()
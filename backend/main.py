@@ -1,377 +1,394 @@
 import helperfunc
+import pattern_engine
+import chord_parser
+import chord_record
+import pitch_class
+from chord_record import Chord
 from chord_database import *
-import re
 import json
+from functools import lru_cache
 
-def extract_chords(text_input: str) -> list[str]:
-    qualities = sorted(
-        (q for q in CHORD_INTERVALS.keys() if q),
-        key=len,
-        reverse=True
-    )
-    regex_quality_key = "|".join(re.escape(q) for q in qualities)
-
-    chord_data = re.findall(
-        rf'((?:[CDEFGAB][#b]?)(?:{regex_quality_key})?(?:(?:(?:[b#]|(?:no|omit|add|sus)?)(?:2|3|4|5|6|7|9|11|13)?)*)(?:\/(?:[CDEFGAB][#b]?))?)', text_input)
-
-    return chord_data
-
-def get_base_info(chords_input: list[str]) -> list[dict]:
-    chords_data = []
-
-    for chord in chords_input:
-        main_data = helperfunc.get_chord_info(chord)
-        interval_data = helperfunc.get_intervals(**main_data)
-        note_data = helperfunc.get_chord_notes(main_data['base_key'], interval_data, main_data['inversion'])
-        note_data_alt = helperfunc.get_chord_notes(main_data['base_key'], interval_data, main_data['inversion'], lower_octave=True)
-
-        chords_data.append(
-            {
-                'chord': chord,
-                'key_base': main_data['base_key'],
-                'quality': main_data['quality'],
-                'alterations': main_data['alterations'],
-                'inversion': main_data['inversion'],
-                'intervals': interval_data,
-                'notes': note_data,
-                'notes_alt': note_data_alt
-            }
-        )
+# key_detection and voice_leading pull in numpy (most of the import time), so they are imported
+# where they are first needed instead of here. Runs that get a key and skip the note differences never load it.
 
-    return chords_data
+def extract_chords(text_input: str) -> list[str]:
+    return chord_parser.find_chords(text_input)
+
+def iter_extract_chords(path: str, chunk_size: int = chord_parser.CHUNK_SIZE):
+    """
+    Lazy extract_chords for files too big to read into one string, memory maps the file
+    :return: generator of (chord, byte offset)
+    """
+    return chord_parser.iter_chords_mmap(path, chunk_size)
+
+def get_base_info(chords_input: list[str]) -> list[Chord]:
+    return [chord_record.from_symbol(chord) for chord in chords_input]
+
+# every numeral a chord can get: index (key pitch class * 12 + chord root pitch class) * 2 + 1 if the quality has a
+# minor third, so labelling a chord is one lookup instead of key arithmetic and a case change
+ROMAN_NUMERAL_TABLE = tuple(
+    NUMBER_TO_ROMAN[(root - key) % 12 + 1].lower() if minor else NUMBER_TO_ROMAN[(root - key) % 12 + 1]
+    for key in range(12) for root in range(12) for minor in (0, 1)
+)
+
+QUALITY_IS_MINOR = {quality: int(bool(mask & pitch_class.MINOR_THIRD)) for quality, mask in pitch_class.QUALITY_TO_MASK.items()}
+
+def roman_numeral_index(root: int, key_root: int, quality: str) -> int:
+    """
+    :return: where the chord's numeral sits in ROMAN_NUMERAL_TABLE
+    """
+    return (key_root * 12 + root) * 2 + QUALITY_IS_MINOR[quality]
+
+def get_roman_numeral(chord: Chord, song_key: str) -> list[str]:
+    return [ROMAN_NUMERAL_TABLE[roman_numeral_index(chord.root, pitch_class.KEY_TO_PITCH_CLASS[song_key], chord.quality)], chord.label]
+
+def get_roman_numeral_list(chords_input: list[Chord], song_key: str) -> list[list[str]]:
+    """
+    get_roman_numeral of every chord, the key's part of the table index is worked out once for all of them
+    """
+    table, is_minor = ROMAN_NUMERAL_TABLE, QUALITY_IS_MINOR
+    offset = pitch_class.KEY_TO_PITCH_CLASS[song_key] * 24
+
+    return [[table[offset + chord.root * 2 + is_minor[chord.quality]], chord.label] for chord in chords_input]
+
+def get_roman_numerals(chords_input: list[Chord], song_key: str | None = None) -> list[dict]:
+    """
+    :param song_key: None to detect it from the chords
+    :return: one annotation dict per chord, the later find_* stages add to these in place
+    """
+    if song_key is None:
+        import key_detection
+        song_key = key_detection.detect_key(chords_input)
+
+    return [{'roman_numeral': roman} for roman in get_roman_numeral_list(chords_input, song_key)]
+
+# what the 251 / 51 stages put on each chord, shared by get_cadence_parts and streaming.StreamingAnalyzer
+
+NO_251 = {'roman_numeral_251': "", 'roman_numeral_251_tritone': ""}
+NO_51 = {'roman_numeral_51': "", 'roman_numeral_51_tritone': ""}
+
+# Relative labels (chord_next_relative) only look at root motion and chord quality, so they are cached on
+# the pair's transposition-free shape: a G7 -> C worked out once is reused in the other 11 keys. The 251 / 51
+# windows are matched by pattern_engine and need no cache.
+
+WINDOW_CACHE_SIZE = 8192
+
+def window_shape(chord: Chord, target: Chord) -> tuple[int, str, tuple[str, ...]]:
+    """
+    :return: (semitones from target's root up to chord's root, quality, alterations)
+    """
+    return (chord.root - target.root) % 12, chord.quality, chord.alterations
+
+def get_relative_roman(shape: tuple[int, str, tuple[str, ...]]) -> list[str]:
+    """
+    :return: get_roman_numeral of the chord in the key of the target the shape was taken from
+    """
+    interval, quality, alterations = shape
+
+    return [ROMAN_NUMERAL_TABLE[roman_numeral_index(interval, 0, quality)], f"{quality}{"".join(alterations)}"]
+
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def _relative_label_shape(shape: tuple) -> str:
+    chord_roman = get_relative_roman(shape)
+    return f"{chord_roman[0]}{chord_roman[1]}"
+
+WINDOW_CACHES = {'relative_label': _relative_label_shape}
+
+def window_cache_info() -> dict[str, dict]:
+    """
+    :return: hits, misses, hit_rate, size and max_size of every window cache, plus their sum as 'total'
+    """
+    stats = {}
+    for name, function in WINDOW_CACHES.items():
+        info = function.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+    stats['total'] = {field: sum(stat[field] for stat in stats.values()) for field in ("hits", "misses", "size", "max_size")}
+
+    for stat in stats.values():
+        lookups = stat["hits"] + stat["misses"]
+        stat["hit_rate"] = stat["hits"] / lookups if lookups else 0.0
+
+    return stats
+
+def window_cache_clear() -> None:
+    for function in WINDOW_CACHES.values():
+        function.cache_clear()
+
+def annotate_251(match: tuple[str, str, str], target_roman: str) -> tuple[dict, dict, dict]:
+    """
+    :param target_roman: roman numeral of chord 3 in the song key
+    """
+    kind, label_1, label_2 = match
+
+    if kind == '251':
+        return ({'roman_numeral_251': f"{label_1}/{target_roman}", 'roman_numeral_251_tritone': ""},
+                {'roman_numeral_251': f"{label_2}/{target_roman}", 'roman_numeral_251_tritone': ""},
+                NO_251.copy())
+
+    return ({'roman_numeral_251_tritone': f"{label_1}/{target_roman[0]}", 'roman_numeral_251': ""},
+            {'roman_numeral_251_tritone': f"{label_2}/{target_roman[0]}", 'roman_numeral_251': ""},
+            {'roman_numeral_251_tritone': "", 'roman_numeral_251': ""})
 
-def get_roman_numerals(chords_input: list[dict], song_key: str) -> list[dict]:
-    chords_data = []
-    for counter in range(len(chords_input)):
-        chord_data = chords_input[counter].copy()
-        key_number = ((int(KEY_TO_NUMBER[chord_data['key_base']]) - KEY_TO_NUMBER[song_key]) % 12) + 1
+def annotate_51(match: tuple[str, str], target_roman: str) -> tuple[dict, dict]:
+    kind, label_1 = match
+
+    if kind == '51':
+        return ({'roman_numeral_51': f"{label_1}/{target_roman}", 'roman_numeral_51_tritone': ""},
+                NO_51.copy())
+
+    return ({'roman_numeral_51_tritone': f"{label_1}/{target_roman[0]}", 'roman_numeral_51': ""},
+            {'roman_numeral_51_tritone': "", 'roman_numeral_51': ""})
+
+def get_relative_label(chord: Chord, chord_precede: Chord) -> str:
+    return _relative_label_shape(window_shape(chord, chord_precede))
+
+def get_third_quality(chord: Chord) -> str:
+    if 'b3' in chord.intervals:
+        return 'min'
+    elif '3' in chord.intervals:
+        return 'maj'
+    else:
+        return ''
 
-        maj_or_min = "maj"
-        if "b3" in helperfunc.get_intervals("C", chord_data['quality'], [], ""):
-            maj_or_min = "min"
+def get_parallel_mode_shift(chord_1: Chord, chord_2: Chord, target_roman: str) -> str:
+    if chord_1.key_base != chord_2.key_base:
+        return ''
 
-        chord_data['roman_numeral'] = [NUMBER_TO_ROMAN[key_number] if maj_or_min == "maj" else NUMBER_TO_ROMAN[key_number].lower(), f"{chord_data["quality"]}{"".join(chord_data["alterations"])}"]
+    chord_1_quality = get_third_quality(chord_1)
+    chord_2_quality = get_third_quality(chord_2)
 
-        chords_data.append(chord_data)
+    if chord_1_quality == 'maj' and chord_2_quality == 'min':
+        return f'I/{target_roman}'
+    elif chord_1_quality == 'min' and chord_2_quality == 'maj':
+        return f'i/{target_roman}'
+    else:
+        return ''
+
+def get_note_differences(chord_1: Chord, chord_2: Chord) -> dict:
+    chord_1_number = [helperfunc.note_to_midi(note) for note in chord_1.notes]
+    chord_1_number_alt = [helperfunc.note_to_midi(note) for note in chord_1.notes_alt]
+    chord_2_number = [helperfunc.note_to_midi(note) for note in chord_2.notes]
+    chord_2_number_alt = [helperfunc.note_to_midi(note) for note in chord_2.notes_alt]
+
+    difference_list = []
+    difference_list_strict = []
+    difference_list_very_strict = []
+
+    for chord_1_note, chord_1_note_alt in zip(chord_1_number, chord_1_number_alt):
+        holding_number = chord_2_number[0] - chord_1_note
+        holding_number_strict = chord_2_number[0] - chord_1_note
+
+        for chord_2_note, chord_2_note_alt in zip(chord_2_number, chord_2_number_alt):
+            if abs(holding_number) > abs(chord_2_note - chord_1_note):
+                holding_number = chord_2_note - chord_1_note
+            if abs(holding_number) > abs(chord_2_note_alt - chord_1_note):
+                holding_number = chord_2_note_alt - chord_1_note
+            if abs(holding_number) > abs(chord_2_note - chord_1_note_alt):
+                holding_number = chord_2_note - chord_1_note_alt
+            if abs(holding_number) > abs(chord_2_note_alt - chord_1_note_alt):
+                holding_number = chord_2_note_alt - chord_1_note_alt
+
+            if abs(holding_number_strict) > abs(chord_2_note - chord_1_note):
+                holding_number_strict = chord_2_note - chord_1_note
+
+        difference_list.append(holding_number)
+        difference_list_strict.append(holding_number_strict)
+
+    for chord_1_note, chord_2_note in zip(chord_1_number, chord_2_number):
+        difference_list_very_strict.append(chord_2_note - chord_1_note)
+
+    for _ in range(len(chord_1_number) - len(difference_list_very_strict)):
+        difference_list_very_strict.append(None)
+
+    return {
+        'next_chord_note_difference': difference_list,
+        'next_chord_note_difference_strict': difference_list_strict,
+        'next_chord_note_difference_very_strict': difference_list_very_strict
+    }
+
+# the numpy batch (voice_leading) has a fixed cost per call and only pulls ahead of the plain loop somewhere
+# between 8 and 16 chords, depending on chord size (benchmark.py --stages note_differences_scalar
+# note_differences_batch --length N), so shorter progressions stay on the loop and never import numpy
+NOTE_DIFFERENCE_BATCH_MIN = 16
+
+def get_note_difference_list(chords_input: list[Chord]) -> list[dict]:
+    """
+    :return: get_note_differences of every adjacent pair, len(chords_input) - 1 dicts
+    """
+    if len(chords_input) >= NOTE_DIFFERENCE_BATCH_MIN:
+        import voice_leading
+        return voice_leading.note_differences(chords_input)
+
+    return [get_note_differences(chord_1, chord_2) for chord_1, chord_2 in zip(chords_input, chords_input[1:])]
+
+def get_cadence_parts(chords_input: list[Chord], romans: list[list[str]], matches: list, group: str, annotate, no_match: dict) -> list[dict]:
+    """
+    :param matches: pattern_engine.PatternSet.find_all output
+    :param annotate: annotate_251 or annotate_51, no_match the matching NO_* dict
+    :return: the keys every chord gets from the group's greedy left to right matches
+    """
+    parts = [no_match] * len(chords_input)
+
+    for start, pattern in pattern_engine.DEFAULT_PATTERNS.resolve(matches, group):
+        target = start + len(pattern) - 1
+        match = (pattern.name, *pattern.labels(chords_input[start:target]))
+        parts[start:target + 1] = annotate(match, romans[target][0])
+
+    return parts
+
+def find_251_movement(chords_input: list[Chord], annotations: list[dict]) -> list[dict]:
+    if len(annotations) < 3:
+        return annotations
+
+    romans = [annotation['roman_numeral'] for annotation in annotations]
+    matches = pattern_engine.DEFAULT_PATTERNS.find_all(chords_input)
+
+    for annotation, part in zip(annotations, get_cadence_parts(chords_input, romans, matches, '251', annotate_251, NO_251)):
+        annotation.update(part)
+
+    return annotations
+
+def find_51_movement(chords_input: list[Chord], annotations: list[dict]) -> list[dict]:
+    if len(annotations) < 2:
+        return annotations
+
+    romans = [annotation['roman_numeral'] for annotation in annotations]
+    matches = pattern_engine.DEFAULT_PATTERNS.find_all(chords_input)
+
+    for annotation, part in zip(annotations, get_cadence_parts(chords_input, romans, matches, '51', annotate_51, NO_51)):
+        annotation.update(part)
+
+    return annotations
+
+def find_cadences(chords_input: list[Chord], annotations: list[dict], patterns: pattern_engine.PatternSet = pattern_engine.DEFAULT_PATTERNS) -> list[dict]:
+    """
+    Every chord gets 'cadences': {pattern name: its label in the match} for each pattern group outside 251 / 51
+    """
+    matches = patterns.find_all(chords_input[:len(annotations)])
+    groups = dict.fromkeys(pattern.group for pattern in patterns.patterns if pattern.group not in ('251', '51'))
+
+    for annotation in annotations:
+        annotation['cadences'] = {}
 
-    return chords_data
+    for group in groups:
+        for start, pattern in patterns.resolve(matches, group):
+            for annotation, label in zip(annotations[start:], pattern.labels(chords_input[start:])):
+                annotation['cadences'][pattern.name] = label
+
+    return annotations
 
-def find_251_movement(chords_input: list[dict]) -> list[dict] | None:
-    if len(chords_input) < 3:
-        pass
-    else:
-        chords_data = []
-        skip_counter = 0
-        for counter in range(len(chords_input)):
-            if skip_counter > 0:
-                skip_counter -= 1
-                pass
-            else:
-                try:
-                    chord_1 = chords_input[counter].copy()
-                    chord_2 = chords_input[counter + 1].copy()
-                    chord_3 = chords_input[counter + 2].copy()
-
-                    chords_roman = get_roman_numerals([chord_1, chord_2, chord_3], chord_3['key_base'])
-
-                    roman_numerals = chords_roman[0]['roman_numeral'].copy(), chords_roman[1]['roman_numeral'].copy(), chords_roman[2]['roman_numeral'].copy()
-
-                    is_251 = []
-                    is_251_tritone = []
-
-                    for chord, correct in zip(roman_numerals, ['ii', 'V', 'I']):
-                        if correct != 'I' and chord[0] == correct:
-                            is_251.append(True)
-                        elif correct == 'I' and chord[0].upper() == correct:
-                            is_251.append(True)
-                        else:
-                            is_251.append(False)
-
-                    for chord, correct in zip(roman_numerals, ['ii', 'I#', 'I']):
-                        if correct != 'I' and chord[0] == correct:
-                            is_251_tritone.append(True)
-                        elif correct == 'I' and chord[0].upper() == correct:
-                            is_251_tritone.append(True)
-                        else:
-                            is_251_tritone.append(False)
-
-                    if is_251 == [True, True, True]:
-                        skip_counter += 2
-
-                        (chord_1_roman,
-                         chord_2_roman,
-                         chord_3_roman,
-                         chord_1_quality,
-                         chord_2_quality,
-                         chord_3_quality) = (roman_numerals[0][0],
-                                             roman_numerals[1][0],
-                                             roman_numerals[2][0],
-                                             roman_numerals[0][1],
-                                             roman_numerals[1][1],
-                                             roman_numerals[2][1])
-
-                        chord_1['roman_numeral_251'] = f"{chord_1_roman}{chord_1_quality}/{chord_3['roman_numeral'][0]}"
-                        chord_2['roman_numeral_251'] = f"{chord_2_roman}{chord_2_quality}/{chord_3['roman_numeral'][0]}"
-                        chord_3['roman_numeral_251'] = ""
-
-                        chord_1['roman_numeral_251_tritone'] = ""
-                        chord_2['roman_numeral_251_tritone'] = ""
-                        chord_3['roman_numeral_251_tritone'] = ""
-
-                        chords_data.append(chord_1)
-                        chords_data.append(chord_2)
-                        chords_data.append(chord_3)
-
-                    elif is_251_tritone == [True, True, True]:
-                        skip_counter += 2
-
-                        (chord_1_roman,
-                         chord_2_roman,
-                         chord_3_roman,
-                         chord_1_quality,
-                         chord_2_quality,
-                         chord_3_quality) = (roman_numerals[0][0],
-                                             roman_numerals[1][0],
-                                             roman_numerals[2][0],
-                                             roman_numerals[0][1],
-                                             roman_numerals[1][1],
-                                             roman_numerals[2][1])
-
-                        chord_1['roman_numeral_251_tritone'] = f"{chord_1_roman}{chord_1_quality}/{chord_3['roman_numeral'][0][0]}"
-                        chord_2['roman_numeral_251_tritone'] = f"{SHARP_TO_FLAT_ROMAN[chord_2_roman]}{chord_2_quality}/{chord_3['roman_numeral'][0][0]}"
-                        chord_3['roman_numeral_251_tritone'] = ""
-
-                        chord_1['roman_numeral_251'] = ""
-                        chord_2['roman_numeral_251'] = ""
-                        chord_3['roman_numeral_251'] = ""
-
-                        chords_data.append(chord_1)
-                        chords_data.append(chord_2)
-                        chords_data.append(chord_3)
-
-                    else:
-
-                        chord_1 = chords_input[counter].copy()
-                        chord_1['roman_numeral_251'] = ""
-                        chord_1['roman_numeral_251_tritone'] = ""
-                        chords_data.append(chord_1)
-                except IndexError:
-                    chord_1 = chords_input[counter].copy()
-                    chord_1['roman_numeral_251'] = ""
-                    chord_1['roman_numeral_251_tritone'] = ""
-                    chords_data.append(chord_1)
-
-        return chords_data
-
-def find_51_movement(chords_input: list[dict]) -> list[dict] | None:
-    if len(chords_input) < 2:
-        pass
-    else:
-        chords_data = []
-        skip_counter = 0
-        for counter in range(len(chords_input)):
-            if skip_counter > 0:
-                skip_counter -= 1
-                pass
-            else:
-                try:
-                    chord_1 = chords_input[counter].copy()
-                    chord_2 = chords_input[counter + 1].copy()
-
-                    chords_roman = get_roman_numerals([chord_1, chord_2], chord_2['key_base'])
-
-                    roman_numerals = chords_roman[0]['roman_numeral'].copy(), chords_roman[1]['roman_numeral'].copy()
-
-                    is_51 = []
-                    is_51_tritone = []
-
-                    for chord, correct in zip(roman_numerals, ['V', 'I']):
-                        if correct != 'I' and chord[0] == correct:
-                            is_51.append(True)
-                        elif correct == 'I' and chord[0].upper() == correct:
-                            is_51.append(True)
-                        else:
-                            is_51.append(False)
-
-                    for chord, correct in zip(roman_numerals, ['I#', 'I']):
-                        if correct != 'I' and chord[0] == correct:
-                            is_51_tritone.append(True)
-                        elif correct == 'I' and chord[0].upper() == correct:
-                            is_51_tritone.append(True)
-                        else:
-                            is_51_tritone.append(False)
-
-                    if is_51 == [True, True]:
-                        skip_counter += 1
-
-                        (chord_1_roman,
-                         chord_2_roman,
-                         chord_1_quality,
-                         chord_2_quality,) = (roman_numerals[0][0],
-                                             roman_numerals[1][0],
-                                             roman_numerals[0][1],
-                                             roman_numerals[1][1],)
-
-                        chord_1['roman_numeral_51'] = f"{chord_1_roman}{chord_1_quality}/{chord_2['roman_numeral'][0]}"
-                        chord_2['roman_numeral_51'] = ""
-
-                        chord_1['roman_numeral_51_tritone'] = ""
-                        chord_2['roman_numeral_51_tritone'] = ""
-
-                        chords_data.append(chord_1)
-                        chords_data.append(chord_2)
-
-                    elif is_51_tritone == [True, True]:
-                        skip_counter += 1
-
-                        (chord_1_roman,
-                         chord_2_roman,
-                         chord_1_quality,
-                         chord_2_quality,) = (roman_numerals[0][0],
-                                              roman_numerals[1][0],
-                                              roman_numerals[0][1],
-                                              roman_numerals[1][1],)
-
-                        chord_1['roman_numeral_51_tritone'] = f"{SHARP_TO_FLAT_ROMAN[chord_1_roman]}{chord_1_quality}/{chord_2['roman_numeral'][0][0]}"
-                        chord_2['roman_numeral_51_tritone'] = ""
-
-                        chord_1['roman_numeral_51'] = ""
-                        chord_2['roman_numeral_51'] = ""
-
-                        chords_data.append(chord_1)
-                        chords_data.append(chord_2)
-                    else:
-
-                        chord_1 = chords_input[counter].copy()
-                        chord_1['roman_numeral_51'] = ""
-                        chord_1['roman_numeral_51_tritone'] = ""
-                        chords_data.append(chord_1)
-                except IndexError:
-                    chord_1 = chords_input[counter].copy()
-                    chord_1['roman_numeral_51'] = ""
-                    chord_1['roman_numeral_51_tritone'] = ""
-                    chords_data.append(chord_1)
-
-        return chords_data
-
-def find_chord_relative_to_next(chords_input: list[dict]) -> list[dict] | None:
-    chords_data = []
-
-    for counter in range(len(chords_input)):
+def find_chord_relative_to_next(chords_input: list[Chord], annotations: list[dict]) -> list[dict]:
+    for counter in range(len(annotations)):
         chord_data = {}
-        chord = chords_input[counter].copy()
+        chord = chords_input[counter]
 
         for counter_2 in range(1, 5):
             try:
-                chord_precede = chords_input[counter + counter_2].copy()
-
-                chord_roman = get_roman_numerals([chord], chord_precede['key_base'])[0]
+                annotation_precede = annotations[counter + counter_2]
+                chord_precede = chords_input[counter + counter_2]
 
-                chord_data[f'{counter_2}_ahead'] = f"{chord_roman['roman_numeral'][0]}{chord_roman['roman_numeral'][1]}/{chord_precede['roman_numeral'][0]}"
+                chord_data[f'{counter_2}_ahead'] = f"{get_relative_label(chord, chord_precede)}/{annotation_precede['roman_numeral'][0]}"
             except IndexError:
                 break
 
-        chord['chord_next_relative'] = chord_data
-        chords_data.append(chord)
+        annotations[counter]['chord_next_relative'] = chord_data
 
-    return chords_data
+    return annotations
 
-def find_parallel_minor(chords_input: list[dict]) -> list[dict] | None:
-    chords_data = []
+def find_parallel_minor(chords_input: list[Chord], annotations: list[dict]) -> list[dict]:
+    for counter in range(len(annotations) - 1):
+        annotations[counter]['parallel_mode_shift'] = get_parallel_mode_shift(chords_input[counter], chords_input[counter + 1], annotations[counter + 1]['roman_numeral'][0])
 
-    for counter in range(len(chords_input) - 1):
-        chord_1 = chords_input[counter].copy()
-        chord_2 = chords_input[counter + 1].copy()
+    return annotations
 
-        chord_1_key_base = chord_1['key_base']
-        chord_2_key_base = chord_2['key_base']
+def find_neighbouring_next_notes(chords_input: list[Chord], annotations: list[dict], batch: bool = False) -> list[dict]:
+    """
+    :param batch: compute every pair at once with numpy (voice_leading), worth it past a handful of chords
+    :return: the annotations without the last chord, it has no next chord to compare against
+    """
+    if batch:
+        import voice_leading
+        for annotation, note_differences in zip(annotations, voice_leading.note_differences(chords_input[:len(annotations)])):
+            annotation.update(note_differences)
 
-        chord_1_interval = chord_1['intervals']
-        chord_2_interval = chord_2['intervals']
+        return annotations[:-1]
 
-        if 'b3' in chord_1_interval:
-            chord_1_quality = 'min'
-        elif '3' in chord_1_interval:
-            chord_1_quality = 'maj'
-        else:
-            chord_1_quality = ''
+    for counter in range(len(annotations) - 1):
+        annotations[counter].update(get_note_differences(chords_input[counter], chords_input[counter + 1]))
 
-        if 'b3' in chord_2_interval:
-            chord_2_quality = 'min'
-        elif '3' in chord_2_interval:
-            chord_2_quality = 'maj'
-        else:
-            chord_2_quality = ''
+    return annotations[:-1]
 
-        is_same_key = True if chord_1_key_base == chord_2_key_base else False
+FEATURES = ('251_movement', '51_movement', 'parallel_minor', 'neighbouring_next_notes', 'chord_relative_to_next')
 
-        if chord_1_quality == 'maj' and chord_2_quality == 'min' and is_same_key:
-            chord_1['parallel_mode_shift'] = f'I/{chord_2['roman_numeral'][0]}'
-            chords_data.append(chord_1)
-        elif chord_1_quality == 'min' and chord_2_quality == 'maj' and is_same_key:
-            chord_1['parallel_mode_shift'] = f'i/{chord_2['roman_numeral'][0]}'
-            chords_data.append(chord_1)
-        else:
-            chord_1['parallel_mode_shift'] = ''
-            chords_data.append(chord_1)
+# accepted by analyze but left out unless asked for
+OPTIONAL_FEATURES = ('cadences',)
 
-    chords_data.append(chords_input[-1])
+def analyze(chords_input: list[Chord], song_key: str | None = None, features=FEATURES) -> list[dict]:
+    """
+    get_roman_numerals followed by the find_* stages named in features (always run in FEATURES order),
+    done in a single pass over the chords. Disabled features are never computed.
+    :param song_key: None to detect it from the chords
+    :return: the same annotations the chained stages return
+    """
+    features = set(features)
+    unknown = features - set(FEATURES) - set(OPTIONAL_FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {sorted(unknown)}")
 
-    return chords_data
+    total = len(chords_input)
+    do_251 = '251_movement' in features and total >= 3
+    do_51 = '51_movement' in features and total >= 2
+    do_parallel = 'parallel_minor' in features
+    do_notes = 'neighbouring_next_notes' in features
+    do_relative = 'chord_relative_to_next' in features
 
-def find_neighbouring_next_notes(chords_input: list[dict]) -> list[dict] | None:
-    chords_data = []
+    # find_neighbouring_next_notes drops the last chord, so the stages after it never see it
+    end = total - 1 if do_notes else total
 
-    for counter in range(len(chords_input) - 1):
-        chord_1 = chords_input[counter].copy()
-        chord_2 = chords_input[counter + 1].copy()
+    if song_key is None:
+        import key_detection
+        song_key = key_detection.detect_key(chords_input)
 
-        chord_1_notes = chord_1['notes']
-        chord_1_notes_alt = chord_1['notes_alt']
-        chord_2_notes = chord_2['notes']
-        chord_2_notes_alt = chord_2['notes_alt']
+    romans = get_roman_numeral_list(chords_input, song_key)
 
-        chord_1_number = [helperfunc.note_to_midi(note) for note in chord_1_notes]
-        chord_1_number_alt = [helperfunc.note_to_midi(note) for note in chord_1_notes_alt]
-        chord_2_number = [helperfunc.note_to_midi(note) for note in chord_2_notes]
-        chord_2_number_alt = [helperfunc.note_to_midi(note) for note in chord_2_notes_alt]
+    note_differences = get_note_difference_list(chords_input) if do_notes else None
 
-        difference_list = []
-        difference_list_strict = []
-        difference_list_very_strict = []
+    # one automaton pass finds the 251 and 51 windows together
+    matches = pattern_engine.DEFAULT_PATTERNS.find_all(chords_input) if do_251 or do_51 else None
+    parts_251 = get_cadence_parts(chords_input, romans, matches, '251', annotate_251, NO_251) if do_251 else None
+    parts_51 = get_cadence_parts(chords_input, romans, matches, '51', annotate_51, NO_51) if do_51 else None
 
-        for chord_1_note, chord_1_note_alt in zip(chord_1_number, chord_1_number_alt):
-            holding_number = chord_2_number[0] - chord_1_note
-            holding_number_strict = chord_2_number[0] - chord_1_note
+    annotations = []
 
-            for chord_2_note, chord_2_note_alt in zip(chord_2_number, chord_2_number_alt):
-                if abs(holding_number) > abs(chord_2_note - chord_1_note):
-                    holding_number = chord_2_note - chord_1_note
-                if abs(holding_number) > abs(chord_2_note_alt - chord_1_note):
-                    holding_number = chord_2_note_alt - chord_1_note
-                if abs(holding_number) > abs(chord_2_note - chord_1_note_alt):
-                    holding_number = chord_2_note - chord_1_note_alt
-                if abs(holding_number) > abs(chord_2_note_alt - chord_1_note_alt):
-                    holding_number = chord_2_note_alt - chord_1_note_alt
+    for counter in range(end):
+        chord = chords_input[counter]
+        annotation = {'roman_numeral': romans[counter]}
 
-                if abs(holding_number_strict) > abs(chord_2_note - chord_1_note):
-                    holding_number_strict = chord_2_note - chord_1_note
+        if do_251:
+            annotation.update(parts_251[counter])
 
-            difference_list.append(holding_number)
-            difference_list_strict.append(holding_number_strict)
+        if do_51:
+            annotation.update(parts_51[counter])
 
-        for chord_1_note, chord_2_note in zip(chord_1_number, chord_2_number):
-            difference_list_very_strict.append(chord_2_note - chord_1_note)
+        if do_parallel and counter + 1 < total:
+            annotation['parallel_mode_shift'] = get_parallel_mode_shift(chord, chords_input[counter + 1], romans[counter + 1][0])
+
+        if do_notes:
+            annotation.update(note_differences[counter])
+
+        if do_relative:
+            annotation['chord_next_relative'] = {
+                f'{counter_2}_ahead': f"{get_relative_label(chord, chords_input[counter + counter_2])}/{romans[counter + counter_2][0]}"
+                for counter_2 in range(1, min(5, end - counter))
+            }
 
-        for _ in range(len(chord_1_number) - len(difference_list_very_strict)):
-            difference_list_very_strict.append(None)
+        annotations.append(annotation)
 
-        chord_1['next_chord_note_difference'] = difference_list
-        chord_1['next_chord_note_difference_strict'] = difference_list_strict
-        chord_1['next_chord_note_difference_very_strict'] = difference_list_very_strict
-        chords_data.append(chord_1)
+    if 'cadences' in features:
+        find_cadences(chords_input, annotations)
 
-    return chords_data
+    return annotations
 
 # ill make it pretty later....
 def pretty_print_chords(chords_data: list[dict]) -> None:
@@ -393,24 +410,15 @@ def pretty_print_chords(chords_data: list[dict]) -> None:
         print(item)
 
 if __name__ == "__main__":
-    # asdfjkl = get_roman_numerals(get_base_info(extract_chords('Eb - Dm7b5 - G7 - Cm7 - Bbm7 - Eb7 - Abmaj7 - Bb7 - Gm7 - Cm7 - F7sus4 - Bmaj7 - Bb7 - Cm - Baug - Eb/Bb - Fsus4 - F - Fm - Gm - Ab - Bb - B - Db - D7')), "Eb")
-    asdfjkl = get_roman_numerals(get_base_info(extract_chords('Eb - Dm7b5 - G7 - Cm7 - Bbm7 - Eb7 - Abmaj7 - Bb7')), "Eb")
-    # asdfjkl = get_roman_numerals(get_base_info(extract_chords('Dm - G - C')), "Bb")
-    # asdfjkl = get_roman_numerals(get_base_info(extract_chords('C - F - Fm - C - Fm - F - C')), "C")
-    # for item in asdfjkl:
-    #     print(json.dumps(item, indent=4))
-    #     pass
-
-    print('-----')
-
-    asdfjkl = find_251_movement(asdfjkl)
-    asdfjkl = find_51_movement(asdfjkl)
-    asdfjkl = find_parallel_minor(asdfjkl)
-    asdfjkl = find_neighbouring_next_notes(asdfjkl)
-    asdfjkl = find_chord_relative_to_next(asdfjkl)
-
-    for item in asdfjkl:
+    # chords, song_key = get_base_info(extract_chords('Eb - Dm7b5 - G7 - Cm7 - Bbm7 - Eb7 - Abmaj7 - Bb7 - Gm7 - Cm7 - F7sus4 - Bmaj7 - Bb7 - Cm - Baug - Eb/Bb - Fsus4 - F - Fm - Gm - Ab - Bb - B - Db - D7')), "Eb"
+    chords, song_key = get_base_info(extract_chords('Eb - Dm7b5 - G7 - Cm7 - Bbm7 - Eb7 - Abmaj7 - Bb7')), "Eb"
+    # chords, song_key = get_base_info(extract_chords('Dm - G - C')), "Bb"
+    # chords, song_key = get_base_info(extract_chords('C - F - Fm - C - Fm - F - C')), "C"
+    asdfjkl = analyze(chords, song_key)
+    # asdfjkl = analyze(chords, song_key, features=('251_movement', '51_movement'))
+
+    for item in chord_record.to_dicts(chords, asdfjkl):
         print(json.dumps(item, indent=4))
         pass
 
-    # pretty_print_chords(asdfjkl)
\ No newline at end of file
+    # pretty_print_chords(chord_record.to_dicts(chords, asdfjkl))
\ No newline at end of file
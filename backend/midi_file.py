@@ -0,0 +1,411 @@
+import argparse
+import bisect
+import heapq
+import json
+import os
+import sys
+from collections import defaultdict
+from functools import lru_cache
+import numpy as np
+import chord_index
+import chord_record
+import main
+import pitch_class
+
+# Offline chord analysis of Standard MIDI Files, no MIDI hardware or library involved.
+#
+#   python midi_file.py archive/ -o chords.jsonl -j 8
+#
+# The reader walks the track chunks lazily and merges their note events in time order. Notes are then
+# cut into chord segments in one of two ways:
+#   window  every cluster of onsets within `window` seconds of the cluster's first one is a chord
+#           (what LiveChordEngine's debounce does live), made of the notes struck in it plus the ones still held
+#   grid    every `beats` quarter notes is a chord, made of everything that sounds during it
+# Each segment's pitch-class set + bass goes through chord_index, repeats are merged, and the chord names
+# go through get_base_info / analyze like any text progression.
+
+MIDI_EXTENSIONS = ('.mid', '.midi', '.smf')
+
+DEFAULT_TEMPO = 500000
+DEFAULT_WINDOW = 0.05
+DEFAULT_BEATS = 1.0
+
+# channel 10, its notes are drum sounds rather than pitches
+DRUM_CHANNEL = 9
+
+# event kinds, also the order events on the same tick are handled in
+TEMPO = 0
+NOTE_OFF = 1
+NOTE_ON = 2
+
+SEGMENTATIONS = ('window', 'grid')
+
+def _read_varlen(data: bytes, position: int) -> tuple[int, int]:
+    value = 0
+    for _ in range(4):
+        byte = data[position]
+        position += 1
+        value = value << 7 | byte & 0x7F
+        if not byte & 0x80:
+            return value, position
+
+    raise ValueError("variable length quantity longer than 4 bytes")
+
+def iter_track_events(track: bytes):
+    """
+    :return: generator of (tick, kind, channel, value, velocity), value is the note number for
+             NOTE_ON / NOTE_OFF and microseconds per quarter note for TEMPO
+    """
+    position = 0
+    tick = 0
+    status = None
+
+    try:
+        while position < len(track):
+            delta, position = _read_varlen(track, position)
+            tick += delta
+            byte = track[position]
+
+            if byte == 0xFF:
+                meta_type = track[position + 1]
+                length, position = _read_varlen(track, position + 2)
+                if meta_type == 0x51 and length == 3:
+                    yield tick, TEMPO, 0, int.from_bytes(track[position:position + 3], 'big'), 0
+                elif meta_type == 0x2F:
+                    return
+                position += length
+                continue
+
+            if byte in (0xF0, 0xF7):
+                length, position = _read_varlen(track, position + 1)
+                position += length
+                continue
+
+            if byte & 0x80:
+                if byte >= 0xF0:
+                    raise ValueError(f"unexpected status byte {byte:#04x}")
+                status = byte
+                position += 1
+            elif status is None:
+                raise ValueError("data byte without a status byte")
+
+            kind = status & 0xF0
+
+            # program change and channel pressure have one data byte, the rest two
+            if kind in (0xC0, 0xD0):
+                position += 1
+                continue
+
+            note, velocity = track[position], track[position + 1]
+            position += 2
+
+            if kind == 0x90 and velocity:
+                yield tick, NOTE_ON, status & 0x0F, note, velocity
+            elif kind in (0x80, 0x90):
+                yield tick, NOTE_OFF, status & 0x0F, note, 0
+    except IndexError:
+        raise ValueError("track ends in the middle of an event")
+
+class MidiFile:
+    """
+    :param data: the whole file, tracks are only parsed while their events are iterated
+    """
+    def __init__(self, data: bytes):
+        if data[:4] != b'MThd' or len(data) < 14:
+            raise ValueError("not a Standard MIDI File")
+
+        header_length = int.from_bytes(data[4:8], 'big')
+        self.format = int.from_bytes(data[8:10], 'big')
+        division = int.from_bytes(data[12:14], 'big')
+        if not division & 0x7FFF:
+            raise ValueError("time division of 0 ticks")
+
+        if division & 0x8000:
+            # SMPTE timing: frames per second (as a negative byte) and ticks per frame, tempo events don't apply
+            frames = 256 - (division >> 8)
+            self.ticks_per_quarter = None
+            self.ticks_per_second = (29.97 if frames == 29 else frames) * (division & 0xFF)
+        else:
+            self.ticks_per_quarter = division
+            self.ticks_per_second = None
+
+        self.tracks = []
+        position = 8 + header_length
+        while position + 8 <= len(data):
+            length = int.from_bytes(data[position + 4:position + 8], 'big')
+            if data[position:position + 4] == b'MTrk':
+                self.tracks.append(data[position + 8:position + 8 + length])
+            position += 8 + length
+
+        self._tempo_map = None
+
+    @classmethod
+    def read(cls, path: str) -> 'MidiFile':
+        with open(path, 'rb') as file:
+            return cls(file.read())
+
+    def events(self):
+        """
+        :return: generator of every track's events merged by tick (tempo changes first, then note offs, then note ons)
+        """
+        return heapq.merge(*(iter_track_events(track) for track in self.tracks))
+
+    def tempo_map(self) -> tuple[list[int], list[float], list[int]]:
+        """
+        :return: ticks where the tempo changes, the seconds at those ticks and the tempo from there on
+        """
+        if self._tempo_map is None:
+            ticks, seconds, tempos = [0], [0.0], [DEFAULT_TEMPO]
+            for tick, kind, _, tempo, _ in self.events():
+                if kind != TEMPO:
+                    continue
+                if tick == ticks[-1]:
+                    tempos[-1] = tempo
+                else:
+                    seconds.append(seconds[-1] + (tick - ticks[-1]) * tempos[-1] / 1e6 / self.ticks_per_quarter)
+                    ticks.append(tick)
+                    tempos.append(tempo)
+            self._tempo_map = ticks, seconds, tempos
+
+        return self._tempo_map
+
+    def seconds(self, tick: int) -> float:
+        if self.ticks_per_second:
+            return tick / self.ticks_per_second
+
+        ticks, seconds, tempos = self.tempo_map()
+        counter = bisect.bisect_right(ticks, tick) - 1
+        return seconds[counter] + (tick - ticks[counter]) * tempos[counter] / 1e6 / self.ticks_per_quarter
+
+    def note_events(self, skip_drums: bool = True):
+        """
+        :return: generator of (seconds, tick, note, velocity) in time order, velocity 0 is a note off
+        """
+        ticks_per_quarter = self.ticks_per_quarter
+        tick_at = 0
+        seconds_at = 0.0
+        tempo = DEFAULT_TEMPO
+
+        for tick, kind, channel, value, velocity in self.events():
+            if self.ticks_per_second:
+                seconds = tick / self.ticks_per_second
+            else:
+                seconds = seconds_at + (tick - tick_at) * tempo / 1e6 / ticks_per_quarter
+
+            if kind == TEMPO:
+                tick_at, seconds_at, tempo = tick, seconds, value
+            elif not (skip_drums and channel == DRUM_CHANNEL):
+                yield seconds, tick, value, velocity
+
+def segment_onsets(note_events, window: float = DEFAULT_WINDOW):
+    """
+    :return: generator of (seconds, tick, notes) per onset cluster, notes sorted (struck in the window or still held)
+    """
+    held = defaultdict(int)
+    struck = set()
+    start = None
+
+    for seconds, tick, note, velocity in note_events:
+        if start is not None and seconds - start[0] > window:
+            yield start[0], start[1], sorted(struck.union(held))
+            start = None
+
+        if velocity:
+            if start is None:
+                start = seconds, tick
+                struck = set()
+            held[note] += 1
+            struck.add(note)
+        elif held.get(note):
+            held[note] -= 1
+            if not held[note]:
+                del held[note]
+
+    if start is not None:
+        yield start[0], start[1], sorted(struck.union(held))
+
+def note_spans(note_events) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs note ons with their offs (first on with first off of the same note), notes left hanging end at the last event
+    :return: start ticks, end ticks and note numbers as int64 arrays
+    """
+    open_notes = defaultdict(list)
+    starts, ends, notes = [], [], []
+    last_tick = 0
+
+    for _, tick, note, velocity in note_events:
+        last_tick = tick
+        if velocity:
+            open_notes[note].append(tick)
+        elif open_notes[note]:
+            starts.append(open_notes[note].pop(0))
+            ends.append(tick)
+            notes.append(note)
+
+    for note, ticks in open_notes.items():
+        for tick in ticks:
+            starts.append(tick)
+            ends.append(last_tick)
+            notes.append(note)
+
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), np.array(notes, dtype=np.int64)
+
+def segment_grid(starts: np.ndarray, ends: np.ndarray, notes: np.ndarray, cell_ticks: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every note is spread over the grid cells it sounds in, then each cell's pitch-class mask and bass are
+    reduced in one go
+    :return: start tick, absolute pitch-class mask and bass note of every cell something sounds in
+    """
+    if not len(notes):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    first = starts // cell_ticks
+    last = np.maximum(first, (ends - 1) // cell_ticks)
+    counts = last - first + 1
+
+    cells = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell_notes = np.repeat(notes, counts)
+
+    masks = np.zeros(int(last.max()) + 1, dtype=np.int64)
+    np.bitwise_or.at(masks, cells, np.left_shift(1, cell_notes % pitch_class.PITCH_CLASS_COUNT))
+    basses = np.full(len(masks), 128, dtype=np.int64)
+    np.minimum.at(basses, cells, cell_notes)
+
+    sounding = np.flatnonzero(masks)
+    return sounding * cell_ticks, masks[sounding], basses[sounding]
+
+@lru_cache(maxsize=1)
+def shared_index() -> dict:
+    # loaded once per process, every file analyzed in it uses the same one
+    return chord_index.get_index()
+
+def file_chords(midi: MidiFile, segmentation: str = 'window', window: float = DEFAULT_WINDOW, beats: float = DEFAULT_BEATS,
+                skip_drums: bool = True, index: dict | None = None) -> list[tuple[float, str]]:
+    """
+    :param window: seconds an onset cluster lasts ('window')
+    :param beats: quarter notes per grid cell ('grid')
+    :return: (seconds, chord name) per chord change, segments chord_index has no name for are left out
+    """
+    index = shared_index() if index is None else index
+    named = []
+
+    if segmentation == 'window':
+        for seconds, _, notes in segment_onsets(midi.note_events(skip_drums), window):
+            names = chord_index.identify(index, notes)
+            if names:
+                named.append((seconds, names[0]))
+    elif segmentation == 'grid':
+        if midi.ticks_per_quarter is None:
+            raise ValueError("grid segmentation needs a file timed in quarter notes, not SMPTE frames")
+
+        cell_ticks = max(round(beats * midi.ticks_per_quarter), 1)
+        cell_starts, masks, basses = segment_grid(*note_spans(midi.note_events(skip_drums)), cell_ticks)
+        for tick, mask, bass in zip(cell_starts.tolist(), masks.tolist(), basses.tolist()):
+            names = chord_index.lookup(index, mask, bass % pitch_class.PITCH_CLASS_COUNT)
+            if names:
+                named.append((midi.seconds(tick), names[0]))
+    else:
+        raise ValueError(f"Unknown segmentation: {segmentation}")
+
+    # a chord held over several segments is one chord
+    return [(seconds, name) for counter, (seconds, name) in enumerate(named) if not counter or name != named[counter - 1][1]]
+
+def analyze_file(path: str, song_key: str | None = None, features=main.FEATURES, **options) -> dict:
+    """
+    :param options: file_chords options
+    :return: like a batch.py output line, plus 'file' and each chord's start in seconds in 'times'
+    """
+    timed = file_chords(MidiFile.read(path), **options)
+    chords = main.get_base_info([name for _, name in timed])
+
+    if song_key is None and chords:
+        import key_detection
+        song_key = key_detection.detect_key(chords)
+
+    annotations = main.analyze(chords, song_key, features) if chords else []
+    chords_data = chord_record.to_dicts(chords, annotations)
+
+    # analyze can leave the last chord out (it has nothing to lead into), times stay in step with chords
+    return {'file': path, 'key': song_key, 'times': [round(seconds, 6) for seconds, _ in timed[:len(chords_data)]],
+            'chords': chords_data}
+
+def analyze_file_json(path: str, song_key: str | None = None, features=main.FEATURES, options: dict | None = None) -> str:
+    """
+    Runs in the worker processes, a broken file becomes an error line instead of stopping the run
+    """
+    try:
+        result = analyze_file(path, song_key, features, **(options or {}))
+    except Exception as error:
+        result = {'file': path, 'error': f"{type(error).__name__}: {error}"}
+
+    return json.dumps(result, ensure_ascii=False)
+
+def find_midi_files(paths: list[str]):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if name.lower().endswith(MIDI_EXTENSIONS):
+                        yield os.path.join(directory, name)
+        else:
+            yield path
+
+def run(paths, output, workers: int | None = None, song_key: str | None = None, features=main.FEATURES,
+        options: dict | None = None) -> int:
+    """
+    One file per task over a process pool, results written in input order
+    :return: number of files written
+    """
+    workers = workers or os.cpu_count() or 1
+    features = tuple(features)
+    written = 0
+
+    if workers == 1:
+        results = (analyze_file_json(path, song_key, features, options) for path in paths)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=workers)
+        paths = list(paths)
+        results = pool.map(analyze_file_json, paths, [song_key] * len(paths), [features] * len(paths),
+                           [options] * len(paths), chunksize=max(len(paths) // (workers * 4), 1))
+
+    try:
+        for result in results:
+            output.write(result)
+            output.write('\n')
+            written += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return written
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Analyze the chords of Standard MIDI Files in parallel, JSONL out")
+    parser.add_argument('paths', nargs='+', help="MIDI files or directories to search for them")
+    parser.add_argument('-o', '--output', default='-', help="output file, - for stdout (default)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument('--key', help="song key for every file (default: detected per file)")
+    parser.add_argument('--segmentation', choices=SEGMENTATIONS, default='window')
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW * 1e3, help="onset cluster length for window")
+    parser.add_argument('--beats', type=float, default=DEFAULT_BEATS, help="quarter notes per chord for grid")
+    parser.add_argument('--drums', action='store_true', help="keep channel 10 notes")
+    parser.add_argument('--features', nargs='+', choices=main.FEATURES + main.OPTIONAL_FEATURES, default=main.FEATURES)
+    args = parser.parse_args(argv)
+
+    options = {'segmentation': args.segmentation, 'window': args.window_ms / 1e3, 'beats': args.beats, 'skip_drums': not args.drums}
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    try:
+        written = run(find_midi_files(args.paths), output_file, args.workers, args.key, args.features, options)
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(f"{written} files analyzed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,183 @@
+from collections import deque
+import pitch_class
+from chord_database import NUMBER_TO_ROMAN, NUMBER_TO_ROMAN_FLAT
+from chord_record import Chord
+
+# Declarative cadence patterns, all matched together by one Aho-Corasick automaton.
+#
+# A pattern is a row of roman numerals relative to any tonic, e.g. "ii V I?". Upper case means the chord
+# has no minor third, lower case that it has one, a trailing ? accepts either. Only the root motion between
+# neighbouring chords and the minor flag matter, so every chord becomes one token
+#     motion from the previous chord's root (START for the first chord) * 2 + minor
+# and a pattern is the set of token strings it can match (its first chord can follow anything).
+# The automaton walks the token string once, so the cost does not grow with the number of patterns.
+
+MOTIONS = pitch_class.PITCH_CLASS_COUNT + 1
+START = pitch_class.PITCH_CLASS_COUNT
+TOKEN_COUNT = MOTIONS * 2
+
+NUMERAL_TO_INTERVAL = {
+    numeral: number - 1
+    for table in (NUMBER_TO_ROMAN, NUMBER_TO_ROMAN_FLAT)
+    for number, numeral in table.items()
+}
+
+def chord_token(chord: Chord, previous: Chord | None) -> int:
+    motion = START if previous is None else (chord.root - previous.root) % pitch_class.PITCH_CLASS_COUNT
+    return motion * 2 + bool(pitch_class.QUALITY_TO_MASK[chord.quality] & pitch_class.MINOR_THIRD)
+
+def chord_tokens(chords_input: list[Chord]) -> list[int]:
+    return [chord_token(chord, chords_input[counter - 1] if counter else None) for counter, chord in enumerate(chords_input)]
+
+class Pattern:
+    """
+    :param name: what the match is reported as
+    :param numerals: space separated, see the top of the file
+    :param group: patterns of one group never overlap, earlier registered ones win ties
+    """
+    def __init__(self, name: str, numerals: str, group: str | None = None):
+        self.name = name
+        self.group = group or name
+        self.numerals = tuple(numeral.rstrip('?') for numeral in numerals.split())
+        self.any_quality = tuple(numeral.endswith('?') for numeral in numerals.split())
+
+        try:
+            self.intervals = tuple(NUMERAL_TO_INTERVAL[numeral.upper().replace('B', 'b', 1) if numeral[0] == 'b' else numeral.upper()]
+                                   for numeral in self.numerals)
+        except KeyError as error:
+            raise ValueError(f"Unknown roman numeral {error} in pattern {name}")
+
+    def __len__(self) -> int:
+        return len(self.numerals)
+
+    def __repr__(self) -> str:
+        return f"Pattern({self.name!r}, {' '.join(self.numerals)!r})"
+
+    def token_strings(self) -> list[tuple[int, ...]]:
+        strings = [()]
+
+        for counter, (numeral, interval) in enumerate(zip(self.numerals, self.intervals)):
+            motions = range(MOTIONS) if counter == 0 else ((interval - self.intervals[counter - 1]) % pitch_class.PITCH_CLASS_COUNT,)
+            minors = (False, True) if self.any_quality[counter] else (numeral.lstrip('b').islower(),)
+            strings = [string + (motion * 2 + minor,) for string in strings for motion in motions for minor in minors]
+
+        return strings
+
+    def labels(self, chords_input: list[Chord]) -> list[str]:
+        """
+        :return: numeral + quality + alterations for each chord of a match, like get_relative_label gives them
+        """
+        return [f"{numeral}{chord.quality}{''.join(chord.alterations)}" for numeral, chord in zip(self.numerals, chords_input)]
+
+class PatternSet:
+    """
+    The compiled automaton: a full transition table (state * TOKEN_COUNT + token), so each chord is one lookup
+    """
+    def __init__(self, patterns: list[Pattern]):
+        self.patterns = tuple(patterns)
+        self.priority = {pattern: counter for counter, pattern in enumerate(self.patterns)}
+
+        transitions = [[-1] * TOKEN_COUNT]
+        outputs = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            for string in pattern.token_strings():
+                state = 0
+                for token in string:
+                    if transitions[state][token] == -1:
+                        transitions[state][token] = len(transitions)
+                        transitions.append([-1] * TOKEN_COUNT)
+                        outputs.append([])
+                    state = transitions[state][token]
+                outputs[state].append(index)
+
+        # breadth first so every state's failure state is finished before it is used
+        failure = [0] * len(transitions)
+        queue = deque()
+        for token in range(TOKEN_COUNT):
+            if transitions[0][token] == -1:
+                transitions[0][token] = 0
+            else:
+                queue.append(transitions[0][token])
+
+        while queue:
+            state = queue.popleft()
+            outputs[state] += outputs[failure[state]]
+            for token in range(TOKEN_COUNT):
+                child = transitions[state][token]
+                if child == -1:
+                    transitions[state][token] = transitions[failure[state]][token]
+                else:
+                    failure[child] = transitions[failure[state]][token]
+                    queue.append(child)
+
+        self.transitions = [target for row in transitions for target in row]
+        self.outputs = [tuple(output) for output in outputs]
+        self.output_patterns = [tuple(self.patterns[index] for index in output) for output in outputs]
+
+    def find_all(self, chords_input: list[Chord]) -> list[tuple[int, Pattern]]:
+        """
+        :return: (start index, pattern) of every match, overlapping ones included, in order of their end
+        """
+        transitions, outputs, patterns = self.transitions, self.outputs, self.patterns
+        matches = []
+        state = 0
+
+        for counter, token in enumerate(chord_tokens(chords_input)):
+            state = transitions[state * TOKEN_COUNT + token]
+            for index in outputs[state]:
+                matches.append((counter - len(patterns[index]) + 1, patterns[index]))
+
+        return matches
+
+    def step(self, state: int, token: int) -> tuple[int, tuple[Pattern, ...]]:
+        """
+        find_all one chord at a time, for callers that don't have the whole progression (start in state 0)
+        :return: the next state and the patterns whose match ends at this chord
+        """
+        state = self.transitions[state * TOKEN_COUNT + token]
+        return state, self.output_patterns[state]
+
+    def group_length(self, group: str) -> int:
+        """
+        :return: chords in the longest pattern of the group
+        """
+        return max(len(pattern) for pattern in self.patterns if pattern.group == group)
+
+    def resolve(self, matches: list[tuple[int, Pattern]], group: str) -> list[tuple[int, Pattern]]:
+        """
+        Left to right, a match is taken when it starts after the last taken one of the group ended
+        (the earliest registered pattern if several start at the same chord)
+        :return: the taken (start index, pattern) pairs
+        """
+        best = {}
+        for start, pattern in matches:
+            if pattern.group == group and (start not in best or self.priority[pattern] < self.priority[best[start]]):
+                best[start] = pattern
+
+        taken = []
+        free_from = 0
+        for start in sorted(best):
+            if start >= free_from:
+                taken.append((start, best[start]))
+                free_from = start + len(best[start])
+
+        return taken
+
+# the two groups the 251 / 51 stages report, order inside a group is the order the old scanners checked them in
+CADENCE_PATTERNS = [
+    Pattern('251', 'ii V I?', group='251'),
+    Pattern('251_tritone', 'ii bII I?', group='251'),
+    Pattern('51', 'V I?', group='51'),
+    Pattern('51_tritone', 'bII I?', group='51'),
+]
+
+EXTRA_PATTERNS = [
+    Pattern('backdoor', 'iv bVII I?'),
+    Pattern('minor_plagal', 'iv I?'),
+    Pattern('minor_251', 'ii V i'),
+    Pattern('turnaround', 'I vi ii V'),
+    Pattern('turnaround_iii', 'iii vi ii V'),
+]
+
+DEFAULT_PATTERNS = PatternSet(CADENCE_PATTERNS + EXTRA_PATTERNS)
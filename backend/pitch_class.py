@@ -0,0 +1,63 @@
+from functools import lru_cache
+from chord_database import CHORD_INTERVALS, INTERVAL_TO_SEMITONE, KEY_TO_NUMBER
+
+# A chord as a 12-bit pitch-class set: bit n is set when the chord has a note n semitones
+# above its root (so C major is 0b000010010001). Extensions fold into the octave (9 -> 2).
+
+PITCH_CLASS_COUNT = 12
+FULL_MASK = (1 << PITCH_CLASS_COUNT) - 1
+
+def intervals_to_mask(interval_list) -> int:
+    mask = 0
+    for interval in interval_list:
+        mask |= INTERVAL_TO_BIT[interval]
+
+    return mask
+
+def rotate(mask: int, semitones: int) -> int:
+    """
+    Transposes a pitch-class set up by semitones (negative goes down)
+    """
+    semitones %= PITCH_CLASS_COUNT
+    return ((mask << semitones) | (mask >> (PITCH_CLASS_COUNT - semitones))) & FULL_MASK
+
+def to_absolute(mask: int, root: int) -> int:
+    return rotate(mask, root)
+
+def to_relative(mask: int, root: int) -> int:
+    return rotate(mask, -root)
+
+def contains(mask: int, subset: int) -> bool:
+    return mask & subset == subset
+
+@lru_cache(maxsize=FULL_MASK + 1)
+def pitch_classes(mask: int) -> tuple[int, ...]:
+    # filled per mask on demand, building all 4096 up front was the bulk of this module's import time
+    return tuple(pc for pc in range(PITCH_CLASS_COUNT) if mask >> pc & 1)
+
+def mask_from_midi(notes) -> int:
+    mask = 0
+    for note in notes:
+        mask |= 1 << (note % PITCH_CLASS_COUNT)
+
+    return mask
+
+def normal_rotation(mask: int) -> tuple[int, int]:
+    """
+    :return: the smallest rotation of the set and how far it was rotated down, equal for every transposition of a set
+    """
+    return min((rotate(mask, -shift), shift) for shift in range(PITCH_CLASS_COUNT))
+
+INTERVAL_TO_BIT = {interval: 1 << (semitone % PITCH_CLASS_COUNT) for interval, semitone in INTERVAL_TO_SEMITONE.items()}
+
+KEY_TO_PITCH_CLASS = {key: (number - 1) % PITCH_CLASS_COUNT for key, number in KEY_TO_NUMBER.items()}
+
+QUALITY_TO_MASK = {quality: intervals_to_mask(interval_list) for quality, interval_list in CHORD_INTERVALS.items()}
+
+MINOR_THIRD = INTERVAL_TO_BIT["b3"]
+MAJOR_THIRD = INTERVAL_TO_BIT["3"]
+DIMINISHED_FIFTH = INTERVAL_TO_BIT["b5"]
+PERFECT_FIFTH = INTERVAL_TO_BIT["5"]
+AUGMENTED_FIFTH = INTERVAL_TO_BIT["#5"]
+MINOR_SEVENTH = INTERVAL_TO_BIT["b7"]
+MAJOR_SEVENTH = INTERVAL_TO_BIT["7"]
@@ -0,0 +1,260 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import time
+import numpy as np
+import main
+import pitch_class
+from chord_database import CHORD_INTERVALS
+from chord_record import Chord
+from pattern_engine import NUMERAL_TO_INTERVAL
+
+# Transposition-invariant search over a whole library, "which songs have ii V i" without re-analyzing anything.
+#
+# Every neighbouring chord pair becomes one token (previous chord minor?, root motion, chord minor?), each
+# song's tokens end in SEPARATOR, and a suffix array over all of it answers any query with two binary
+# searches. Exact qualities are checked afterwards against the per-chord quality column.
+#
+# Queries are numerals like pattern_engine patterns, with an optional exact quality after them:
+#   "ii V i"            lower case = minor third, upper case = none, ? = either
+#   "iim7 V7 Imaj7"     only those qualities
+#
+# On disk the index is a directory of .npy files (opened with mmap_mode='r') plus a small JSON file.
+
+SEPARATOR = 2 * pitch_class.PITCH_CLASS_COUNT * 2
+QUALITIES = tuple(CHORD_INTERVALS)
+QUALITY_TO_ID = {quality: counter for counter, quality in enumerate(QUALITIES)}
+
+ARRAYS = ('tokens', 'suffix_array', 'token_offsets', 'chord_offsets', 'chord_minor', 'chord_quality')
+META_FILE = "index.json"
+
+QUERY_PATTERN = re.compile(r'^(b?)([IViv]+)(#?)(\??)(.*)$')
+
+def is_minor(chord: Chord) -> bool:
+    return bool(pitch_class.QUALITY_TO_MASK[chord.quality] & pitch_class.MINOR_THIRD)
+
+def transition_token(minor_1: int, motion: int, minor_2: int) -> int:
+    return (minor_1 * pitch_class.PITCH_CLASS_COUNT + motion) * 2 + minor_2
+
+def song_tokens(chords_input: list[Chord]) -> list[int]:
+    return [
+        transition_token(is_minor(chord_1), (chord_2.root - chord_1.root) % pitch_class.PITCH_CLASS_COUNT, is_minor(chord_2))
+        for chord_1, chord_2 in zip(chords_input, chords_input[1:])
+    ] + [SEPARATOR]
+
+def build_suffix_array(tokens: np.ndarray) -> np.ndarray:
+    """
+    Prefix doubling: suffixes are sorted by their first k tokens, then 2k, ... until every rank is unique
+    """
+    length = len(tokens)
+    if not length:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = tokens.astype(np.int64)
+    step = 1
+
+    while True:
+        second = np.full(length, -1, dtype=np.int64)
+        if step < length:
+            second[:length - step] = rank[step:]
+        order = np.lexsort((second, rank))
+
+        keys_rank, keys_second = rank[order], second[order]
+        changed = np.empty(length, dtype=bool)
+        changed[0] = False
+        changed[1:] = (keys_rank[1:] != keys_rank[:-1]) | (keys_second[1:] != keys_second[:-1])
+
+        new_rank = np.empty(length, dtype=np.int64)
+        new_rank[order] = np.cumsum(changed)
+
+        if new_rank[order[-1]] == length - 1 or step >= length:
+            return order
+
+        rank = new_rank
+        step *= 2
+
+def parse_query(query: str) -> list[tuple[int, tuple[bool, ...], int | None]]:
+    """
+    :return: per chord (interval above the tonic, allowed minor flags, quality id or None for any)
+    """
+    elements = []
+
+    for part in query.split():
+        match = QUERY_PATTERN.match(part)
+        if match is None:
+            raise ValueError(f"Cannot read {part!r} as a roman numeral")
+
+        flat, numeral, sharp, any_quality, quality = match.groups()
+        key = f"{flat}{numeral.upper()}{sharp}"
+        if key not in NUMERAL_TO_INTERVAL or numeral not in (numeral.upper(), numeral.lower()):
+            raise ValueError(f"Unknown roman numeral {part!r}")
+        if quality and quality not in QUALITY_TO_ID:
+            raise ValueError(f"Unknown quality {quality!r} in {part!r}")
+
+        minors = (False, True) if any_quality else (numeral.islower(),)
+        elements.append((NUMERAL_TO_INTERVAL[key], minors, QUALITY_TO_ID[quality] if quality else None))
+
+    return elements
+
+def query_token_strings(elements: list) -> list[tuple[int, ...]]:
+    strings = [()]
+
+    for (interval_1, minors_1, _), (interval_2, minors_2, _) in zip(elements, elements[1:]):
+        motion = (interval_2 - interval_1) % pitch_class.PITCH_CLASS_COUNT
+        strings = [
+            string + (transition_token(minor_1, motion, minor_2),)
+            for string in strings for minor_1 in minors_1 for minor_2 in minors_2
+            # neighbouring tokens share a chord, its minor flag has to agree
+            if not string or string[-1] % 2 == minor_1
+        ]
+
+    return strings
+
+class ProgressionIndex:
+    def __init__(self, arrays: dict[str, np.ndarray], song_ids: list[str]):
+        self.arrays = arrays
+        self.song_ids = song_ids
+
+    def __len__(self) -> int:
+        return len(self.song_ids)
+
+    def _suffix_range(self, string: tuple[int, ...]) -> tuple[int, int]:
+        tokens, suffix_array = self.arrays['tokens'], self.arrays['suffix_array']
+        size = len(string)
+        target = list(string)
+
+        def prefix(position):
+            return tokens[position:position + size].tolist()
+
+        low = bisect.bisect_left(suffix_array, target, key=prefix)
+        high = bisect.bisect_right(suffix_array, target, lo=low, key=prefix)
+
+        return low, high
+
+    def _chord_positions(self, token_positions: np.ndarray) -> np.ndarray:
+        """
+        :return: global chord index of the first chord of each token (token i of song s is chord i of song s)
+        """
+        songs = np.searchsorted(self.arrays['token_offsets'], token_positions, side='right') - 1
+        return self.arrays['chord_offsets'][songs] + (token_positions - self.arrays['token_offsets'][songs])
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[str, int]]:
+        """
+        :return: (song id, index of the match's first chord in the song), in song order
+        """
+        elements = parse_query(query)
+        chord_offsets = self.arrays['chord_offsets']
+
+        if len(elements) == 1:
+            _, minors, _ = elements[0]
+            candidates = np.flatnonzero(np.isin(self.arrays['chord_minor'], minors))
+        else:
+            ranges = [self._suffix_range(string) for string in query_token_strings(elements)]
+            token_positions = np.concatenate([self.arrays['suffix_array'][low:high] for low, high in ranges] or [np.zeros(0, dtype=np.int64)])
+            candidates = np.sort(self._chord_positions(token_positions))
+
+        for offset, (_, _, quality) in enumerate(elements):
+            if quality is not None:
+                candidates = candidates[self.arrays['chord_quality'][candidates + offset] == quality]
+
+        if limit is not None:
+            candidates = candidates[:limit]
+
+        songs = np.searchsorted(chord_offsets, candidates, side='right') - 1
+        return [(self.song_ids[song], int(position - chord_offsets[song])) for song, position in zip(songs.tolist(), candidates.tolist())]
+
+    def count(self, query: str) -> int:
+        return len(self.search(query))
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(self.arrays[name]))
+
+        with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as file:
+            json.dump({'version': 1, 'qualities': QUALITIES, 'song_ids': self.song_ids}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'ProgressionIndex':
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as file:
+            meta = json.load(file)
+
+        if tuple(meta['qualities']) != QUALITIES:
+            raise ValueError(f"{path} was built with a different quality table, rebuild it")
+
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+        return cls(arrays, meta['song_ids'])
+
+def build_index(songs) -> ProgressionIndex:
+    """
+    :param songs: (song id, chords) pairs
+    """
+    song_ids = []
+    tokens = []
+    token_offsets = []
+    chord_offsets = [0]
+    chord_minor = []
+    chord_quality = []
+
+    for song_id, chords_input in songs:
+        song_ids.append(str(song_id))
+        token_offsets.append(len(tokens))
+        tokens += song_tokens(chords_input)
+        chord_offsets.append(chord_offsets[-1] + len(chords_input))
+        chord_minor += [is_minor(chord) for chord in chords_input]
+        chord_quality += [QUALITY_TO_ID[chord.quality] for chord in chords_input]
+
+    tokens = np.array(tokens, dtype=np.uint8)
+    arrays = {
+        'tokens': tokens,
+        'suffix_array': build_suffix_array(tokens),
+        'token_offsets': np.array(token_offsets, dtype=np.int64),
+        'chord_offsets': np.array(chord_offsets, dtype=np.int64),
+        'chord_minor': np.array(chord_minor, dtype=np.bool_),
+        'chord_quality': np.array(chord_quality, dtype=np.int16),
+    }
+
+    return ProgressionIndex(arrays, song_ids)
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query a transposition-invariant progression index")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="index a batch.py style input file (JSONL or KEY<TAB>progression)")
+    build.add_argument('input')
+    build.add_argument('-o', '--output', required=True, help="index directory")
+
+    query = commands.add_parser('query', help="find a numeral sequence, e.g. \"ii V i\"")
+    query.add_argument('index')
+    query.add_argument('query')
+    query.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        import batch
+
+        def songs():
+            with open(args.input, encoding='utf-8') as file:
+                for line_number, line in enumerate(file, start=1):
+                    record = batch.parse_line(line, 'auto')
+                    if record is not None:
+                        yield record.get('id', line_number), main.get_base_info(main.extract_chords(record['progression']))
+
+        started = time.perf_counter()
+        index = build_index(songs())
+        index.save(args.output)
+        print(f"indexed {len(index)} songs in {time.perf_counter() - started:.2f}s")
+    else:
+        index = ProgressionIndex.load(args.index)
+        started = time.perf_counter()
+        matches = index.search(args.query)
+        elapsed = time.perf_counter() - started
+
+        for song_id, position in matches[:args.limit]:
+            print(f"{song_id}\t{position}")
+        print(f"{len(matches)} matches in {elapsed * 1e3:.2f} ms")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,269 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+import chord_index
+import live_engine
+import pitch_class
+from live_engine import LatencyHistogram, LiveChordEngine, MidiSource, NoteMessage, write_notes_to_set_from_midi
+
+# Replays note streams into the live path (LiveChordEngine, write_notes_to_set_from_midi, chord_index),
+# so it can be load tested and regression checked without a keyboard on port 1.
+#
+#   python replay.py --events 20000 --rate 5000            synthetic stream, real time
+#   python replay.py --midi song.mid --speed 8             a recording, 8x faster
+#   python replay.py --speed 0                             as fast as the engine takes them, its ceiling
+#   python replay.py --rate 5000 --max-dropped 0 --max-late-ratio 0.01    exit 1 when the live path falls behind
+#
+# ReplaySource behaves like a hardware port: a player thread emits every event at its (scaled) time into a
+# bounded buffer and a delivery thread hands them to the engine. When the engine can't keep up the buffer
+# fills and new events are dropped, and events delivered later than late_tolerance after their time count as late.
+# At speed 0 the player waits for room in the buffer instead, nothing is dropped and the rate is the most the path takes.
+
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_LATE_TOLERANCE = 0.005
+DEFAULT_RATE = 1000.0
+
+# semitones above the root, the shapes the synthetic stream plays
+VOICINGS = ((0, 4, 7), (0, 3, 7), (0, 4, 7, 10), (0, 3, 7, 10), (0, 4, 7, 11), (0, 3, 6, 10), (0, 4, 10, 14))
+LOWEST_ROOT = 48
+
+def synthetic_events(count: int = 10000, rate: float = DEFAULT_RATE, seed: int = 0) -> list[tuple[float, int, int]]:
+    """
+    Random chords played note by note, every note released before the next chord, events evenly spaced
+    :return: (seconds, note, velocity) sorted by time, velocity 0 is a note off, the same for the same arguments
+    """
+    rng = random.Random(seed)
+    events = []
+
+    while len(events) < count:
+        root = LOWEST_ROOT + rng.randrange(pitch_class.PITCH_CLASS_COUNT)
+        notes = [root + interval for interval in rng.choice(VOICINGS)]
+        events += [(note, rng.randint(40, 120)) for note in notes]
+        events += [(note, 0) for note in notes]
+
+    return [(counter / rate, note, velocity) for counter, (note, velocity) in enumerate(events[:count])]
+
+def midi_file_events(path: str, skip_drums: bool = True) -> list[tuple[float, int, int]]:
+    """
+    :return: a recording's note events as (seconds, note, velocity)
+    """
+    import midi_file
+
+    return [(seconds, note, velocity) for seconds, _, note, velocity in midi_file.MidiFile.read(path).note_events(skip_drums)]
+
+class ReplaySource(MidiSource):
+    """
+    :param events: (seconds, note, velocity) sorted by time
+    :param speed: playback rate, 2 plays twice as fast, 0 sends every event as soon as the buffer has room for it
+    :param queue_size: events the port buffers before it starts dropping them
+    :param late_tolerance: seconds after its time an event may reach the engine before it counts as late
+    """
+    def __init__(self, events: list[tuple[float, int, int]], speed: float = 1.0, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 late_tolerance: float = DEFAULT_LATE_TOLERANCE, clock=time.perf_counter):
+        self.events = events
+        self.speed = speed
+        self.queue_size = queue_size
+        self.late_tolerance = late_tolerance
+        self.clock = clock
+
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.late = 0
+        self.lateness = LatencyHistogram()
+        self.started = None
+        self.finished = None
+
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._playing = False
+        self._stopped = False
+        self._done = threading.Event()
+        self._threads = []
+
+    def open(self, callback) -> None:
+        self._playing = True
+        self.started = self.clock()
+        self._threads = [threading.Thread(target=self._play, daemon=True),
+                         threading.Thread(target=self._deliver, args=(callback,), daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        :return: True once every event was delivered or dropped
+        """
+        return self._done.wait(timeout)
+
+    def _play(self) -> None:
+        clock, speed, started = self.clock, self.speed, self.started
+
+        for seconds, note, velocity in self.events:
+            due = started + seconds / speed if speed else clock()
+            # sleep most of the way, the rest is a short spin so fast streams stay on time (sleep(0) hands the
+            # GIL to the delivery thread, a bare spin would hold it for the whole switch interval)
+            while not self._stopped:
+                remaining = due - clock()
+                if remaining <= 0:
+                    break
+                time.sleep(remaining - 0.0005 if remaining > 0.001 else 0)
+
+            with self._condition:
+                while not speed and len(self._buffer) >= self.queue_size and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    break
+                self.sent += 1
+                if len(self._buffer) >= self.queue_size:
+                    self.dropped += 1
+                else:
+                    self._buffer.append((NoteMessage(note, velocity), due))
+                    self._condition.notify()
+
+        with self._condition:
+            self._playing = False
+            self._condition.notify()
+
+    def _deliver(self, callback) -> None:
+        clock = self.clock
+
+        while True:
+            with self._condition:
+                while not self._buffer and self._playing and not self._stopped:
+                    self._condition.wait()
+                if self._stopped or not self._buffer:
+                    break
+                message, due = self._buffer.popleft()
+                self._condition.notify()
+
+            now = clock()
+            lateness = max(now - due, 0.0)
+            self.lateness.record(lateness)
+            if lateness > self.late_tolerance:
+                self.late += 1
+
+            callback(message, now)
+            self.delivered += 1
+
+        self.finished = clock()
+        self._done.set()
+
+    def summary(self) -> dict:
+        seconds = (self.finished or self.clock()) - self.started if self.started is not None else 0.0
+        return {
+            "events": len(self.events),
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "late": self.late,
+            "seconds": seconds,
+            "events_per_second": self.delivered / seconds if seconds else 0.0,
+            "lateness": self.lateness.summary(),
+        }
+
+def _ignore_render(notes_list: list[int], names: tuple[str, ...]) -> None:
+    pass
+
+def replay(events: list[tuple[float, int, int]], speed: float = 1.0, queue_size: int = DEFAULT_QUEUE_SIZE,
+           late_tolerance: float = DEFAULT_LATE_TOLERANCE, index: dict | None = None,
+           debounce: float = live_engine.DEBOUNCE_SECONDS, throttle: float = live_engine.THROTTLE_SECONDS) -> dict:
+    """
+    Plays events through a ReplaySource into a LiveChordEngine running on its own thread, like reversechordfinder does
+    :return: the source's summary plus what the engine rendered and its note-in -> label-out latency
+    """
+    engine = LiveChordEngine(index, render=_ignore_render, debounce=debounce, throttle=throttle)
+    source = ReplaySource(events, speed, queue_size, late_tolerance)
+    stop = threading.Event()
+
+    runner = threading.Thread(target=engine.run, args=(source, stop))
+    runner.start()
+    try:
+        while not source.wait(0.1):
+            if not runner.is_alive():
+                break
+    finally:
+        stop.set()
+        runner.join()
+
+    # the last chord is still waiting out its debounce, render it now
+    engine.poll(float("inf"))
+
+    return {
+        **source.summary(),
+        "speed": speed,
+        "renders": engine.renders,
+        "engine_latency": engine.latency.summary(),
+    }
+
+def throughput(events: list[tuple[float, int, int]], index: dict | None = None, repeat: int = 3) -> dict:
+    """
+    Note-set tracking + chord identification for every event in a tight loop, no threads or timing in the way
+    :return: best events per second over repeat runs
+    """
+    index = chord_index.get_index() if index is None else index
+    messages = [NoteMessage(note, velocity) for _, note, velocity in events]
+    identify = chord_index.identify
+    best = float("inf")
+
+    for _ in range(repeat):
+        notes = set()
+        started = time.perf_counter()
+        for message in messages:
+            write_notes_to_set_from_midi(message, notes)
+            identify(index, notes)
+        best = min(best, time.perf_counter() - started)
+
+    return {"events": len(messages), "seconds": best, "events_per_second": len(messages) / best if best else 0.0}
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a note stream into the live chord engine and report how it keeps up")
+    parser.add_argument('--midi', help="replay this MIDI file instead of a synthetic stream")
+    parser.add_argument('--events', type=int, default=10000, help="synthetic stream length")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="synthetic events per second (before --speed)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--speed', type=float, default=1.0, help="playback rate, 0 for as fast as the engine takes events")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help="port buffer, fuller than this drops events")
+    parser.add_argument('--late-ms', type=float, default=DEFAULT_LATE_TOLERANCE * 1e3, help="delivery delay that counts as late")
+    parser.add_argument('--max-dropped', type=int, help="exit 1 when more events than this were dropped")
+    parser.add_argument('--max-late-ratio', type=float, help="exit 1 when a bigger share of the events was late")
+    parser.add_argument('-o', '--output', help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    events = midi_file_events(args.midi) if args.midi else synthetic_events(args.events, args.rate, args.seed)
+    index = chord_index.get_index()
+
+    report = {
+        "replay": replay(events, args.speed, args.queue_size, args.late_ms / 1e3, index),
+        "throughput": throughput(events, index),
+    }
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+
+    result = report["replay"]
+    failures = []
+    if args.max_dropped is not None and result["dropped"] > args.max_dropped:
+        failures.append(f"{result['dropped']} events dropped")
+    if args.max_late_ratio is not None and result["events"] and result["late"] / result["events"] > args.max_late_ratio:
+        failures.append(f"{result['late']} of {result['events']} events late")
+
+    if failures:
+        print(f"live path fell behind: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,33 +1,27 @@
-import helperfunc
-import chord_database
-import rtmidi
+import chord_index
+import live_engine
+# moved to live_engine, still importable from here for callers of the old module
+from live_engine import write_notes_to_set_from_midi  # noqa: F401
 
-midiin = rtmidi.RtMidiIn()
+def open_midi_input():
+    # rtmidi is only needed once a port is opened, importing this module must work without it (and without hardware)
+    import rtmidi
 
-def write_notes_to_set_from_midi(midi, notes: set[int]) -> list[int]:
-    if midi.isNoteOn():
-        notes.add(midi.getNoteNumber())
-    elif midi.isNoteOff():
-        try:
-            notes.remove(midi.getNoteNumber())
-        except KeyError:
-            notes.clear()
+    return rtmidi.RtMidiIn()
 
 def main(midi_port=0) -> None:
-    notes = set()
-
+    midiin = open_midi_input()
     ports = range(midiin.getPortCount())
     if ports:
         for i in ports:
             print(midiin.getPortName(i))
         print('--------------')
-        midiin.openPort(midi_port)
-        while True:
-            m = midiin.getMessage(10)  # some timeout in ms
-            if m:
-                write_notes_to_set_from_midi(m, notes)
-                notes_list = sorted(notes)
-                print(notes_list)
+        engine = live_engine.LiveChordEngine(chord_index.get_index())
+        try:
+            engine.run(live_engine.RtMidiSource(midiin, midi_port))
+        except KeyboardInterrupt:
+            pass
+        print('latency:', engine.latency.summary())
     else:
         print('NO MIDI INPUT PORTS!')
 
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import batch
+import main
+
+# Local HTTP/JSON front end for the analyzer, so the tables and caches stay warm between requests.
+#
+#   POST /analyze   {"progression": "Dm7 - G7 - Cmaj7", "key": "C"}  ("key" optional, detected when missing)
+#                   -> {"key": "C", "chords": [...]}  (same as a batch.py output line)
+#   GET  /health    -> {"status": "ok"}
+#   GET  /stats     -> request / batch counters
+#
+# Requests arriving close together are coalesced into micro-batches (up to batch_size requests, waiting at
+# most batch_delay for more) and each batch is one task for the worker pool. At most max_batches batches
+# are in the pool at once; once max_queue requests are waiting on top of that, new ones get a 503.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_BATCH_DELAY = 0.002
+DEFAULT_MAX_QUEUE = 1024
+MAX_BODY_BYTES = 1 << 20
+HEADER_TIMEOUT = 10.0
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 503: "Service Unavailable"}
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def analyze_requests(bodies: list[bytes], features=main.FEATURES) -> list[tuple[int, str]]:
+    """
+    Runs in the worker pool, one call per micro-batch
+    :return: (HTTP status, JSON body) per request body
+    """
+    responses = []
+
+    for body in bodies:
+        try:
+            record = json.loads(body)
+            if not isinstance(record, dict) or not isinstance(record.get('progression'), str):
+                raise ValueError("expected a JSON object with a \"progression\" string")
+        except ValueError as error:
+            responses.append((400, json.dumps({'error': str(error)})))
+            continue
+
+        try:
+            responses.append((200, json.dumps(batch.analyze_record(record, features), ensure_ascii=False)))
+        except Exception as error:
+            responses.append((422, json.dumps({'error': f"{type(error).__name__}: {error}"}, ensure_ascii=False)))
+
+    return responses
+
+def warm_up() -> None:
+    # pool initializer, pays for the imports and first parses before the first real request
+    analyze_requests([b'{"progression": "Dm7 - G7 - Cmaj7"}'])
+
+class AnalysisService:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int | None = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, batch_delay: float = DEFAULT_BATCH_DELAY,
+                 max_queue: int = DEFAULT_MAX_QUEUE, max_batches: int | None = None, features=main.FEATURES):
+        """
+        :param workers: worker processes, 0 analyzes on one thread of this process (default: cpu count)
+        :param port: 0 picks a free one, see address after start()
+        """
+        self.host = host
+        self.port = port
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_batches = max_batches or max(self.workers, 1) * 2
+        self.features = tuple(features)
+        self.address = None
+
+        self.stats = {"requests": 0, "rejected": 0, "batches": 0, "batched_requests": 0}
+
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._slots = asyncio.Semaphore(self.max_batches)
+        self._pool = None
+        self._server = None
+        self._batcher = None
+        self._running = set()
+        self._pending = []
+
+    async def start(self) -> tuple[str, int]:
+        if self.workers:
+            # a plain fork would hand the workers copies of the open client sockets, keeping connections alive
+            context = multiprocessing.get_context('spawn' if os.name == 'nt' else 'forkserver')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=warm_up)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=1, initializer=warm_up)
+
+        self._batcher = asyncio.create_task(self._run_batcher())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.address = self._server.sockets[0].getsockname()[:2]
+
+        return self.address
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+        # whatever the batcher had pulled off the queue but not handed to a batch, then whatever is still queued
+        items = self._pending
+        self._pending = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        self._fail(items, "service shutting down")
+
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def analyze(self, body: bytes) -> tuple[int, str]:
+        """
+        Queues one request body for the next micro-batch
+        :return: (HTTP status, JSON body)
+        """
+        self.stats["requests"] += 1
+        future = asyncio.get_running_loop().create_future()
+
+        try:
+            self._queue.put_nowait((body, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return 503, json.dumps({'error': "too many requests queued, retry later"})
+
+        return await future
+
+    async def _run_batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            # waiting for a free slot first means the queue is what fills up under load
+            await self._slots.acquire()
+            # items live in _pending until their batch owns them, so close() can answer them if this is cancelled
+            items = self._pending = [await self._queue.get()]
+
+            deadline = loop.time() + self.batch_delay
+            while len(items) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._pending = []
+            task = asyncio.create_task(self._run_batch(items))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, items: list[tuple[bytes, asyncio.Future]]) -> None:
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(items)
+
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(
+                self._pool, analyze_requests, [body for body, _ in items], self.features)
+        except asyncio.CancelledError:
+            self._fail(items, "service shutting down")
+            raise
+        except Exception as error:
+            self._fail(items, f"worker failed: {type(error).__name__}")
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), response in zip(items, responses):
+            if not future.done():
+                future.set_result(response)
+
+    @staticmethod
+    def _fail(items: list[tuple[bytes, asyncio.Future]], message: str) -> None:
+        response = (503, json.dumps({'error': message}))
+        for _, future in items:
+            if not future.done():
+                future.set_result(response)
+
+    def get_stats(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "mean_batch_size": self.stats["batched_requests"] / batches if batches else 0.0,
+            "queued": self._queue.qsize(),
+            "batches_running": len(self._running),
+            "workers": self.workers,
+            "window_cache": main.window_cache_info()["total"] if not self.workers else None,
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    method, path, headers, body = await asyncio.wait_for(self._read_request(reader), HEADER_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except RequestError as error:
+                    await self._respond(writer, error.status, json.dumps({'error': str(error)}), close=True)
+                    return
+
+                status, payload = await self._route(method, path, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self._respond(writer, status, payload, close)
+                if close:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> tuple[str, str, dict, bytes]:
+        head = await reader.readuntil(b"\r\n\r\n")
+        request_line, *header_lines = head.decode('latin-1').split("\r\n")
+
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise RequestError(400, "malformed request line")
+
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise RequestError(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"body over {MAX_BODY_BYTES} bytes")
+
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple[int, str]:
+        path = path.split("?", 1)[0]
+
+        if path == "/analyze":
+            if method != "POST":
+                return 405, json.dumps({'error': "use POST"})
+            return await self.analyze(body)
+        elif path == "/health":
+            return 200, json.dumps({'status': "ok"})
+        elif path == "/stats":
+            return 200, json.dumps(self.get_stats())
+
+        return 404, json.dumps({'error': f"no route {path}"})
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: str, close: bool = False) -> None:
+        body = payload.encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", f"Connection: {'close' if close else 'keep-alive'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(**options) -> None:
+    service = AnalysisService(**options)
+    host, port = await service.start()
+    print(f"listening on http://{host}:{port} ({service.workers or 'in-process'} workers, "
+          f"batches of up to {service.batch_size})", flush=True)
+
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+def main_cli(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the analyzer over HTTP on localhost")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes, 0 for in-process (default: cpu count)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="most requests per micro-batch")
+    parser.add_argument('--batch-delay-ms', type=float, default=DEFAULT_BATCH_DELAY * 1e3, help="longest wait for a batch to fill")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="waiting requests before answering 503")
+    parser.add_argument('--max-batches', type=int, default=None, help="batches in the pool at once (default: 2 per worker)")
+    parser.add_argument('--features', nargs='+', choices=main.FEATURES + main.OPTIONAL_FEATURES, default=main.FEATURES)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(serve(host=args.host, port=args.port, workers=args.workers, batch_size=args.batch_size,
+                          batch_delay=args.batch_delay_ms / 1e3, max_queue=args.max_queue,
+                          max_batches=args.max_batches, features=args.features))
+    except KeyboardInterrupt:
+        print(f"stopped after {time.perf_counter() - started:.0f}s")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,163 @@
+from collections import deque
+from collections.abc import Iterable, Iterator
+import chord_record
+import main
+import pattern_engine
+from chord_record import Chord
+
+# how many chords past a chord have to be seen before it is final (find_chord_relative_to_next looks 4 ahead)
+LOOKAHEAD = 4
+
+# the pattern_engine groups find_251_movement and find_51_movement report, in stage order
+CADENCE_GROUPS = {'251': (main.annotate_251, main.NO_251), '51': (main.annotate_51, main.NO_51)}
+GROUP_LENGTHS = {group: pattern_engine.DEFAULT_PATTERNS.group_length(group) for group in CADENCE_GROUPS}
+
+class _Pending:
+    __slots__ = ('chord', 'roman_numeral', 'cadences', 'parallel_mode_shift', 'note_differences', 'chord_next_relative')
+
+    def __init__(self, chord: Chord, roman_numeral: list[str]):
+        self.chord = chord
+        self.roman_numeral = roman_numeral
+        # group -> the keys get_cadence_parts gives the chord
+        self.cadences = {}
+        self.parallel_mode_shift = None
+        self.note_differences = None
+        self.chord_next_relative = {}
+
+    def annotation(self) -> dict:
+        # same key order as running the find_* stages one after another
+        annotation = {'roman_numeral': self.roman_numeral}
+        for group in CADENCE_GROUPS:
+            if group in self.cadences:
+                annotation.update(self.cadences[group])
+        if self.parallel_mode_shift is not None:
+            annotation['parallel_mode_shift'] = self.parallel_mode_shift
+        if self.note_differences is not None:
+            annotation.update(self.note_differences)
+        annotation['chord_next_relative'] = self.chord_next_relative
+
+        return annotation
+
+class StreamingAnalyzer:
+    """
+    Push-based version of get_roman_numerals + the find_* stages.
+
+    feed() chords one at a time, every chord comes back annotated once LOOKAHEAD more chords have
+    been fed (or on close()), so memory stays at LOOKAHEAD + 1 chords however long the stream is.
+    The 251 / 51 windows come from stepping the pattern_engine automaton one chord at a time and taking
+    matches the way PatternSet.resolve does, as soon as no longer match can start at the same chord.
+    Annotations match running the stages over the whole stream, except that the last chord is kept
+    (find_neighbouring_next_notes drops it) and has no parallel_mode_shift / note differences. Since it
+    is kept, the chord_next_relative of the chords before it reach it too, as in analyze without
+    neighbouring_next_notes.
+    """
+    def __init__(self, song_key: str):
+        self.song_key = song_key
+        self.count = 0
+        self._window = deque()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._state = 0
+        self._previous = None
+        # per group: the best pattern ending so far for each undecided start, the first start still undecided
+        # and the first one not inside a taken match
+        self._candidates = {group: {} for group in CADENCE_GROUPS}
+        self._decided = dict.fromkeys(CADENCE_GROUPS, 0)
+        self._free_from = dict.fromkeys(CADENCE_GROUPS, 0)
+
+    def feed(self, chord: Chord | str) -> list[tuple[Chord, dict]]:
+        if isinstance(chord, str):
+            chord = chord_record.from_symbol(chord)
+
+        entry = _Pending(chord, main.get_roman_numeral(chord, self.song_key))
+        window = self._window
+        window.append(entry)
+        self.count += 1
+
+        patterns = pattern_engine.DEFAULT_PATTERNS
+        self._state, ended = patterns.step(self._state, pattern_engine.chord_token(chord, self._previous))
+        self._previous = chord
+        for pattern in ended:
+            candidates = self._candidates.get(pattern.group)
+            if candidates is not None:
+                start = self.count - len(pattern)
+                if start not in candidates or patterns.priority[pattern] < patterns.priority[candidates[start]]:
+                    candidates[start] = pattern
+
+        for ahead, earlier in enumerate(reversed(window)):
+            if ahead:
+                earlier.chord_next_relative[f'{ahead}_ahead'] = f"{main.get_relative_label(earlier.chord, chord)}/{entry.roman_numeral[0]}"
+
+        if len(window) >= 2:
+            previous = window[-2]
+            previous.parallel_mode_shift = main.get_parallel_mode_shift(previous.chord, chord, entry.roman_numeral[0])
+            previous.note_differences = main.get_note_differences(previous.chord, chord)
+
+        # a start is final once the group's longest pattern from there has had its last chord
+        for group, length in GROUP_LENGTHS.items():
+            if self.count - length + 1 > self._decided[group]:
+                self._decide(group, self.count - length + 1)
+
+        emitted = []
+        while len(window) > LOOKAHEAD:
+            emitted.append(self._emit())
+
+        return emitted
+
+    def close(self) -> list[tuple[Chord, dict]]:
+        """
+        Flushes the chords still waiting for lookahead, the analyzer can be fed again afterwards
+        """
+        window = self._window
+
+        # the same edge cases as the batch stages: too short -> no keys, ran off the end -> no match
+        for group, length in GROUP_LENGTHS.items():
+            if self.count >= length:
+                self._decide(group, self.count)
+
+        emitted = [self._emit() for _ in range(len(window))]
+
+        self.count = 0
+        self._reset()
+
+        return emitted
+
+    def _emit(self) -> tuple[Chord, dict]:
+        entry = self._window.popleft()
+        return entry.chord, entry.annotation()
+
+    def _decide(self, group: str, end: int) -> None:
+        """
+        Settles every start of the group before end, like get_cadence_parts: a match is taken if it starts
+        after the last taken one, chords outside any taken match get no_match
+        """
+        annotate, no_match = CADENCE_GROUPS[group]
+        candidates = self._candidates[group]
+        first = self.count - len(self._window)
+
+        for start in range(self._decided[group], end):
+            pattern = candidates.pop(start, None)
+            if start < self._free_from[group]:
+                continue
+
+            entry = self._window[start - first]
+            if pattern is None:
+                entry.cadences[group] = no_match.copy()
+                continue
+
+            entries = [self._window[index - first] for index in range(start, start + len(pattern))]
+            match = (pattern.name, *pattern.labels([entry.chord for entry in entries[:-1]]))
+            for covered, part in zip(entries, annotate(match, entries[-1].roman_numeral[0])):
+                covered.cadences[group] = part
+            self._free_from[group] = start + len(pattern)
+
+        self._decided[group] = max(self._decided[group], end)
+
+def analyze_stream(chords_input: Iterable[Chord | str], song_key: str) -> Iterator[tuple[Chord, dict]]:
+    analyzer = StreamingAnalyzer(song_key)
+
+    for chord in chords_input:
+        yield from analyzer.feed(chord)
+
+    yield from analyzer.close()
@@ -0,0 +1,70 @@
+import io
+import json
+import pytest
+import batch
+import benchmark
+
+# batch.run in one process and over a pool: output in input order (or the same lines in any order with
+# ordered=False), line numbers kept across skipped lines, and one error record per bad line.
+
+LINES = [
+    '{"key": "C", "progression": "Dm7 - G7 - Cmaj7", "id": 7}',
+    '',
+    '# a comment',
+    'F\tF - Bb - C7',
+    'G - C - D7 - G',
+    '{bad',
+    '{"key": "H", "progression": "C"}',
+    '{"key": "C"}',
+]
+
+def run(lines, **options) -> tuple[int, list[dict]]:
+    output = io.StringIO()
+    written = batch.run(lines, output, **options)
+    return written, [json.loads(line) for line in output.getvalue().splitlines()]
+
+def songbook(songs: int = 40) -> list[str]:
+    return [f"{song_key}\t{progression}" for song_key, progression in benchmark.generate_corpus(songs, 8, 'altered')]
+
+def test_records_and_errors():
+    written, records = run(LINES, workers=1, chunksize=2)
+
+    assert written == len(records) == 6
+    assert [record['line'] for record in records] == [1, 4, 5, 6, 7, 8]
+    assert records[0]['id'] == 7
+    assert [record.get('key') for record in records[:3]] == ["C", "F", "G"]
+    assert [chord['chord'] for chord in records[1]['chords']] == ["F", "Bb"]
+    assert records[3]['error'].startswith("JSONDecodeError")
+    assert records[4] == {'line': 7, 'error': "KeyError: 'H'"}
+    assert records[5] == {'line': 8, 'error': "KeyError: 'progression'"}
+
+def test_record_matches_analyze_record():
+    _, records = run(LINES[:1], workers=1)
+
+    assert records[0] == {'line': 1, 'id': 7, **json.loads(json.dumps(batch.analyze_record(json.loads(LINES[0]))))}
+
+def test_input_format():
+    lines = ['{"key": "C", "progression": "G7 - C"}', "C\tG7 - C"]
+
+    _, auto = run(lines, workers=1)
+    _, jsonl = run(lines, workers=1, input_format='jsonl')
+
+    assert auto[0]['chords'] == auto[1]['chords']
+    assert jsonl[0] == auto[0]
+    assert jsonl[1]['error'].startswith("JSONDecodeError")
+
+@pytest.mark.parametrize("chunksize, max_pending", [(1, 1), (3, 2), (64, None)])
+def test_pool_keeps_input_order(chunksize, max_pending):
+    lines = songbook() + LINES
+    _, single = run(lines, workers=1)
+    written, pooled = run(lines, workers=2, chunksize=chunksize, max_pending=max_pending)
+
+    assert written == len(single)
+    assert pooled == single
+
+def test_unordered_writes_every_line_once():
+    lines = songbook() + LINES
+    _, single = run(lines, workers=1)
+    _, pooled = run(lines, workers=2, chunksize=3, ordered=False, max_pending=1)
+
+    assert sorted(pooled, key=lambda record: record['line']) == single
@@ -0,0 +1,74 @@
+import io
+import random
+import pytest
+import benchmark
+import chord_parser
+
+# The chunked extractors (mmap and stream) against find_chords on the decoded text: same chords, in the same
+# order, at byte offsets that point at them, whatever the chunk size and wherever multi-byte characters and
+# chords straddle a chunk boundary.
+
+CHUNK_SIZES = (1, 7, 64, 100, 129, 1000, chord_parser.CHUNK_SIZE)
+
+# one chord longer than any chunk window, the mmap scanner has to grow its window for it
+LONG_CHORD = "C" + "add9" * 100
+
+def songbook_text() -> str:
+    rng = random.Random(3)
+    decorations = ("", " ", " | ", " – ", " — ", "\n", " ♭♯ ", " é ", " 日本語 ", " 🎸 ", "\t")
+    words = [progression for _, progression in benchmark.generate_corpus(60, 12, 'altered', seed=3)]
+    words += ["Dm7 - G7 - Cmaj7", "Bb7#9/D", LONG_CHORD, "Ebmaj7/G"]
+
+    return "".join(rng.choice(decorations) + word for word in words for _ in range(2))
+
+@pytest.fixture(scope="module")
+def text() -> str:
+    return songbook_text()
+
+@pytest.fixture(scope="module")
+def path(text, tmp_path_factory) -> str:
+    file = tmp_path_factory.mktemp("chords") / "songbook.txt"
+    file.write_bytes(text.encode('utf-8'))
+    return str(file)
+
+def check_offsets(text: str, found: list[tuple[str, int]]) -> None:
+    data = text.encode('utf-8')
+    for chord, offset in found:
+        assert data[offset:offset + len(chord.encode('utf-8'))].decode('utf-8') == chord
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_mmap_matches_find_chords(text, path, chunk_size):
+    found = list(chord_parser.iter_chords_mmap(path, chunk_size))
+
+    assert [chord for chord, _ in found] == chord_parser.find_chords(text)
+    assert LONG_CHORD in [chord for chord, _ in found]
+    check_offsets(text, found)
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_stream_matches_find_chords(text, chunk_size):
+    found = list(chord_parser.iter_chords_stream(io.BytesIO(text.encode('utf-8')), chunk_size))
+
+    assert [chord for chord, _ in found] == chord_parser.find_chords(text)
+    check_offsets(text, found)
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_stream_matches_mmap(path, chunk_size):
+    with open(path, 'rb') as file:
+        assert list(chord_parser.iter_chords_stream(file, chunk_size)) == list(chord_parser.iter_chords_mmap(path))
+
+def test_chord_split_by_a_chunk_boundary(tmp_path):
+    # Cmaj7 starts 3 bytes before the end of the first 128 byte window
+    text = "é" * 62 + "x Cmaj7#11/E"
+    file = tmp_path / "split.txt"
+    file.write_bytes(text.encode('utf-8'))
+
+    assert [chord for chord, _ in chord_parser.iter_chords_mmap(str(file), 1)] == ["Cmaj7#11/E"]
+    assert list(chord_parser.iter_chords_stream(io.BytesIO(text.encode('utf-8')), 3)) == [("Cmaj7#11/E", 126)]
+
+def test_empty_input(tmp_path):
+    file = tmp_path / "empty.txt"
+    file.write_bytes(b"")
+
+    assert list(chord_parser.iter_chords_mmap(str(file))) == []
+    assert list(chord_parser.iter_chords_stream(io.BytesIO(b""))) == []
+    assert chord_parser.find_chords("") == []
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import benchmark
+import chord_record
+import columnar
+import main
+
+# ColumnarResult has to give back exactly the chord_record.to_dicts output it was built from, in memory and
+# after a save / load round trip, for every feature set (so columns that are left out stay left out).
+
+FEATURE_SETS = {
+    'default': main.FEATURES,
+    'cadences': main.FEATURES + ('cadences',),
+    'roman_only': (),
+    'no_relative': ('251_movement', '51_movement', 'neighbouring_next_notes'),
+}
+
+def analyzed(features) -> list[tuple[str, list[dict]]]:
+    songs = []
+    for complexity in benchmark.COMPLEXITIES:
+        for song_key, progression in benchmark.generate_corpus(5, 10, complexity, seed=5):
+            chords = main.get_base_info(main.extract_chords(progression))
+            songs.append((song_key, chord_record.to_dicts(chords, main.analyze(chords, song_key, features))))
+    # a song with no chords in the middle
+    songs.insert(1, ("C", []))
+    return songs
+
+def analyzed_pair(progression: str):
+    chords = main.get_base_info(main.extract_chords(progression))
+    return chords, main.analyze(chords, "C")
+
+@pytest.mark.parametrize("features", FEATURE_SETS.values(), ids=FEATURE_SETS.keys())
+def test_round_trip(features, tmp_path):
+    songs = analyzed(features)
+    result = columnar.from_dicts(songs)
+    path = str(tmp_path / "songs.col")
+    result.save(path)
+    loaded = columnar.ColumnarResult.load(path)
+
+    expected = [chord_data for _, chords_data in songs for chord_data in chords_data]
+    assert result.to_dicts() == expected
+    assert loaded.to_dicts() == expected
+    assert loaded.song_count == len(songs)
+    assert [loaded.to_dicts(song) for song in range(len(songs))] == [chords_data for _, chords_data in songs]
+    assert loaded.decode('song_key') == [song_key for song_key, _ in songs]
+    assert loaded.flags == result.flags
+    assert sorted(loaded.arrays) == sorted(result.arrays)
+
+def test_cadences_are_stored():
+    songs = analyzed(FEATURE_SETS['cadences'])
+    result = columnar.from_dicts(songs)
+
+    assert result.flags['cadences']
+    assert any(chord_data['cadences'] for _, chords_data in songs for chord_data in chords_data)
+    assert 'cadence_pattern.values' in result.arrays
+    assert 'cadence_pattern.values' not in columnar.from_dicts(analyzed(main.FEATURES)).arrays
+
+def test_loaded_arrays_are_read_only_views(tmp_path):
+    path = str(tmp_path / "songs.col")
+    columnar.from_dicts(analyzed(main.FEATURES)).save(path)
+    loaded = columnar.ColumnarResult.load(path)
+
+    for name, array in loaded.arrays.items():
+        assert not array.flags.writeable, name
+        assert array.ctypes.data % columnar.ALIGNMENT == 0 or not len(array), name
+
+def test_roots_and_masks():
+    songs = analyzed(())
+    result = columnar.from_dicts(songs)
+    chords = [chord_record.from_symbol(chord_data['chord']) for _, chords_data in songs for chord_data in chords_data]
+
+    assert result.arrays['root'].tolist() == [chord.root for chord in chords]
+    assert result.arrays['mask'].tolist() == [chord.mask for chord in chords]
+
+def test_missing_differences_use_the_sentinel():
+    # G7 has one note more than C, the very strict difference of the fourth is None
+    result = columnar.from_dicts([("C", chord_record.to_dicts(*analyzed_pair("G7 - C")))])
+
+    assert result.to_dicts()[0]['next_chord_note_difference_very_strict'][-1] is None
+    assert columnar.NO_DIFFERENCE in result.ragged('next_chord_note_difference_very_strict', 0).tolist()
+
+def test_unknown_key_is_an_error():
+    chords_data = chord_record.to_dicts(*analyzed_pair("Dm7 - G7 - Cmaj7"))
+    chords_data[0]['extra'] = "x"
+
+    with pytest.raises(ValueError, match="extra"):
+        columnar.from_dicts([("C", chords_data)])
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a columnar file" + bytes(64))
+
+    with pytest.raises(ValueError):
+        columnar.ColumnarResult.load(str(path))
+
+def test_code_of_unknown_string():
+    result = columnar.from_dicts([("C", chord_record.to_dicts(*analyzed_pair("Dm7 - G7")))])
+
+    assert result.code("Dm7") == result.strings.index("Dm7")
+    assert result.code("nowhere") == columnar.MISSING
+    assert not np.any(result.arrays['chord'] == result.code("nowhere"))
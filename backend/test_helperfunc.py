@@ -0,0 +1,70 @@
+import pytest
+import chord_record
+import helperfunc
+
+# Spelled notes used to come out a semitone high (1-based KEY_TO_NUMBER indexed into the 0-based
+# NUMBER_TO_KEY), these pin the exact names so that can't come back. Roots are spelled with sharps,
+# the other notes by their interval's INTERVAL_TO_SPELLING table.
+
+SPELLINGS = {
+    "C7": ("C0", "E0", "G0", "Bb0"),
+    "C": ("C0", "E0", "G0"),
+    "G7/B": ("B0", "D1", "F1", "G1"),
+    "F#m7": ("F#0", "A0", "C#1", "E1"),
+    "E": ("E0", "G#0", "B0"),
+}
+
+# Known baseline behaviour, not the right spelling: a flat root comes out as its sharp, and notes built on
+# it follow (Ebmaj7 gets A#, Bbm7b5 an E for its b5). The pitches are right, the names are what the code
+# gives today. KNOWN_SPELLING_FIXES has the names these should get, once they do move the entries up.
+KNOWN_BASELINE = {
+    "Ebmaj7": ("D#0", "G0", "A#0", "D1"),
+    # the G in the bass, Eb moves up an octave
+    "Ebmaj7/G": ("G0", "A#0", "D1", "D#1"),
+    "Bbm7b5": ("A#0", "Db1", "E1", "Ab1"),
+    "Dbmaj7": ("C#0", "F0", "G#0", "C1"),
+}
+
+KNOWN_SPELLING_FIXES = {
+    "Ebmaj7": ("Eb0", "G0", "Bb0", "D1"),
+    "Ebmaj7/G": ("G0", "Bb0", "D1", "Eb1"),
+    "Bbm7b5": ("Bb0", "Db1", "Fb1", "Ab1"),
+    "Dbmaj7": ("Db0", "F0", "Ab0", "C1"),
+}
+
+@pytest.mark.parametrize("symbol, notes", SPELLINGS.items())
+def test_chord_notes(symbol, notes):
+    assert chord_record.from_symbol(symbol).notes == notes
+
+@pytest.mark.parametrize("symbol, notes", KNOWN_BASELINE.items())
+def test_chord_notes_known_baseline(symbol, notes):
+    assert chord_record.from_symbol(symbol).notes == notes
+
+@pytest.mark.xfail(strict=True, reason="flat roots are spelled with sharps, see KNOWN_BASELINE")
+@pytest.mark.parametrize("symbol, notes", KNOWN_SPELLING_FIXES.items())
+def test_chord_notes_target_spelling(symbol, notes):
+    assert chord_record.from_symbol(symbol).notes == notes
+
+@pytest.mark.parametrize("symbol", [*SPELLINGS, *KNOWN_BASELINE])
+def test_notes_sound_the_chord_semitones(symbol):
+    chord = chord_record.from_symbol(symbol)
+    semitones = helperfunc.get_chord_semitones(chord.key_base, list(chord.intervals), chord.inversion or None)
+
+    assert [helperfunc.note_to_midi(note) for note in chord.notes] == semitones
+    assert [helperfunc.note_to_midi(note) for note in chord.notes_alt] == [midi - 12 for midi in semitones]
+
+def test_lowest_note_is_the_root_or_bass():
+    assert helperfunc.note_to_midi(chord_record.from_symbol("Eb").notes[0]) % 12 == 3
+    assert helperfunc.note_to_midi(chord_record.from_symbol("Ebmaj7/G").notes[0]) % 12 == 7
+
+@pytest.mark.parametrize("note, midi", [("C-1", 0), ("C4", 60), ("C#4", 61), ("Db4", 61), ("Bb3", 58), ("G9", 127)])
+def test_note_to_midi(note, midi):
+    assert helperfunc.note_to_midi(note) == midi
+
+def test_midi_to_note_round_trip():
+    assert all(helperfunc.note_to_midi(helperfunc.midi_to_note(midi)) == midi for midi in range(128))
+
+@pytest.mark.parametrize("note", ["H4", "C10", "X"])
+def test_note_to_midi_rejects_bad_names(note):
+    with pytest.raises(ValueError):
+        helperfunc.note_to_midi(note)
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import pytest
+import benchmark
+
+# main and reversechordfinder defer numpy and rtmidi until they are needed, each check runs in a fresh
+# interpreter since this one has long imported both (benchmark.py --imports measures the time it saves)
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# benchmark.import_time baseline (best of 5, Python 3.13): main 14 ms, reversechordfinder 15 ms, numpy
+# alone 80 ms. The budget is about 10x that, so only a heavy new import at module level trips it
+IMPORT_BUDGET = 0.15
+
+def modules_after_import(module: str) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+    )
+    return set(result.stdout.split())
+
+@pytest.mark.parametrize("module", ["main", "reversechordfinder"])
+def test_import_skips_numpy_and_rtmidi(module):
+    loaded = modules_after_import(module)
+
+    assert module in loaded
+    assert "numpy" not in loaded
+    assert "rtmidi" not in loaded
+
+@pytest.mark.parametrize("module", ["main", "reversechordfinder"])
+def test_import_time_within_budget(module):
+    # best of three, the first one also writes the bytecode caches
+    assert min(benchmark.import_time(module) for _ in range(3)) < IMPORT_BUDGET
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import key_detection
+import main
+import pitch_class
+
+# Keys of common progressions, each checked in all 12 transpositions. Counting every chord the same used to
+# give Dm7 G7 Cmaj7 as G major and Cm7 F7 Bbmaj7 as F major.
+
+PROGRESSIONS = {
+    "Dm7 - G7 - Cmaj7": ("C", "major"),
+    "Cm7 - F7 - Bbmaj7": ("Bb", "major"),
+    "C - F - G - C": ("C", "major"),
+    "C - F - G7 - C": ("C", "major"),
+    "C - Am - F - G7 - C": ("C", "major"),
+    "Em7 - A7 - Dm7 - G7 - Cmaj7": ("C", "major"),
+    "Dm7b5 - G7 - Cm": ("C", "minor"),
+    "Cm - Fm - G7 - Cm": ("C", "minor"),
+    "Am - Dm - E7 - Am": ("A", "minor"),
+}
+
+def chords(progression: str):
+    return main.get_base_info(main.extract_chords(progression))
+
+def transpose(progression: str, semitones: int) -> str:
+    symbols = []
+    for symbol in progression.split(" - "):
+        root = symbol[:2] if symbol[1:2] in ("b", "#") else symbol[:1]
+        tonic = key_detection.TONIC_NAMES[(pitch_class.KEY_TO_PITCH_CLASS[root] + semitones) % 12]
+        symbols.append(tonic + symbol[len(root):])
+    return " - ".join(symbols)
+
+@pytest.mark.parametrize("progression, key", PROGRESSIONS.items())
+def test_estimate_key(progression, key):
+    assert key_detection.estimate_key(chords(progression))[:2] == key
+
+@pytest.mark.parametrize("progression, key", PROGRESSIONS.items())
+def test_estimate_key_transposed(progression, key):
+    tonic = key_detection.TONIC_NAMES.index(key[0])
+    for semitones in range(1, 12):
+        expected = key_detection.TONIC_NAMES[(tonic + semitones) % 12]
+        assert key_detection.estimate_key(chords(transpose(progression, semitones)))[:2] == (expected, key[1])
+
+def test_detect_keys_matches_detect_key():
+    songs = [chords(progression) for progression in PROGRESSIONS] + [[]]
+
+    assert key_detection.detect_keys(songs) == [key_detection.detect_key(song) for song in songs]
+    assert key_detection.histogram_matrix(songs) == pytest.approx(
+        np.array([key_detection.pitch_class_histogram(song) for song in songs]))
+
+def test_chord_weights():
+    weights = key_detection.chord_weights(chords("Dm7 - G7 - Cmaj7 - Fmaj7 - Cmaj7 - G7"))
+
+    # only G7 -> Cmaj7 resolves, Cmaj7 -> Fmaj7 has a major seventh
+    assert weights.tolist() == [1, 1, 1 + key_detection.RESOLUTION_WEIGHT, 1, 1, 1 + key_detection.FINAL_WEIGHT]
+    assert key_detection.chord_weights([]).tolist() == []
+
+@pytest.mark.parametrize("progression", PROGRESSIONS)
+def test_estimator_matches_estimate_key(progression):
+    estimator = key_detection.KeyEstimator()
+    for chord in chords(progression):
+        estimator.add(chord)
+
+    assert estimator.scores() == pytest.approx(key_detection.key_scores(key_detection.pitch_class_histogram(chords(progression))))
+    assert estimator.key() == pytest.approx(key_detection.estimate_key(chords(progression)))
+
+def test_estimator_sliding_window():
+    progression = chords("Cm - Fm - G7 - Cm - Dm7 - G7 - Cmaj7")
+    estimator = key_detection.KeyEstimator()
+    for chord in progression[:3]:
+        estimator.add(chord)
+    for counter, chord in enumerate(progression[3:]):
+        estimator.remove(progression[counter])
+        estimator.add(chord)
+
+    # left with Dm7 G7 Cmaj7, nothing resolves into the oldest chord
+    assert estimator.count == 3
+    assert estimator.scores() == pytest.approx(key_detection.key_scores(key_detection.pitch_class_histogram(progression[4:])))
+    assert estimator.key()[:2] == ("C", "major")
+
+def test_estimator_removes_oldest_only():
+    progression = chords("Dm7 - G7 - Cmaj7")
+    estimator = key_detection.KeyEstimator()
+    for chord in progression:
+        estimator.add(chord)
+
+    with pytest.raises(ValueError):
+        estimator.remove(progression[1])
@@ -0,0 +1,79 @@
+import json
+import numpy as np
+import pytest
+import benchmark
+import key_matrix
+import main
+from key_detection import TONIC_NAMES
+
+# analyze_all_keys against labelling the chords one key at a time, and the fit helpers against recomputing
+# them on slices of the progression.
+
+PROGRESSION = "Dm7 - G7 - Cmaj7 - Am7 - E7"
+
+def chords(progression: str):
+    return main.get_base_info(main.extract_chords(progression))
+
+def corpus() -> list[list]:
+    return [chords(progression) for complexity in benchmark.COMPLEXITIES
+            for _, progression in benchmark.generate_corpus(3, 12, complexity, seed=25)]
+
+@pytest.mark.parametrize("chords_input", corpus())
+def test_rows_match_get_roman_numeral_list(chords_input):
+    matrix = key_matrix.analyze_all_keys(chords_input, minor_keys=True)
+
+    assert len(matrix) == 24
+    for row in range(len(matrix)):
+        assert matrix.roman_numerals(row) == main.get_roman_numeral_list(chords_input, TONIC_NAMES[row % 12])
+
+def test_key_names():
+    assert key_matrix.analyze_all_keys([]).keys == tuple(f"{tonic} major" for tonic in TONIC_NAMES)
+    assert key_matrix.analyze_all_keys([], minor_keys=True).keys[12:] == tuple(f"{tonic} minor" for tonic in TONIC_NAMES)
+
+def test_functions():
+    matrix = key_matrix.analyze_all_keys(chords(PROGRESSION), minor_keys=True)
+
+    # E7 is the dominant of A minor (harmonic minor) but outside C major
+    assert matrix.functions[matrix.keys.index("C major")].tolist() == ["S", "D", "T", "T", ""]
+    assert matrix.functions[matrix.keys.index("A minor")].tolist() == ["S", "D", "T", "T", "D"]
+    assert matrix.functions[matrix.keys.index("C minor")].tolist() == ["S", "D", "", "", ""]
+
+def test_fit_and_best_keys():
+    matrix = key_matrix.analyze_all_keys(chords(PROGRESSION), minor_keys=True)
+
+    assert matrix.fit()[matrix.keys.index("C major")] == pytest.approx(0.8)
+    assert matrix.fit().tolist() == matrix.in_key().mean(axis=1).tolist()
+    assert matrix.best_keys() == ["A minor"]
+    assert key_matrix.analyze_all_keys(chords(PROGRESSION)).best_keys() == ["C major"]
+
+def test_ambiguous_progression_has_several_best_keys():
+    # C and G are I V in C major and IV I in G major
+    assert key_matrix.analyze_all_keys(chords("C - G")).best_keys() == ["C major", "G major"]
+
+def test_no_chords():
+    matrix = key_matrix.analyze_all_keys([], minor_keys=True)
+
+    assert matrix.fit().tolist() == [0.0] * 24
+    assert matrix.numerals.shape == (24, 0)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_window_fit_matches_fit_of_slices(size):
+    chords_input = chords("Dm7 - G7 - Cmaj7 - Am7 - E7 - Am - Bb7 - Ebmaj7 - Cm7")
+    windows = key_matrix.analyze_all_keys(chords_input, minor_keys=True).window_fit(size)
+
+    assert windows.shape == (24, len(chords_input) - size + 1)
+    for start in range(windows.shape[1]):
+        assert windows[:, start] == pytest.approx(key_matrix.analyze_all_keys(chords_input[start:start + size], minor_keys=True).fit())
+
+@pytest.mark.parametrize("size", [0, 6])
+def test_window_fit_rejects_bad_sizes(size):
+    with pytest.raises(ValueError):
+        key_matrix.analyze_all_keys(chords("Dm7 - G7 - Cmaj7 - Am7 - E7")).window_fit(size)
+
+def test_cli_json(capsys):
+    key_matrix.main_cli([PROGRESSION, '--minor', '--json'])
+    output = json.loads(capsys.readouterr().out)
+
+    assert len(output['keys']) == len(output['numerals']) == len(output['functions']) == 24
+    assert output['labels'] == ["m7", "7", "maj7", "m7", "7"]
+    assert np.argmax(output['fit']) == output['keys'].index("A minor")
@@ -0,0 +1,123 @@
+import pytest
+import chord_index
+from live_engine import FakeMidiSource, LatencyHistogram, LiveChordEngine
+
+# Scripted note streams through LiveChordEngine on a fake clock: FakeMidiSource waits out each event's delay
+# with a sleep that advances the clock in small steps and polls the engine, the way run() would.
+
+DEBOUNCE = 0.02
+THROTTLE = 0.05
+STEP = 0.001
+
+C_MAJOR = (60, 64, 67)
+F_MAJOR = (60, 65, 69)
+
+class FakeClock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture(scope="module")
+def index():
+    # built in memory, the tests never touch the on-disk cache
+    return chord_index.get_index(None)
+
+def play(index, events, debounce=DEBOUNCE, throttle=THROTTLE, tail=1.0):
+    """
+    :return: the engine and its renders as (clock time, notes, names)
+    """
+    clock = FakeClock()
+    renders = []
+    engine = LiveChordEngine(index, render=lambda notes, names: renders.append((clock.now, notes, names)),
+                             debounce=debounce, throttle=throttle, clock=clock)
+
+    def sleep(seconds):
+        end = clock.now + seconds
+        while clock.now < end:
+            clock.now = min(clock.now + STEP, end)
+            engine.poll()
+
+    source = FakeMidiSource(events, realtime=True, clock=clock, sleep=sleep)
+    source.open(engine.on_message)
+    source.play()
+    sleep(tail)
+    source.close()
+
+    return engine, renders
+
+def chord(notes, gap=0.0, spread=0.002, velocity=100):
+    # first note after gap, the rest spread seconds apart
+    return [(gap if counter == 0 else spread, note, velocity) for counter, note in enumerate(notes)]
+
+def test_near_simultaneous_notes_render_once(index):
+    engine, renders = play(index, chord(C_MAJOR))
+
+    assert engine.events == 3
+    assert [notes for _, notes, _ in renders] == [list(C_MAJOR)]
+    assert renders[0][2][0] == "C"
+
+def test_render_waits_out_the_debounce(index):
+    _, renders = play(index, chord(C_MAJOR))
+
+    # pending since the first note-on at 100.0
+    assert renders[0][0] == pytest.approx(100.0 + DEBOUNCE, abs=STEP * 1.5)
+
+def test_notes_further_apart_than_debounce_render_separately(index):
+    _, renders = play(index, chord(C_MAJOR, spread=0.3))
+
+    assert [notes for _, notes, _ in renders] == [[60], [60, 64], list(C_MAJOR)]
+
+def test_throttle_spaces_renders(index):
+    # a new chord every 10 ms, each past the debounce of the previous one but well inside the throttle
+    events = chord(C_MAJOR) + [(0.01, 67, 0)] + [(0.01, 65, 100)] + [(0.01, 64, 0)] + [(0.01, 69, 100)] + [(0.01, 65, 0)]
+    engine, renders = play(index, events)
+
+    # G is already released when the first debounce ends, the four changes after that collapse into one
+    # render a full throttle after the first
+    assert [notes for _, notes, _ in renders] == [[60, 64], [60, 69]]
+    assert [time - 100.0 for time, _, _ in renders] == pytest.approx([DEBOUNCE, DEBOUNCE + THROTTLE], abs=STEP * 1.5)
+    assert engine.renders == 2
+
+def test_unchanged_chord_is_not_rendered_again(index):
+    # G released and pressed again inside one debounce window, the label is the same as before
+    events = chord(C_MAJOR) + [(0.2, 67, 0), (0.005, 67, 100)]
+    engine, renders = play(index, events)
+
+    assert engine.events == 5
+    assert len(renders) == 1
+
+def test_latency_counts_every_render(index):
+    # C pressed, released, F pressed: three chord events, each rendered once
+    events = chord(C_MAJOR) + chord(C_MAJOR, gap=0.3, velocity=0) + chord(F_MAJOR, gap=0.3)
+    engine, renders = play(index, events)
+
+    summary = engine.latency.summary()
+    assert [notes for _, notes, _ in renders] == [list(C_MAJOR), [], list(F_MAJOR)]
+    assert summary["count"] == engine.renders == 3
+    assert sum(engine.latency.counts) == 3
+    assert DEBOUNCE - 1e-9 <= summary["max"] <= DEBOUNCE + STEP * 1.5
+    assert summary["mean"] == pytest.approx(engine.latency.total / 3)
+
+def test_closed_source_delivers_nothing(index):
+    clock = FakeClock()
+    engine = LiveChordEngine(index, render=lambda notes, names: None, clock=clock)
+    source = FakeMidiSource(chord(C_MAJOR), clock=clock)
+    source.open(engine.on_message)
+    source.close()
+    source.play()
+
+    assert engine.events == 0
+    assert engine.next_deadline() is None
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for seconds in (0.001, 0.001, 0.001, 0.5):
+        histogram.record(seconds)
+
+    assert histogram.count == 4
+    assert histogram.percentile(50) == pytest.approx(0.001, rel=0.3)
+    assert histogram.percentile(99) == pytest.approx(0.5, rel=0.3)
+    assert histogram.max == 0.5
+    assert LatencyHistogram().summary() == {"count": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
@@ -0,0 +1,150 @@
+import pytest
+import chord_index
+import midi_file
+from midi_file import NOTE_OFF, NOTE_ON, TEMPO
+
+# Standard MIDI Files built byte by byte here: running status, meta / sysex events, tempo changes, SMPTE
+# timing, several tracks, and the ways a file can be broken.
+
+DIVISION = 480
+
+def varlen(value: int) -> bytes:
+    groups = [value & 0x7F]
+    while value > 0x7F:
+        value >>= 7
+        groups.append(value & 0x7F | 0x80)
+    return bytes(reversed(groups))
+
+def event(delta: int, *data: int) -> bytes:
+    return varlen(delta) + bytes(data)
+
+def tempo(delta: int, microseconds: int) -> bytes:
+    return event(delta, 0xFF, 0x51, 3) + microseconds.to_bytes(3, 'big')
+
+END_OF_TRACK = event(0, 0xFF, 0x2F, 0)
+
+def track(*events: bytes, end: bool = True) -> bytes:
+    body = b"".join(events) + (END_OF_TRACK if end else b"")
+    return b"MTrk" + len(body).to_bytes(4, 'big') + body
+
+def smf(*tracks: bytes, division: int = DIVISION, file_format: int = 1) -> bytes:
+    header = file_format.to_bytes(2, 'big') + len(tracks).to_bytes(2, 'big') + division.to_bytes(2, 'big')
+    return b"MThd" + len(header).to_bytes(4, 'big') + header + b"".join(tracks)
+
+def events(data: bytes) -> list[tuple]:
+    return list(midi_file.MidiFile(data).events())
+
+@pytest.fixture(scope="module")
+def index():
+    return chord_index.get_index(None)
+
+def test_varlen_helper():
+    assert [varlen(value) for value in (0, 0x7F, 0x80, 0x3FFF, 0x4000)] == [b"\x00", b"\x7f", b"\x81\x00", b"\xff\x7f", b"\x81\x80\x00"]
+    assert midi_file._read_varlen(b"\x81\x80\x00", 0) == (0x4000, 3)
+
+def test_running_status():
+    # one status byte, the following events only carry their data bytes; velocity 0 is a note off
+    data = smf(track(event(0, 0x90, 60, 100), event(0, 64, 90), event(240, 60, 0), event(0, 0x80, 64, 0)))
+
+    assert events(data) == [(0, NOTE_ON, 0, 60, 100), (0, NOTE_ON, 0, 64, 90), (240, NOTE_OFF, 0, 60, 0), (240, NOTE_OFF, 0, 64, 0)]
+
+def test_running_status_survives_meta_and_sysex():
+    data = smf(track(event(0, 0x91, 60, 100), event(0, 0xFF, 0x03, 4, *b"Lead"), event(0, 0xF0, 2, 0x7E, 0xF7), event(10, 62, 100)))
+
+    assert events(data) == [(0, NOTE_ON, 1, 60, 100), (10, NOTE_ON, 1, 62, 100)]
+
+def test_one_data_byte_messages_and_controllers_are_skipped():
+    data = smf(track(event(0, 0xC0, 5), event(0, 0xB0, 7, 100), event(0, 0xD0, 40), event(0, 0xE0, 0, 64), event(0, 0x90, 60, 1)))
+
+    assert events(data) == [(0, NOTE_ON, 0, 60, 1)]
+
+def test_end_of_track_stops_the_track():
+    data = smf(track(event(0, 0x90, 60, 100), END_OF_TRACK, event(0, 0x90, 64, 100), end=False))
+
+    assert events(data) == [(0, NOTE_ON, 0, 60, 100)]
+
+def test_tempo_changes():
+    # a quarter at the default 120 bpm, then twice as fast from tick 480
+    conductor = track(tempo(DIVISION, 250000))
+    notes = track(event(0, 0x90, 60, 100), event(DIVISION, 0x80, 60, 0), event(0, 0x90, 62, 100), event(DIVISION, 0x80, 62, 0))
+    midi = midi_file.MidiFile(smf(conductor, notes))
+
+    assert list(midi.events())[1] == (DIVISION, TEMPO, 0, 250000, 0)
+    assert [(seconds, note, velocity) for seconds, _, note, velocity in midi.note_events()] == pytest.approx(
+        [(0.0, 60, 100), (0.5, 60, 0), (0.5, 62, 100), (0.75, 62, 0)])
+    assert midi.tempo_map() == ([0, DIVISION], [0.0, 0.5], [midi_file.DEFAULT_TEMPO, 250000])
+    assert midi.seconds(2 * DIVISION) == pytest.approx(0.75)
+
+def test_tracks_merge_in_tick_order():
+    data = smf(track(event(0, 0x90, 60, 100), event(100, 0x80, 60, 0)), track(event(50, 0x91, 64, 100), event(50, 0x81, 64, 0)))
+
+    assert [(tick, note, kind) for tick, kind, _, note, _ in events(data)] == [(0, 60, NOTE_ON), (50, 64, NOTE_ON), (100, 60, NOTE_OFF), (100, 64, NOTE_OFF)]
+
+def test_smpte_timing():
+    # 25 frames per second, 40 ticks per frame
+    midi = midi_file.MidiFile(smf(track(event(0, 0x90, 60, 100), event(500, 0x80, 60, 0)), division=0xE728))
+
+    assert midi.ticks_per_quarter is None
+    assert midi.ticks_per_second == 1000
+    assert [seconds for seconds, _, _, _ in midi.note_events()] == [0.0, 0.5]
+
+def test_drums_are_skipped():
+    midi = midi_file.MidiFile(smf(track(event(0, 0x99, 36, 100), event(0, 0x90, 60, 100))))
+
+    assert [note for _, _, note, _ in midi.note_events()] == [60]
+    assert [note for _, _, note, _ in midi.note_events(skip_drums=False)] == [36, 60]
+
+def test_other_chunks_are_skipped():
+    data = smf(track(event(0, 0x90, 60, 100)))
+    data = data[:14] + b"XFIH" + (3).to_bytes(4, 'big') + b"abc" + data[14:]
+
+    assert events(data) == [(0, NOTE_ON, 0, 60, 100)]
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"RIFF" + bytes(20),
+    b"MThd\x00\x00\x00\x06\x00\x01",
+    smf(division=0),
+], ids=["empty", "not_smf", "short_header", "zero_division"])
+def test_bad_headers(data):
+    with pytest.raises(ValueError):
+        midi_file.MidiFile(data)
+
+@pytest.mark.parametrize("data", [
+    # cut inside the note on
+    smf(track(event(0, 0x90, 60, 100)))[:-6],
+    # the chunk says it is longer than the file is
+    smf(track(event(0, 0x90, 60, 100), end=False))[:-1],
+    smf(track(event(0, 60, 100))),
+    smf(track(b"\x81\x81\x81\x81\x00" + bytes((0x90, 60, 100)))),
+    smf(track(event(0, 0xF1, 0))),
+], ids=["mid_event", "truncated_chunk", "no_status", "long_varlen", "system_common"])
+def test_broken_tracks(data):
+    with pytest.raises(ValueError):
+        events(data)
+
+def test_broken_file_becomes_an_error_line(index, tmp_path):
+    path = tmp_path / "broken.mid"
+    path.write_bytes(smf(track(event(0, 0x90, 60, 100)))[:-6])
+    line = midi_file.analyze_file_json(str(path), options={'index': index})
+
+    assert '"error": "ValueError: track ends in the middle of an event"' in line
+
+def chord_track() -> bytes:
+    # C major for a beat, then F major over C for a beat
+    chords = []
+    for notes in ((60, 64, 67), (60, 65, 69)):
+        chords += [event(0, 0x90, note, 100) for note in notes]
+        chords += [event(DIVISION if counter == 0 else 0, 0x80, note, 0) for counter, note in enumerate(notes)]
+    return track(*chords)
+
+@pytest.mark.parametrize("segmentation", midi_file.SEGMENTATIONS)
+def test_file_chords(index, segmentation):
+    chords = midi_file.file_chords(midi_file.MidiFile(smf(chord_track())), segmentation, index=index)
+
+    assert [name for _, name in chords] == ["C", "F/C"]
+    assert [seconds for seconds, _ in chords] == pytest.approx([0.0, 0.5])
+
+def test_grid_needs_quarter_note_timing(index):
+    with pytest.raises(ValueError):
+        midi_file.file_chords(midi_file.MidiFile(smf(chord_track(), division=0xE728)), 'grid', index=index)
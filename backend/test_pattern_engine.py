@@ -0,0 +1,104 @@
+import pytest
+import main
+import pattern_engine
+
+# find_251_movement / find_51_movement run on the pattern_engine automaton, these pin their output to the
+# annotations the old left to right scanners gave (song key C, so the targets' numerals are relative to C)
+
+KEY = "C"
+
+CASES_251 = {
+    "Dm7 - G7 - Cmaj7": [("iim7/I", ""), ("V7/I", ""), ("", "")],
+    "Dm7 - Db7 - Cmaj7": [("", "iim7/I"), ("", "bII7/I"), ("", "")],
+    "Bm7b5 - E7 - Am7": [("iim7b5/vi", ""), ("V7/vi", ""), ("", "")],
+    "Am - Dm7 - G7 - C - F": [("", ""), ("iim7/I", ""), ("V7/I", ""), ("", ""), ("", "")],
+    "G7 - C7 - F": [("", ""), ("", ""), ("", "")],
+    # the second ii V i would start on the first one's target, which is taken
+    "Dm7 - G7 - Cm7 - F7 - Bbmaj7": [("iim7/i", ""), ("V7/i", ""), ("", ""), ("", ""), ("", "")],
+    "Em7 - A7 - Dm7 - G7 - Cmaj7": [("iim7/ii", ""), ("V7/ii", ""), ("", ""), ("", ""), ("", "")],
+}
+
+CASES_51 = {
+    "G7 - C": [("V7/I", ""), ("", "")],
+    "Db7 - C": [("", "bII7/I"), ("", "")],
+    "Dm7 - G7": [("", ""), ("", "")],
+    "Dm7 - G7 - Cmaj7": [("", ""), ("V7/I", ""), ("", "")],
+    "Dm7 - Db7 - Cmaj7": [("", ""), ("", "bII7/I"), ("", "")],
+    # C7 -> F is a V I too, but C7 is already the target of G7 -> C7
+    "G7 - C7 - F": [("V7/I", ""), ("", ""), ("", "")],
+    "Dm7 - G7 - Cm7 - F7 - Bbmaj7": [("", ""), ("V7/i", ""), ("", ""), ("V7/VI#", ""), ("", "")],
+    "Em7 - A7 - Dm7 - G7 - Cmaj7": [("", ""), ("V7/ii", ""), ("", ""), ("V7/I", ""), ("", "")],
+}
+
+def chords_and_annotations(progression: str):
+    chords = main.get_base_info(main.extract_chords(progression))
+    return chords, main.get_roman_numerals(chords, KEY)
+
+@pytest.mark.parametrize("progression, expected", CASES_251.items())
+def test_find_251_movement(progression, expected):
+    chords, annotations = chords_and_annotations(progression)
+    result = main.find_251_movement(chords, annotations)
+
+    assert [(annotation['roman_numeral_251'], annotation['roman_numeral_251_tritone']) for annotation in result] == expected
+
+@pytest.mark.parametrize("progression, expected", CASES_51.items())
+def test_find_51_movement(progression, expected):
+    chords, annotations = chords_and_annotations(progression)
+    result = main.find_51_movement(chords, annotations)
+
+    assert [(annotation['roman_numeral_51'], annotation['roman_numeral_51_tritone']) for annotation in result] == expected
+
+@pytest.mark.parametrize("progression, stage, keys", [
+    ("", main.find_251_movement, ('roman_numeral_251',)),
+    ("Cmaj7", main.find_251_movement, ('roman_numeral_251',)),
+    ("Dm7 - G7", main.find_251_movement, ('roman_numeral_251',)),
+    ("", main.find_51_movement, ('roman_numeral_51',)),
+    ("G7", main.find_51_movement, ('roman_numeral_51',)),
+])
+def test_too_short_is_left_alone(progression, stage, keys):
+    chords, annotations = chords_and_annotations(progression)
+    result = stage(chords, annotations)
+
+    assert result == [{'roman_numeral': roman} for roman in main.get_roman_numeral_list(chords, KEY)]
+    assert not any(key in annotation for annotation in result for key in keys)
+
+@pytest.mark.parametrize("progression", sorted(CASES_251.keys() | CASES_51.keys()))
+def test_analyze_matches_stages(progression):
+    chords, annotations = chords_and_annotations(progression)
+    main.find_251_movement(chords, annotations)
+    main.find_51_movement(chords, annotations)
+    combined = main.analyze(chords, KEY, ('251_movement', '51_movement'))
+
+    assert combined == annotations
+
+def test_find_all_reports_overlapping_matches():
+    chords = main.get_base_info(main.extract_chords("Dm7 - G7 - C7 - F"))
+    matches = {(start, pattern.name) for start, pattern in pattern_engine.DEFAULT_PATTERNS.find_all(chords)}
+
+    assert {(0, '251'), (1, '51'), (2, '51')} <= matches
+
+def test_resolve_skips_overlapping_matches():
+    patterns = pattern_engine.DEFAULT_PATTERNS
+    chords = main.get_base_info(main.extract_chords("Dm7 - G7 - C7 - F"))
+    matches = patterns.find_all(chords)
+
+    assert [(start, pattern.name) for start, pattern in patterns.resolve(matches, '51')] == [(1, '51')]
+    assert [(start, pattern.name) for start, pattern in patterns.resolve(matches, '251')] == [(0, '251')]
+
+def test_unknown_numeral_is_rejected():
+    with pytest.raises(ValueError):
+        pattern_engine.Pattern('bad', 'ii X I')
+
+@pytest.mark.parametrize("progression", sorted(CASES_251.keys() | CASES_51.keys()))
+def test_step_matches_find_all(progression):
+    patterns = pattern_engine.DEFAULT_PATTERNS
+    chords = main.get_base_info(main.extract_chords(progression))
+    matches = []
+    state = 0
+    for counter, token in enumerate(pattern_engine.chord_tokens(chords)):
+        state, ended = patterns.step(state, token)
+        matches += [(counter - len(pattern) + 1, pattern) for pattern in ended]
+
+    assert matches == patterns.find_all(chords)
+    assert patterns.group_length('251') == 3
+    assert patterns.group_length('51') == 2
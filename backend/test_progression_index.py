@@ -0,0 +1,90 @@
+import random
+import numpy as np
+import pytest
+import benchmark
+import main
+import pitch_class
+import progression_index
+
+# ProgressionIndex.search against a brute force scan of every window of every song, on the benchmark corpus
+# plus some songs written to contain the queries, before and after a save / load round trip.
+
+QUERIES = ("ii V I", "ii V i", "ii V I?", "iim7 V7 Imaj7", "V I", "V7 I?", "bII7 I?", "I vi ii V", "iv bVII I?",
+           "I", "i", "im7", "Im7", "I? I?", "iim7b5 V7 i", "V")
+
+EXTRA_SONGS = ("Dm7 - G7 - Cmaj7", "Bm7b5 - E7 - Am7 - Dm7 - G7 - C", "Em7 - A7 - Dm7 - G7 - Cmaj7 - Am7 - Dm7 - G7",
+               "C - Am - Dm - G - C - Am - Dm - G", "Fm - Bb7 - C", "Db7 - C - Ab7 - G", "", "Cmaj7")
+
+def library() -> list[tuple[str, list]]:
+    songs = [progression for _, progression in benchmark.generate_corpus(60, 16, 'seventh', seed=8)]
+    songs += [progression for _, progression in benchmark.generate_corpus(30, 6, 'triad', seed=9)]
+    songs += EXTRA_SONGS
+    return [(f"song{counter}", main.get_base_info(main.extract_chords(progression))) for counter, progression in enumerate(songs)]
+
+def brute_force(songs, query: str) -> list[tuple[str, int]]:
+    elements = progression_index.parse_query(query)
+    matches = []
+
+    for song_id, chords in songs:
+        for start in range(len(chords) - len(elements) + 1):
+            window = chords[start:start + len(elements)]
+            tonic = (window[0].root - elements[0][0]) % pitch_class.PITCH_CLASS_COUNT
+            if all((chord.root - tonic) % pitch_class.PITCH_CLASS_COUNT == interval
+                   and progression_index.is_minor(chord) in minors
+                   and (quality is None or progression_index.QUALITY_TO_ID[chord.quality] == quality)
+                   for chord, (interval, minors, quality) in zip(window, elements)):
+                matches.append((song_id, start))
+
+    return matches
+
+@pytest.fixture(scope="module")
+def songs():
+    return library()
+
+@pytest.fixture(scope="module")
+def index(songs):
+    return progression_index.build_index(songs)
+
+@pytest.fixture(scope="module")
+def loaded(index, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("progression_index"))
+    index.save(path)
+    return progression_index.ProgressionIndex.load(path)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_brute_force(songs, index, query):
+    expected = brute_force(songs, query)
+
+    assert index.search(query) == expected
+    assert index.count(query) == len(expected)
+    assert index.search(query, limit=3) == expected[:3]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_loaded_index_searches_the_same(index, loaded, query):
+    assert loaded.search(query) == index.search(query)
+
+def test_queries_find_the_written_songs(songs, index):
+    first_extra = len(songs) - len(EXTRA_SONGS)
+
+    assert (f"song{first_extra}", 0) in index.search("iim7 V7 Imaj7")
+    assert (f"song{first_extra + 1}", 0) in index.search("iim7b5 V7 i")
+
+def test_load_rejects_another_quality_table(index, tmp_path):
+    index.save(str(tmp_path))
+    meta = tmp_path / progression_index.META_FILE
+    meta.write_text(meta.read_text(encoding='utf-8').replace('"m7"', '"min7"'), encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        progression_index.ProgressionIndex.load(str(tmp_path))
+
+@pytest.mark.parametrize("query", ["X", "iiV7", "IIi", "Iblah", "VIII"])
+def test_bad_queries(index, query):
+    with pytest.raises(ValueError):
+        index.search(query)
+
+@pytest.mark.parametrize("length, alphabet", [(0, 1), (1, 1), (50, 1), (200, 3), (500, 49)])
+def test_suffix_array_is_sorted(length, alphabet):
+    rng = random.Random(length)
+    tokens = np.array([rng.randrange(alphabet) for _ in range(length)], dtype=np.uint8)
+
+    assert progression_index.build_suffix_array(tokens).tolist() == sorted(range(length), key=lambda position: tokens[position:].tolist())
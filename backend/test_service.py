@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+import pytest
+import service
+
+# AnalysisService on a free localhost port with the in-process pool (workers=0), requests sent as raw HTTP
+# so malformed ones can be too. Every request asks for Connection: close, the response is read to EOF.
+
+PROGRESSION = b'{"progression": "Dm7 - G7 - Cmaj7", "key": "C"}'
+
+def post(body: bytes, length: str | None = None) -> bytes:
+    length = str(len(body)) if length is None else length
+    return (f"POST /analyze HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n"
+            f"Connection: close\r\n\r\n").encode('latin-1') + body
+
+async def send(address: tuple[str, int], request: bytes) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection(*address)
+    try:
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(body)
+
+def run(scenario, **options):
+    """
+    :return: what scenario(service) returns, with the service started before and closed after
+    """
+    async def main():
+        app = service.AnalysisService(host="127.0.0.1", port=0, workers=0, **options)
+        await app.start()
+        try:
+            return await scenario(app)
+        finally:
+            await app.close()
+
+    return asyncio.run(main())
+
+def test_analyze():
+    status, payload = run(lambda app: send(app.address, post(PROGRESSION)))
+
+    # the same as the batch.py output line for the record
+    assert status == 200
+    assert payload == json.loads(json.dumps(service.batch.analyze_record(json.loads(PROGRESSION))))
+    assert payload["chords"][0]["roman_numeral_251"] == "iim7/I"
+
+def test_health_and_unknown_route():
+    async def scenario(app):
+        return (await send(app.address, b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"),
+                await send(app.address, b"GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n"))
+
+    health, missing = run(scenario)
+    assert health == (200, {"status": "ok"})
+    assert missing[0] == 404
+
+def test_bad_json_is_400():
+    status, payload = run(lambda app: send(app.address, post(b'["Dm7"]')))
+
+    assert status == 400
+    assert "progression" in payload["error"]
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1.5"])
+def test_bad_content_length_is_400(length):
+    status, payload = run(lambda app: send(app.address, post(PROGRESSION, length)))
+
+    assert status == 400
+    assert payload == {"error": "bad Content-Length"}
+
+def test_body_too_large_is_413():
+    status, _ = run(lambda app: send(app.address, post(b"", str(service.MAX_BODY_BYTES + 1))))
+
+    assert status == 413
+
+def test_full_queue_is_503(monkeypatch):
+    # the pool is held up until released: the first request is in the one batch slot, the second waits in
+    # the one queue place, the third has nowhere to go
+    release = threading.Event()
+    analyze_requests = service.analyze_requests
+
+    def held(bodies, features=service.main.FEATURES):
+        release.wait(10)
+        return analyze_requests(bodies, features)
+
+    monkeypatch.setattr(service, "analyze_requests", held)
+
+    async def scenario(app):
+        first = asyncio.create_task(send(app.address, post(PROGRESSION)))
+        while app.stats["batches"] < 1:
+            await asyncio.sleep(0.001)
+        second = asyncio.create_task(send(app.address, post(PROGRESSION)))
+        while app._queue.qsize() < 1:
+            await asyncio.sleep(0.001)
+
+        rejected = await send(app.address, post(PROGRESSION))
+        release.set()
+        return rejected, await first, await second, app.get_stats()
+
+    try:
+        rejected, first, second, stats = run(scenario, batch_size=1, max_queue=1, max_batches=1)
+    finally:
+        release.set()
+
+    assert rejected == (503, {"error": "too many requests queued, retry later"})
+    assert first[0] == second[0] == 200
+    assert stats["requests"] == 3
+    assert stats["rejected"] == 1
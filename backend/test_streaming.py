@@ -0,0 +1,83 @@
+import pytest
+import benchmark
+import main
+import streaming
+
+# StreamingAnalyzer against the batch stages. The documented difference: the last chord is kept (analyze drops
+# it with the note differences) without parallel_mode_shift / note differences, and the chord_next_relative
+# before it reach it, so everything but the note differences matches analyze without neighbouring_next_notes.
+
+NOTE_KEYS = ('next_chord_note_difference', 'next_chord_note_difference_strict', 'next_chord_note_difference_very_strict')
+WITHOUT_NOTES = tuple(feature for feature in main.FEATURES if feature != 'neighbouring_next_notes')
+
+def stream(chords, song_key):
+    return [annotation for _, annotation in streaming.analyze_stream(chords, song_key)]
+
+def corpus() -> list[tuple[str, list]]:
+    return [(song_key, main.get_base_info(main.extract_chords(progression)))
+            for complexity in benchmark.COMPLEXITIES
+            for length in (0, 1, 2, 3, 4, 5, 9, 24)
+            for song_key, progression in benchmark.generate_corpus(4, length, complexity, seed=length)]
+
+@pytest.mark.parametrize("song_key, chords", corpus())
+def test_matches_analyze_apart_from_note_differences(song_key, chords):
+    annotations = stream(chords, song_key)
+
+    assert len(annotations) == len(chords)
+    assert [{key: value for key, value in annotation.items() if key not in NOTE_KEYS} for annotation in annotations] \
+        == main.analyze(chords, song_key, WITHOUT_NOTES)
+
+@pytest.mark.parametrize("song_key, chords", corpus())
+def test_note_differences_match_analyze(song_key, chords):
+    annotations = stream(chords, song_key)
+    batch = main.analyze(chords, song_key)
+
+    assert len(batch) == max(len(chords) - 1, 0)
+    assert [{key: annotation[key] for key in NOTE_KEYS} for annotation in annotations[:-1]] \
+        == [{key: annotation[key] for key in NOTE_KEYS} for annotation in batch]
+
+def test_last_chord_is_kept():
+    chords = main.get_base_info(main.extract_chords("Em7 - A7 - Dm7 - G7 - Cmaj7 - Fmaj7"))
+    annotations = stream(chords, "C")
+    batch = main.analyze(chords, "C")
+
+    assert len(annotations) == len(batch) + 1
+    assert annotations[-1] == {'roman_numeral': ['IV', 'maj7'], **main.NO_251, **main.NO_51, 'chord_next_relative': {}}
+    # the chords they share differ only in chord_next_relative, Cmaj7 now sees Fmaj7 and the others one chord further
+    assert batch[-1]['chord_next_relative'] == {}
+    assert annotations[-2]['chord_next_relative'] == {'1_ahead': 'Vmaj7/IV'}
+    assert annotations[0] == batch[0]
+
+def test_chords_wait_for_lookahead():
+    analyzer = streaming.StreamingAnalyzer("C")
+    symbols = ["Dm7", "G7", "Cmaj7", "Am7", "Dm7", "G7", "C"]
+
+    emitted = [len(analyzer.feed(symbol)) for symbol in symbols]
+    closed = analyzer.close()
+
+    assert emitted == [0] * streaming.LOOKAHEAD + [1] * (len(symbols) - streaming.LOOKAHEAD)
+    assert [chord.chord for chord, _ in closed] == symbols[-streaming.LOOKAHEAD:]
+
+def test_can_be_fed_again_after_close():
+    analyzer = streaming.StreamingAnalyzer("C")
+    for symbol in ["G7", "Dm7", "G7"]:
+        analyzer.feed(symbol)
+    analyzer.close()
+
+    again = [annotation for symbol in ["Dm7", "G7", "Cmaj7"] for _, annotation in analyzer.feed(symbol)]
+    again += [annotation for _, annotation in analyzer.close()]
+
+    assert again == stream(main.get_base_info(["Dm7", "G7", "Cmaj7"]), "C")
+    assert again[0]['roman_numeral_251'] == "iim7/I"
+
+@pytest.mark.parametrize("symbols, keys", [
+    ([], set()),
+    (["G7"], {'roman_numeral', 'chord_next_relative'}),
+    (["G7", "C"], {'roman_numeral', 'chord_next_relative', *main.NO_51}),
+    (["Dm7", "G7", "C"], {'roman_numeral', 'chord_next_relative', *main.NO_51, *main.NO_251}),
+])
+def test_short_streams_leave_out_cadence_keys(symbols, keys):
+    annotations = stream(symbols, "C")
+
+    assert len(annotations) == len(symbols)
+    assert all(set(annotation) == keys for annotation in annotations[-1:])
@@ -0,0 +1,54 @@
+import random
+import pytest
+import benchmark
+import main
+import voice_leading
+
+# voice_leading.note_differences is the numpy batch of main.get_note_differences, the two must agree on
+# every pair, whatever the chords (slash basses and altered chords included)
+
+def random_songs(complexity: str, count: int = 40, seed: int = 0):
+    rng = random.Random(seed)
+    return [main.get_base_info(main.extract_chords(benchmark.generate_progression(rng.randint(2, 40), complexity, rng)))
+            for _ in range(count)]
+
+def scalar(chords):
+    return [main.get_note_differences(chord_1, chord_2) for chord_1, chord_2 in zip(chords, chords[1:])]
+
+@pytest.mark.parametrize("complexity", benchmark.COMPLEXITIES)
+def test_batch_matches_scalar(complexity):
+    for chords in random_songs(complexity):
+        assert voice_leading.note_differences(chords) == scalar(chords)
+
+@pytest.mark.parametrize("progression", [
+    "C - G/B - Am - F/A",
+    "Cmaj7/E - Dm7b5/Ab - G7#9b13 - C6",
+    "Bb7sus4 - Ebmaj7#11 - F#dim7 - Gm7/F",
+    "C - C",
+    "C9 - G",
+])
+def test_batch_matches_scalar_fixed(progression):
+    chords = main.get_base_info(main.extract_chords(progression))
+    assert voice_leading.note_differences(chords) == scalar(chords)
+
+def test_padding_for_unequal_sizes():
+    # a 5-note chord into a triad: very_strict has nothing to compare the last two notes with
+    chords = main.get_base_info(main.extract_chords("C9 - G"))
+    very_strict = voice_leading.note_differences(chords)[0]['next_chord_note_difference_very_strict']
+
+    assert len(very_strict) == 5
+    assert very_strict[3:] == [None, None]
+
+@pytest.mark.parametrize("length", [0, 1])
+def test_nothing_to_compare(length):
+    chords = main.get_base_info(main.extract_chords(" - ".join(["C"] * length)))
+    assert voice_leading.note_differences(chords) == []
+    assert main.get_note_difference_list(chords) == []
+
+@pytest.mark.parametrize("length", [main.NOTE_DIFFERENCE_BATCH_MIN - 1, main.NOTE_DIFFERENCE_BATCH_MIN])
+def test_analyze_is_the_same_on_both_sides_of_the_threshold(length):
+    rng = random.Random(length)
+    chords = main.get_base_info(main.extract_chords(benchmark.generate_progression(length, 'altered', rng)))
+    annotations = main.analyze(chords, "C", ('neighbouring_next_notes',))
+
+    assert [{key: value for key, value in annotation.items() if key != 'roman_numeral'} for annotation in annotations] == scalar(chords)
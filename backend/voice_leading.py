@@ -0,0 +1,89 @@
+from functools import lru_cache
+import numpy as np
+import helperfunc
+from chord_record import Chord
+
+# Batch version of main.get_note_differences: the whole progression becomes padded midi arrays once,
+# then every adjacent pair is compared in one go. Ties go to the first candidate in the same order
+# the scalar loop tries them, so the results are identical.
+
+# distance used for padding so a padded slot never wins a nearest-note search
+PADDING_DISTANCE = 1 << 14
+
+@lru_cache(maxsize=4096)
+def chord_midi(chord: Chord) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """
+    :return: midi numbers of chord.notes and chord.notes_alt, without going through the note names
+    """
+    return (tuple(helperfunc.get_chord_semitones(chord.key_base, chord.intervals, chord.inversion)),
+            tuple(helperfunc.get_chord_semitones(chord.key_base, chord.intervals, chord.inversion, lower_octave=True)))
+
+def progression_midi_arrays(chords_input: list[Chord]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: notes and notes_alt as (chords, widest chord) int32 arrays padded with 0, and each chord's note count
+    """
+    midi = [chord_midi(chord) for chord in chords_input]
+    lengths = np.fromiter((len(notes) for notes, _ in midi), dtype=np.int32, count=len(midi))
+    width = int(lengths.max()) if len(midi) else 0
+
+    notes = np.zeros((len(midi), width), dtype=np.int32)
+    notes_alt = np.zeros((len(midi), width), dtype=np.int32)
+    for counter, (chord_notes, chord_notes_alt) in enumerate(midi):
+        notes[counter, :len(chord_notes)] = chord_notes
+        notes_alt[counter, :len(chord_notes_alt)] = chord_notes_alt
+
+    return notes, notes_alt, lengths
+
+def note_difference_arrays(chords_input: list[Chord]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Row i compares chord i with chord i + 1, columns are chord i's notes.
+    :return: difference, strict, very_strict (pairs, width) arrays and every chord's note count, entries past
+             chord i's note count are padding (for very_strict, past chord i + 1's too)
+    """
+    notes, notes_alt, lengths = progression_midi_arrays(chords_input)
+    pairs = max(len(chords_input) - 1, 0)
+    width = notes.shape[1]
+
+    chord_1, chord_1_alt = notes[:pairs, :, None], notes_alt[:pairs, :, None]
+    chord_2, chord_2_alt = notes[1:pairs + 1, None, :], notes_alt[1:pairs + 1, None, :]
+    columns = np.arange(width)
+    chord_2_real = (columns[None, :] < lengths[1:pairs + 1, None])[:, None, :]
+
+    # (pair, chord 1 note, chord 2 note, candidate), candidates in the order the scalar loop checks them
+    candidates = np.stack((chord_2 - chord_1, chord_2_alt - chord_1, chord_2 - chord_1_alt, chord_2_alt - chord_1_alt), axis=-1)
+    distance = np.where(chord_2_real[..., None], np.abs(candidates), PADDING_DISTANCE)
+
+    flat_candidates = candidates.reshape(pairs, width, width * 4)
+    best = distance.reshape(pairs, width, width * 4).argmin(axis=-1)
+    difference = np.take_along_axis(flat_candidates, best[..., None], axis=-1)[..., 0]
+
+    strict_candidates = candidates[..., 0]
+    best_strict = np.where(chord_2_real, np.abs(strict_candidates), PADDING_DISTANCE).argmin(axis=-1)
+    strict = np.take_along_axis(strict_candidates, best_strict[..., None], axis=-1)[..., 0]
+
+    very_strict = notes[1:pairs + 1] - notes[:pairs]
+
+    return difference, strict, very_strict, lengths
+
+def note_differences(chords_input: list[Chord]) -> list[dict]:
+    """
+    :return: main.get_note_differences for every adjacent pair, len(chords_input) - 1 dicts
+    """
+    if len(chords_input) < 2:
+        return []
+
+    difference, strict, very_strict, lengths = note_difference_arrays(chords_input)
+
+    difference, strict, very_strict, lengths = difference.tolist(), strict.tolist(), very_strict.tolist(), lengths.tolist()
+    chords_data = []
+
+    for counter in range(len(difference)):
+        length = lengths[counter]
+        shared = min(length, lengths[counter + 1])
+        chords_data.append({
+            'next_chord_note_difference': difference[counter][:length],
+            'next_chord_note_difference_strict': strict[counter][:length],
+            'next_chord_note_difference_very_strict': very_strict[counter][:shared] + [None] * (length - shared)
+        })
+
+    return chords_data